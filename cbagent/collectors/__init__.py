@@ -14,6 +14,7 @@ from cbagent.collectors.fts_stats import (
     FTSUtilisationCollector,
     RegulatorStats,
 )
+from cbagent.collectors.io_amplification import IOAmplification
 from cbagent.collectors.jts_stats import JTSCollector
 from cbagent.collectors.kvstore_stats import KVStoreStats
 from cbagent.collectors.latency import KVLatency, Latency, QueryLatency
@@ -1,34 +1,43 @@
-import json
-
 from cbagent.collectors.collector import Collector
 from logger import logger
-from perfrunner.helpers.local import extract_cb_any, run_cbstats
+from perfrunner.helpers.memcached import typed_stats
 
 
-class CBStatsMemory(Collector):
-    COLLECTOR = "cbstats_memory"
+class CBStatsCollector(Collector):
+
+    """Base class for collectors of memcached STAT groups (what cbstats reports).
+
+    Stats are requested over the persistent connections of the test's
+    MemcachedHelper rather than by running cbstats for every sample.
+    """
+
     CB_STATS_PORT = 11209
-    METRICS = (
-        "ep_mem_used_primary"
-    )
 
     def __init__(self, settings, test):
         super().__init__(settings)
-        extract_cb_any(filename='couchbase')
-        self.cluster_spec = test.cluster_spec
+        self.memcached = test.memcached
+
+    def get_cbstats(self, group: str, bucket: str, server: str) -> dict:
+        try:
+            stats = self.memcached.get_stats(server, self.CB_STATS_PORT, bucket, group,
+                                             max_retry=0)
+        except Exception as e:
+            logger.warning("{} failed to get {} stats from server {}: {}"
+                           .format(type(self).__name__, group or "all", server, e))
+            return {}
+        return typed_stats(stats)
+
+
+class CBStatsMemory(CBStatsCollector):
+    COLLECTOR = "cbstats_memory"
+    METRICS = (
+        "ep_mem_used_primary"
+    )
 
     def _get_stats_from_server(self, bucket: str, server: str):
         stats = {}
         try:
-            uname, pwd = self.cluster_spec.rest_credentials
-            stdout, returncode = run_cbstats("memory", server, self.CB_STATS_PORT, uname, pwd,
-                                             bucket)
-            if returncode != 0:
-                logger.warning("CBStatsMemory failed to get memory stats from server: {}"
-                               .format(server))
-                return stats
-
-            data = json.loads(stdout)
+            data = self.get_cbstats("memory", bucket, server)
             for metric, value in data.items():
                 if metric in self.METRICS:
                     if metric in stats:
@@ -47,8 +56,8 @@ class CBStatsMemory(Collector):
     def sample(self):
         for bucket in self.get_buckets():
             stats = {}
-            for node in self.nodes:
-                temp_stats = self._get_memory_stats(bucket, node)
+            for temp_stats in self.fan_out(lambda node: self._get_memory_stats(bucket, node),
+                                           self.nodes):
                 for st in temp_stats:
                     if st in stats:
                         stats[st] += temp_stats[st]
@@ -70,9 +79,8 @@ class CBStatsMemory(Collector):
             self.mc.add_server(node)
 
 
-class CBStatsAll(Collector):
+class CBStatsAll(CBStatsCollector):
     COLLECTOR = "cbstats_all"
-    CB_STATS_PORT = 11209
     METRICS = (
         "mem_used_secondary",
         "ep_magma_total_mem_used",
@@ -87,22 +95,10 @@ class CBStatsAll(Collector):
         "ep_magma_data_blocks_space_reduction_estimate_pct"
     )
 
-    def __init__(self, settings, test):
-        super().__init__(settings)
-        extract_cb_any(filename='couchbase')
-        self.cluster_spec = test.cluster_spec
-
     def _get_stats_from_server(self, bucket: str, server: str):
         stats = {}
         try:
-            uname, pwd = self.cluster_spec.rest_credentials
-            stdout, returncode = run_cbstats("all", server, self.CB_STATS_PORT, uname, pwd, bucket)
-            if returncode != 0:
-                logger.warning("CBStatsAll failed to get stats from server: {}".format(server))
-                return stats
-
-            data = json.loads(stdout)
-
+            data = self.get_cbstats("", bucket, server)
             for metric, value in data.items():
                 if metric in self.METRICS:
                     if metric in stats:
@@ -127,8 +123,9 @@ class CBStatsAll(Collector):
     def sample(self):
         for bucket in self.get_buckets():
             stats = {}
-            for node in self.nodes:
-                temp_stats = self._get_cbstats_all_stats(bucket, node)
+            for temp_stats in self.fan_out(
+                lambda node: self._get_cbstats_all_stats(bucket, node), self.nodes
+            ):
                 for st in temp_stats:
                     if st in stats:
                         stats[st] += temp_stats[st]
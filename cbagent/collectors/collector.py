@@ -1,12 +1,14 @@
+import os
 import socket
 import sys
 import time
+from concurrent.futures import ThreadPoolExecutor
 from functools import cached_property
-from threading import Thread
-from typing import Optional, Union
+from typing import Callable, Iterable, Optional, Union
 
 import requests
 
+from cbagent.collectors.libstats.restcache import RestCache
 from cbagent.metadata_client import MetadataClient
 from cbagent.stores import PerfStore
 from logger import logger
@@ -16,6 +18,10 @@ class Collector:
 
     COLLECTOR = None
 
+    SCHEDULABLE = True  # Whether sample() can be driven by CollectorScheduler
+
+    MAX_FAN_OUT = 16  # Concurrent requests per collector within a sample
+
     def __init__(self, settings):
         self.session = requests.Session()
         self.cloud = settings.cloud
@@ -40,11 +46,17 @@ class Collector:
         if self.remote_workers:
             self.remote_worker_home = settings.remote_worker_home
 
+        self.rest_cache = None
+        if getattr(settings, 'rest_cache_dir', None):
+            self.rest_cache = RestCache(settings.rest_cache_dir)
+
         self.store = PerfStore(settings.cbmonitor_host)
         self.mc = MetadataClient(settings)
 
         self.metrics = set()
-        self.updater = None
+
+        self.executor = None
+        self.executor_pid = None  # Thread pools don't survive a fork
 
     def _get_url(self, server: str, port: str, path: str) -> str:
         scheme = "http"
@@ -61,28 +73,40 @@ class Collector:
         server = server or self.master_node
 
         try:
-            url = self._get_url(server, port, path)
-            params = {"url": url}
+            if self.rest_cache is None:
+                return self.fetch_http(path, server, port, json)
+            return self.rest_cache.get(key=(server, port, path, json),
+                                       ttl=self.interval / 2,
+                                       fetch=lambda: self.fetch_http(path, server, port, json))
+        except (requests.ConnectionError, requests.HTTPError):
+            # Retried outside of the cache, so other collectors don't wait for the refresh
+            return self.refresh_nodes_and_retry(path, server, port, json)
 
-            if not self.cloud_enabled:
-                # When we are on cloud, self.session is a RestHelper so we shouldn't add auth
-                # because it will do it for us. When not on cloud, we need it.
-                params.update({
-                    'auth': self.auth,
-                    'verify': False
-                })
+    def fetch_http(self, path: str, server: str, port: int = 8091,
+                   json: bool = True) -> Union[dict, str]:
+        """Send a single GET request, bypassing the cache and raising on failure."""
+        url = self._get_url(server, port, path)
+        params = {"url": url}
 
-            r = self.session.get(**params)
+        if not self.cloud_enabled:
+            # When we are on cloud, self.session is a RestHelper so we shouldn't add auth
+            # because it will do it for us. When not on cloud, we need it.
+            params.update({
+                'auth': self.auth,
+                'verify': False
+            })
 
-            if r.status_code in (200, 201, 202):
-                return json and r.json() or r.text
-            else:
-                logger.warn("Bad response (GET): {}".format(url))
-                logger.warn("Response text: {}".format(r.text))
-                return self.refresh_nodes_and_retry(path, server, port)
+        try:
+            r = self.session.get(**params)
         except requests.ConnectionError:
             logger.warn("Connection error: {}".format(url))
-            return self.refresh_nodes_and_retry(path, server, port, json)
+            raise
+
+        if r.status_code in (200, 201, 202):
+            return json and r.json() or r.text
+        logger.warn("Bad response (GET): {}".format(url))
+        logger.warn("Response text: {}".format(r.text))
+        raise requests.HTTPError("Bad response (GET): {}".format(url), response=r)
 
     def post_http(self, path: str, server: Optional[str] = None, port: int = 8091,
                   json_out: bool = True, json_data: Optional[dict] = None) -> Union[dict, str]:
@@ -133,7 +157,10 @@ class Collector:
         except socket.error:
             return False
         else:
-            if not self.get_http(path="/pools", server=node).get("pools"):
+            try:
+                if not self.fetch_http(path="/pools", server=node).get("pools"):
+                    return False
+            except (requests.ConnectionError, requests.HTTPError):
                 return False
         return True
 
@@ -172,6 +199,23 @@ class Collector:
                     continue
                 yield hostname
 
+    def fan_out(self, func: Callable, items: Iterable, *args, **kwargs) -> list:
+        """Call `func(item, *args, **kwargs)` for all items concurrently.
+
+        Used to request the stats of all buckets and nodes of a sample at
+        once. Results are returned in the order of items, the first exception
+        is re-raised.
+        """
+        items = list(items)
+        if len(items) <= 1:
+            return [func(item, *args, **kwargs) for item in items]
+
+        if self.executor_pid != os.getpid():
+            self.executor = ThreadPoolExecutor(self.MAX_FAN_OUT)
+            self.executor_pid = os.getpid()
+        futures = [self.executor.submit(func, item, *args, **kwargs) for item in items]
+        return [future.result() for future in futures]
+
     def get_all_indexes(self):
         if self.collections:
             scopes = self.indexes[self.buckets[0]]
@@ -193,25 +237,20 @@ class Collector:
             kwargs['bucket'] = self.serverless_db_names[bucket]
         return await self.store.append_async(*args, **kwargs)
 
-    def _update_metric_metadata(self, metrics, bucket=None, index=None, server=None):
+    def update_metric_metadata(self, metrics, bucket=None, index=None, server=None):
         if bucket and bucket in self.serverless_db_names:
             bucket = self.serverless_db_names[bucket]
 
+        new_metrics = {}
         for metric in metrics:
             metric = metric.replace('/', '_')
             metric_hash = hash((metric, bucket, index, server))
             if metric_hash not in self.metrics:
-                self.metrics.add(metric_hash)
-                self.mc.add_metric(metric, bucket, index, server, self.COLLECTOR)
-
-    def update_metric_metadata(self, *args, **kwargs):
-        if self.updater is None or not self.updater.is_alive():
-            self.updater = Thread(
-                target=self._update_metric_metadata, args=args, kwargs=kwargs
-            )
-            self.updater.daemon = True
-            self.updater.start()
-            self.updater.join()
+                new_metrics[metric] = metric_hash
+        # Metrics that failed to register are retried with the next sample
+        if new_metrics and self.mc.add_metrics(list(new_metrics), bucket, index, server,
+                                               self.COLLECTOR):
+            self.metrics.update(new_metrics.values())
 
     def sample(self):
         raise NotImplementedError
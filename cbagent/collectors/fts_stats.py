@@ -78,9 +78,8 @@ class FTSCollector(Collector):
 
     def update_metadata(self):
         self.mc.add_cluster()
-        for metric in self.METRICS:
-            for host in self.fts_nodes:
-                self.mc.add_metric(metric, server=host, collector=self.COLLECTOR)
+        for host in self.fts_nodes:
+            self.mc.add_metrics(self.METRICS, server=host, collector=self.COLLECTOR)
 
     def sample(self):
         self.collect_stats()
@@ -134,8 +133,7 @@ class ElasticStats(FTSCollector):
 
     def update_metadata(self):
         self.mc.add_cluster()
-        for metric in self.METRICS:
-            self.mc.add_metric(metric, collector=self.COLLECTOR)
+        self.mc.add_metrics(self.METRICS, collector=self.COLLECTOR)
 
     def sample(self):
         self.collect_stats()
@@ -0,0 +1,122 @@
+from itertools import product
+from typing import Dict, Optional
+
+from cbagent.collectors.cbstats import CBStatsCollector
+from cbagent.collectors.libstats.ioamp import IOCounters
+from cbagent.collectors.libstats.sshpool import SSHPool
+from perfrunner.helpers.memcached import disk_ops
+
+
+class IOAmplification(CBStatsCollector):
+
+    """Per-node I/O amplification over every sampling interval.
+
+    Every sample takes the physical (device) and virtual (memcached syscall)
+    I/O counters of the KV nodes together with their get/set counts and stores
+    the ratios of the deltas, so that amplification spikes (e.g. during
+    compaction) show up as such instead of disappearing in a phase average.
+    Intervals without gets or sets produce no per-get or per-set metrics.
+    """
+
+    COLLECTOR = "io_amplification"
+
+    SCHEDULABLE = False  # Remote sampling forks processes via Fabric
+
+    KINDS = "physical", "virtual"
+
+    SET_METRICS = (
+        "write_amp",
+        "write_bytes_per_set",
+        "write_io_per_set",
+        "read_bytes_per_set",
+        "read_io_per_set",
+    )
+
+    GET_METRICS = (
+        "read_amp",
+        "read_bytes_per_get",
+    )
+
+    METRICS = tuple(
+        "{}_{}".format(kind, metric)
+        for kind, metric in product(KINDS, SET_METRICS + GET_METRICS)
+    )
+
+    def __init__(self, settings, test):
+        super().__init__(settings, test)
+        self.nodes = test.rest.get_active_nodes_by_role(self.master_node, "kv")
+        self.doc_size = test.doc_size  # Set by the test for the running phase
+        self.partitions = {'client': {}, 'server': {'data': test.cluster_spec.data_path}}
+
+        ssh_pool = None
+        if getattr(settings, 'ssh_pool', False):
+            ssh_pool = SSHPool(user=self.ssh_username, password=self.ssh_password)
+        self.sampler = IOCounters(hosts=self.nodes,
+                                  workers=[],
+                                  user=self.ssh_username,
+                                  password=self.ssh_password,
+                                  interval=self.interval,
+                                  ssh_pool=ssh_pool)
+
+        self.previous: Dict[str, dict] = {}
+
+    def get_ops(self, node: str) -> Optional[Dict[str, int]]:
+        ops = {'get_ops': 0, 'set_ops': 0}
+        for bucket in self.get_buckets():
+            stats = self.get_cbstats("", bucket, node)
+            if not stats:
+                return None
+            for op, value in disk_ops(stats).items():
+                ops[op] += value
+        return ops
+
+    def amplification(self, before: dict, after: dict) -> Dict[str, float]:
+        gets = after['ops']['get_ops'] - before['ops']['get_ops']
+        sets = after['ops']['set_ops'] - before['ops']['set_ops']
+        if gets < 0 or sets < 0:  # Restarted server or reset stats
+            return {}
+
+        stats = {}
+        for kind in self.KINDS:
+            if not before.get(kind) or not after.get(kind):
+                continue
+            delta = {counter: after[kind][counter] - before[kind][counter]
+                     for counter in after[kind]}
+            if min(delta.values()) < 0:
+                continue
+            if sets:
+                stats[kind + "_write_amp"] = delta['nwb'] / (sets * self.doc_size)
+                stats[kind + "_write_bytes_per_set"] = delta['nwb'] / sets
+                stats[kind + "_write_io_per_set"] = delta['nw'] / sets
+                stats[kind + "_read_bytes_per_set"] = delta['nrb'] / sets
+                stats[kind + "_read_io_per_set"] = delta['nr'] / sets
+            if gets:
+                stats[kind + "_read_amp"] = delta['nr'] / gets
+                stats[kind + "_read_bytes_per_get"] = delta['nrb'] / gets
+        return stats
+
+    def sample(self):
+        if not self.sampler.cache:
+            self.sampler.cache_devices(self.partitions, client_side=False)
+
+        counters = self.sampler.get_server_samples(self.partitions)
+        for node in self.nodes:
+            current = counters.get(node)
+            ops = self.get_ops(node)
+            if not isinstance(current, dict) or ops is None:
+                self.previous.pop(node, None)
+                continue
+            current['ops'] = ops
+
+            if node in self.previous:
+                stats = self.amplification(self.previous[node], current)
+                if stats:
+                    self.update_metric_metadata(stats.keys(), server=node)
+                    self.append_to_store(stats, cluster=self.cluster, server=node,
+                                         collector=self.COLLECTOR)
+            self.previous[node] = current
+
+    def update_metadata(self):
+        self.mc.add_cluster()
+        for node in self.nodes:
+            self.mc.add_server(node)
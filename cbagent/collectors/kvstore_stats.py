@@ -1,13 +1,10 @@
 import json
 
-from cbagent.collectors.collector import Collector
-from logger import logger
-from perfrunner.helpers.local import extract_cb_any, run_cbstats
+from cbagent.collectors.cbstats import CBStatsCollector
 
 
-class KVStoreStats(Collector):
+class KVStoreStats(CBStatsCollector):
     COLLECTOR = "kvstore_stats"
-    CB_STATS_PORT = 11209
     METRICS_ACROSS_SHARDS = (
         "BlockCacheQuota",
         "WriteCacheQuota",
@@ -159,23 +156,13 @@ class KVStoreStats(Collector):
     )
 
     def __init__(self, settings, test):
-        super().__init__(settings)
-        extract_cb_any(filename='couchbase')
+        super().__init__(settings, test)
         self.collect_per_server_stats = test.collect_per_server_stats
-        self.cluster_spec = test.cluster_spec
 
     def _get_stats_from_server(self, bucket: str, server: str):
         stats = {}
         try:
-            uname, pwd = self.cluster_spec.rest_credentials
-            stdout, returncode = run_cbstats("kvstore", server, self.CB_STATS_PORT, uname, pwd,
-                                             bucket)
-            if returncode != 0:
-                logger.warning("KVStoreStats failed to get kvstore stats from server: {}"
-                               .format(server))
-                return stats
-
-            data = json.loads(stdout)
+            data = self.get_cbstats("kvstore", bucket, server)
             for shard, metrics in data.items():
                 if not shard.endswith(":magma"):
                     continue
@@ -210,22 +197,23 @@ class KVStoreStats(Collector):
         return node_stats
 
     def _get_num_shards(self, bucket: str, server: str):
-        uname, pwd = self.cluster_spec.rest_credentials
-        stdout, returncode = run_cbstats("workload", server, self.CB_STATS_PORT, uname, pwd, bucket)
-        if returncode != 0:
-            logger.warning("KVStoreStats failed to get workload stats from server: {}"
-                           .format(server))
-            return 1
-
-        data = json.loads(stdout)
-        return data["ep_workload:num_shards"]
+        data = self.get_cbstats("workload", bucket, server)
+        return data.get("ep_workload:num_shards", 1)
 
     def sample(self):
+        # Every (bucket, node) pair is requested once per sample
+        buckets = list(self.get_buckets())
+        num_shards_per_bucket = dict(zip(
+            buckets, self.fan_out(self._get_num_shards, buckets, self.master_node)))
+        pairs = [(bucket, node) for bucket in buckets for node in self.nodes]
+        node_stats = dict(zip(
+            pairs, self.fan_out(lambda pair: self._get_kvstore_stats(*pair), pairs)))
+
         if self.collect_per_server_stats:
             for node in self.nodes:
-                for bucket in self.get_buckets():
-                    num_shards = self._get_num_shards(bucket, self.master_node)
-                    stats = self._get_kvstore_stats(bucket, node)
+                for bucket in buckets:
+                    num_shards = num_shards_per_bucket[bucket]
+                    stats = dict(node_stats[bucket, node])
                     for metric in self.METRICS_AVERAGE_PER_NODE_PER_SHARD:
                         if metric in stats:
                             if stats[metric] / num_shards >= 50 and metric not in self.NO_CAP:
@@ -239,12 +227,12 @@ class KVStoreStats(Collector):
                                              bucket=bucket, server=node,
                                              collector=self.COLLECTOR)
 
-        for bucket in self.get_buckets():
+        for bucket in buckets:
             stats = {}
-            num_shards = self._get_num_shards(bucket, self.master_node)
+            num_shards = num_shards_per_bucket[bucket]
             num_nodes = len(self.nodes)
             for node in self.nodes:
-                temp_stats = self._get_kvstore_stats(bucket, node)
+                temp_stats = node_stats[bucket, node]
                 for st in temp_stats:
                     if st in stats:
                         stats[st] += temp_stats[st]
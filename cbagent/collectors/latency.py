@@ -1,5 +1,6 @@
 import asyncio
 import csv
+import json
 from pathlib import Path
 from typing import Iterator
 from uuid import uuid4
@@ -9,6 +10,8 @@ from fabric.api import cd, execute, get, parallel, run
 
 from cbagent.collectors.collector import Collector
 from cbagent.settings import CbAgentSettings
+from spring.histogram import MERGED_HISTOGRAMS, LatencyHistogram
+from spring.reservoir import is_binary, iter_binary
 
 
 class Latency(Collector):
@@ -17,6 +20,8 @@ class Latency(Collector):
 
     METRICS = ()
 
+    SCHEDULABLE = False
+
     def __init__(self, settings):
         super().__init__(settings)
         self.stat_dir = 'spring_latency/master_{}'.format(self.master_node)
@@ -25,9 +30,7 @@ class Latency(Collector):
         self.mc.add_cluster()
         for bucket in self.get_buckets():
             self.mc.add_bucket(bucket)
-            for metric in self.METRICS:
-                self.mc.add_metric(metric, bucket=bucket,
-                                   collector=self.COLLECTOR)
+            self.mc.add_metrics(self.METRICS, bucket=bucket, collector=self.COLLECTOR)
 
     def sample(self):
         pass
@@ -38,10 +41,17 @@ class KVLatency(Latency):
     COLLECTOR = "spring_latency"
 
     METRICS = ["latency_get", "latency_set", "latency_durable_set",
-               "latency_total_get", "latency_total_set", "latency_total_durable_set"]
+               "latency_total_get", "latency_total_set", "latency_total_durable_set",
+               # Reported by open-loop workloads only
+               "latency_uncorrected_get", "latency_uncorrected_set",
+               "latency_uncorrected_durable_set",
+               "latency_total_uncorrected_get", "latency_total_uncorrected_set",
+               "latency_total_uncorrected_durable_set"]
 
     PATTERN = '*kv-worker-*'
 
+    HISTOGRAM_PATTERN = 'kv-histograms-*'  # Written instead of worker files by latency_histograms
+
     def __init__(self, settings: CbAgentSettings):
         super().__init__(settings)
         if self.collections is not None:
@@ -71,9 +81,8 @@ class KVLatency(Latency):
             for group in set(self.target_groups[bucket].values()):
                 bucket_group = self.bucket_stat_group(bucket, group)
                 self.mc.add_bucket(bucket_group)
-                for metric in self.METRICS:
-                    self.mc.add_metric(metric, bucket=bucket_group,
-                                       collector=self.COLLECTOR)
+                self.mc.add_metrics(self.METRICS, bucket=bucket_group,
+                                    collector=self.COLLECTOR)
 
     def collect(self):
         pass
@@ -83,15 +92,23 @@ class KVLatency(Latency):
 
         def task():
             with cd(self.remote_worker_home), cd('perfrunner'):
-                pattern = '{}/{}'.format(self.stat_dir, self.PATTERN)
-                r = run('stat {}'.format(pattern), quiet=True)
-                if not r.return_code:
-                    run('for f in {}; do mv $f $f-{}; done'.format(pattern, uuid4().hex[:6]))
-                    get(pattern, local_path='./{}'.format(self.stat_dir))
+                for pattern in filter(None, (self.PATTERN, self.HISTOGRAM_PATTERN)):
+                    pattern = '{}/{}'.format(self.stat_dir, pattern)
+                    r = run('stat {}'.format(pattern), quiet=True)
+                    if not r.return_code:
+                        run('for f in {}; do mv $f $f-{}; done'.format(pattern, uuid4().hex[:6]))
+                        get(pattern, local_path='./{}'.format(self.stat_dir))
+                if self.HISTOGRAM_PATTERN:
+                    # Histograms are merged per phase, don't fetch them again
+                    run('rm -f {}/{}'.format(self.stat_dir, self.HISTOGRAM_PATTERN))
 
         execute(parallel(task), hosts=self.workers)
 
     def read_stats(self, filename: str) -> Iterator:
+        if is_binary(filename):
+            yield from iter_binary(filename)
+            return
+
         with open(filename) as fh:
             reader = csv.reader(fh)
             for line in reader:
@@ -106,6 +123,8 @@ class KVLatency(Latency):
 
             # Latency in ms
             data = {'latency_' + operation: float(latency_single) * 1000}
+            if latency_total:
+                data['latency_total_' + operation] = float(latency_total) * 1000
 
             await self.append_to_store_async(data=data,
                                              timestamp=int(timestamp),
@@ -113,24 +132,48 @@ class KVLatency(Latency):
                                              bucket=bucket_group,
                                              collector=self.COLLECTOR)
 
-            if latency_total:
-                # Latency in ms
-                data = {'latency_total_' + operation: float(latency_total) * 1000}
-
-                await self.append_to_store_async(data=data,
-                                                 timestamp=int(timestamp),
-                                                 cluster=self.cluster,
-                                                 bucket=bucket_group,
-                                                 collector=self.COLLECTOR)
-
     async def post_all_results(self):
-        async with ClientSession(connector=TCPConnector()) as self.store.async_session:
+        async with ClientSession(connector=TCPConnector()) as self.store.async_session, \
+                self.store.buffered():
             await asyncio.gather(*[
                 self.post_results(fn, bucket)
                 for bucket in self.get_buckets()
                 for fn in Path(self.stat_dir).glob(self.PATTERN + bucket + "*")
             ])
 
+    def merge_histograms(self):
+        """Merge the histograms of all workloads by bucket (stat group) and operation.
+
+        The result is written to the phase directory, where MetricHelper finds
+        it when computing latency percentiles.
+        """
+        if not self.HISTOGRAM_PATTERN:
+            return
+
+        merged = {}
+        for filename in Path(self.stat_dir).glob(self.HISTOGRAM_PATTERN):
+            with open(filename) as fh:
+                for entry in json.load(fh):
+                    bucket = entry['bucket']
+                    target_group = self.target_groups.get(bucket, {}).get(entry['target'], '')
+                    histograms = merged.setdefault(self.bucket_stat_group(bucket, target_group),
+                                                   {})
+                    histogram = LatencyHistogram.from_sparse(entry['counts'])
+                    if entry['operation'] in histograms:
+                        histograms[entry['operation']].merge(histogram)
+                    else:
+                        histograms[entry['operation']] = histogram
+            filename.unlink()
+
+        if merged:
+            dest = Path(self.cluster)
+            dest.mkdir(exist_ok=True)
+            with open(dest / MERGED_HISTOGRAMS, 'w') as fh:
+                json.dump({
+                    bucket_group: {op: h.to_sparse() for op, h in histograms.items()}
+                    for bucket_group, histograms in merged.items()
+                }, fh)
+
     def move_remote_stat_files(self):
         def task():
             with cd(self.remote_worker_home), cd('perfrunner'):
@@ -158,6 +201,7 @@ class KVLatency(Latency):
         loop.run_until_complete(self.post_all_results())
         loop.close()
 
+        self.merge_histograms()
         self.move_local_stat_files()
 
 
@@ -168,3 +212,5 @@ class QueryLatency(KVLatency):
     METRICS = "latency_query",
 
     PATTERN = 'query-worker-*'
+
+    HISTOGRAM_PATTERN = None
@@ -0,0 +1,57 @@
+from typing import Dict
+
+from cbagent.collectors.libstats.iostat import DiskStats
+from cbagent.collectors.libstats.remotestats import parallel_task
+
+
+class IOCounters(DiskStats):
+
+    """Cumulative I/O counters of the data device and of the memcached process.
+
+    Physical counters come from /proc/diskstats, virtual ones (system calls
+    and bytes passed to them, including page cache hits) from /proc/<pid>/io
+    of memcached. Both are reported as nr/nrb/nw/nwb: the number of reads,
+    bytes read, the number of writes and bytes written.
+    """
+
+    def get_device_counters(self, device: str) -> Dict[str, int]:
+        device_name = device.split('/')[-1]
+
+        # https://www.kernel.org/doc/Documentation/ABI/testing/procfs-diskstats
+        for line in self.read_proc('/proc/diskstats').splitlines():
+            stats = line.split()
+            if len(stats) > 9 and stats[2] == device_name:
+                sector_size = self.cached(('sector_size', device), self.get_sector_size,
+                                          device)
+                return {
+                    'nr': int(stats[3]),
+                    'nrb': int(stats[5]) * sector_size,
+                    'nw': int(stats[7]),
+                    'nwb': int(stats[9]) * sector_size,
+                }
+        return {}
+
+    def get_process_counters(self) -> Dict[str, int]:
+        stdout = self.run('cat /proc/$(pidof memcached)/io', quiet=True)
+        if stdout.return_code:
+            return {}
+
+        stats = {}
+        for line in stdout.splitlines():
+            name, _, value = line.partition(':')
+            stats[name.strip()] = int(value)
+        return {
+            'nr': stats['syscr'],
+            'nrb': stats['rchar'],
+            'nw': stats['syscw'],
+            'nwb': stats['wchar'],
+        }
+
+    @parallel_task(server_side=True)
+    def get_server_samples(self, partitions: dict) -> Dict[str, Dict[str, int]]:
+        samples = {'virtual': self.get_process_counters()}
+        device, lvm_swraid = self.cached(('device', partitions['server']['data']),
+                                         self.get_device_name, partitions['server']['data'])
+        if device is not None and not lvm_swraid:
+            samples['physical'] = self.get_device_counters(device)
+        return samples
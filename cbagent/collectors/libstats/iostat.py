@@ -1,6 +1,7 @@
 from typing import Dict, Optional, Tuple
 
 from cbagent.collectors.libstats.remotestats import RemoteStats, parallel_task
+from logger import logger
 
 
 class IOStat(RemoteStats):
@@ -38,6 +39,25 @@ class IOStat(RemoteStats):
             data[header[i]] = value
         return data
 
+    def resolve_devices(self, partitions: Dict[str, str]) -> dict:
+        for path in partitions.values():
+            self.cached(('device', path), self.get_device_name, path)
+        return self.cache.get(self.host, {})
+
+    @parallel_task(server_side=True)
+    def resolve_server_devices(self, partitions: dict) -> dict:
+        return self.resolve_devices(partitions['server'])
+
+    @parallel_task(server_side=False)
+    def resolve_client_devices(self, partitions: dict) -> dict:
+        return self.resolve_devices(partitions['client'])
+
+    def cache_devices(self, partitions: dict, client_side: bool = True):
+        """Resolve device names once per run instead of on every sample."""
+        self.warm_cache(self.resolve_server_devices(partitions))
+        if client_side and self.workers:
+            self.warm_cache(self.resolve_client_devices(partitions))
+
     @parallel_task(server_side=True)
     def get_server_samples(self, partitions: dict) -> dict:
         return self.get_samples(partitions['server'], self.METRICS)
@@ -51,7 +71,7 @@ class IOStat(RemoteStats):
         samples = {}
 
         for purpose, path in partitions.items():
-            device, _ = self.get_device_name(path)
+            device, _ = self.cached(('device', path), self.get_device_name, path)
             if device is not None:
                 stats = self.get_iostat(device)
                 for metric, column, multiplier in metrics:
@@ -63,24 +83,41 @@ class IOStat(RemoteStats):
 
 class DiskStats(IOStat):
 
-    def get_disk_stats(self, device: str):
-        device_name = device.split('/')[-1]
-
-        # https://www.kernel.org/doc/Documentation/ABI/testing/procfs-diskstats
-        stdout = self.run("grep '{}' /proc/diskstats".format(device_name))
-        stats = stdout.split()
-        sectors_read, sectors_written = int(stats[5]), int(stats[9])
-
+    def get_sector_size(self, device: str) -> int:
         # https://www.kernel.org/doc/Documentation/block/queue-sysfs.txt
         if 'nvme' in device and 'p1' not in device and 'p2' not in device:
+            device_name = device.split('/')[-1]
             stdout = self.run('cat /sys/block/{}/queue/hw_sector_size'.format(device_name))
         else:
             parent = self.run('lsblk -no pkname {}'.format(device)).strip()
             stdout = self.run('cat /sys/block/{}/queue/hw_sector_size'.format(parent))
-        sector_size = int(stdout)
+        return int(stdout)
+
+    def get_disk_stats(self, device: str) -> Optional[Tuple[int, int]]:
+        device_name = device.split('/')[-1]
+
+        # https://www.kernel.org/doc/Documentation/ABI/testing/procfs-diskstats
+        for line in self.read_proc('/proc/diskstats').splitlines():
+            stats = line.split()
+            if len(stats) > 9 and stats[2] == device_name:
+                break
+        else:
+            logger.warn('Device {} not found in /proc/diskstats on {}'.format(
+                device_name, self.host))
+            return None
+        sectors_read, sectors_written = int(stats[5]), int(stats[9])
+
+        sector_size = self.cached(('sector_size', device), self.get_sector_size, device)
 
         return sectors_read * sector_size, sectors_written * sector_size
 
+    def resolve_devices(self, partitions: dict) -> dict:
+        for path in partitions.values():
+            device, lvm_swraid = self.cached(('device', path), self.get_device_name, path)
+            if device is not None and not lvm_swraid:
+                self.cached(('sector_size', device), self.get_sector_size, device)
+        return self.cache.get(self.host, {})
+
     @parallel_task(server_side=True)
     def get_server_samples(self, partitions: dict) -> dict:
         return self.get_samples(partitions['server'])
@@ -88,9 +125,13 @@ class DiskStats(IOStat):
     def get_samples(self, partitions: dict) -> dict:
         samples = {}
         for purpose, partition in partitions.items():
-            device, lvm_swraid = self.get_device_name(partition)
+            device, lvm_swraid = self.cached(('device', partition), self.get_device_name,
+                                             partition)
             if device is not None and not lvm_swraid:
-                bytes_read, bytes_written = self.get_disk_stats(device)
+                disk_stats = self.get_disk_stats(device)
+                if disk_stats is None:
+                    continue
+                bytes_read, bytes_written = disk_stats
                 samples[purpose + '_bytes_read'] = bytes_read
                 samples[purpose + '_bytes_written'] = bytes_written
         return samples
@@ -5,7 +5,7 @@ class MemInfo(RemoteStats):
 
     def get_mem_stats(self) -> dict:
         stats = {}
-        stdout = self.run('cat /proc/meminfo')
+        stdout = self.read_proc('/proc/meminfo')
         for line in stdout.splitlines():
             fields = line.split()
             metric, value = fields[0], fields[1]
@@ -4,6 +4,8 @@ from decorator import decorator
 from fabric.api import env, hide, parallel, run, settings
 from fabric.tasks import execute
 
+from logger import logger
+
 env.shell = '/bin/bash -l -c -o pipefail'
 env.keepalive = 60
 env.timeout = 60
@@ -20,6 +22,9 @@ def parallel_task(server_side=True):
         else:
             hosts = self.workers
 
+        if self.ssh_pool is not None:
+            return self.ssh_pool.execute(task, hosts, *args, **kargs)
+
         with settings(user=self.user, password=self.password, warn_only=True):
             with hide("running", "output"):
                 return execute(parallel(task), *args, hosts=hosts, **kargs)
@@ -29,15 +34,51 @@ def parallel_task(server_side=True):
 
 class RemoteStats:
 
-    def __init__(self, hosts, workers, user, password, interval=None):
+    def __init__(self, hosts, workers, user, password, interval=None, ssh_pool=None):
         self.hosts = hosts
         self.user = user
         self.password = password
         self.workers = workers
         self.interval = interval
+        self.ssh_pool = ssh_pool
+        self.cache = {}
+
+    @property
+    def host(self) -> str:
+        if self.ssh_pool is not None:
+            return self.ssh_pool.host
+        return env.host_string
 
     def run(self, *args, **kwargs):
         try:
+            if self.ssh_pool is not None:
+                return self.ssh_pool.run(*args, **kwargs)
             return run(*args, **kwargs)
         except KeyboardInterrupt:
             sys.exit()
+
+    def read_proc(self, path: str) -> str:
+        """Read a /proc file, using the streaming sampler when it is available."""
+        if self.ssh_pool is not None:
+            try:
+                return self.ssh_pool.read_proc(path, self.interval or 1)
+            except Exception as e:
+                logger.warn('Streaming {} from {} failed, reading it directly: {}'.format(
+                    path, self.host, e))
+        return self.run('cat {}'.format(path))
+
+    def cached(self, key, func, *args):
+        """Return a per-host value that doesn't change during the run.
+
+        Values resolved inside Fabric tasks are lost together with the forked
+        task process, use warm_cache() to keep them in the parent.
+        """
+        cache = self.cache.setdefault(self.host, {})
+        if key not in cache:
+            cache[key] = func(*args)
+        return cache[key]
+
+    def warm_cache(self, results: dict):
+        for host, cache in results.items():
+            if isinstance(cache, dict):
+                self.cache.setdefault(host, {}).update(cache)
@@ -0,0 +1,68 @@
+import fcntl
+import hashlib
+import os
+import pickle
+import threading
+import time
+from typing import Any, Callable, Hashable
+
+
+class RestCache:
+
+    """A snapshot of REST responses shared by all collectors of a test.
+
+    Responses are keyed by (node, port, path, ...) and stored as files in a
+    common directory, so collectors running in separate processes share them
+    too. A response is reused while it is younger than the reader's TTL,
+    normally half of the sampling interval: collectors that sample on the same
+    tick share one request, the next tick fetches a fresh response.
+
+    Concurrent readers of a stale entry are serialized by a file lock, only
+    the first one talks to the cluster. Failed requests are never cached and
+    `fetch` must not retry: an exception releases the lock right away, and
+    the caller retries outside of the cache.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def filename(self, key: Hashable) -> str:
+        digest = hashlib.sha1(repr(key).encode()).hexdigest()
+        return os.path.join(self.path, digest)
+
+    @staticmethod
+    def read(filename: str, ttl: float) -> tuple[bool, Any]:
+        try:
+            if time.time() - os.stat(filename).st_mtime < ttl:
+                with open(filename, 'rb') as fh:
+                    return True, pickle.load(fh)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            pass
+        return False, None
+
+    @staticmethod
+    def write(filename: str, value: Any):
+        tmp = '{}.{}.{}'.format(filename, os.getpid(), threading.get_ident())
+        with open(tmp, 'wb') as fh:
+            pickle.dump(value, fh)
+        os.replace(tmp, filename)
+
+    def get(self, key: Hashable, ttl: float, fetch: Callable[[], Any]) -> Any:
+        filename = self.filename(key)
+        hit, value = self.read(filename, ttl)
+        if hit:
+            return value
+
+        with open(filename + '.lock', 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                # Another collector may have refreshed the entry in the meantime
+                hit, value = self.read(filename, ttl)
+                if hit:
+                    return value
+
+                value = fetch()
+                self.write(filename, value)
+                return value
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
@@ -0,0 +1,216 @@
+import shlex
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import paramiko
+
+from logger import logger
+
+
+class CommandResult(str):
+
+    """Command output that mimics the result object returned by Fabric."""
+
+    def __new__(cls, stdout: str, return_code: int):
+        result = super().__new__(cls, stdout)
+        result.return_code = return_code
+        result.succeeded = return_code == 0
+        result.failed = not result.succeeded
+        return result
+
+
+class SSHPool:
+
+    """Long-lived SSH sessions, one per host, shared by the samplers of a collector.
+
+    Every host gets a single authenticated transport that multiplexes command
+    channels, so sampling doesn't pay for a process fork and an SSH handshake
+    on every tick. Collectors run in separate processes and SSH transports
+    cannot be shared across them, so each collector owns its pool. Connections
+    are opened lazily, which makes the pool safe to create before the collector
+    process is forked.
+    """
+
+    KEEPALIVE = 60  # seconds
+
+    TIMEOUT = 60  # seconds
+
+    SHELL = '/bin/bash -l -c -o pipefail'  # The env.shell that remotestats sets for Fabric
+
+    def __init__(self, user: str, password: str):
+        self.user = user
+        self.password = password
+        self.clients: Dict[str, paramiko.SSHClient] = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.streamers: Dict[str, ProcStreamer] = {}
+        self.executor = None
+
+    @property
+    def host(self) -> Optional[str]:
+        """Return the host that the current thread is working with."""
+        return getattr(self.local, 'host', None)
+
+    def connect(self, host: str) -> paramiko.SSHClient:
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        client.connect(host, username=self.user, password=self.password,
+                       timeout=self.TIMEOUT)
+        client.get_transport().set_keepalive(self.KEEPALIVE)
+        return client
+
+    def get_client(self, host: str) -> paramiko.SSHClient:
+        with self.lock:
+            client = self.clients.get(host)
+            if client is None or not client.get_transport() or \
+                    not client.get_transport().is_active():
+                client = self.clients[host] = self.connect(host)
+            return client
+
+    def run(self, command: str, host: Optional[str] = None, quiet: bool = False,
+            **kwargs) -> CommandResult:
+        host = host or self.host
+        client = self.get_client(host)
+        _, stdout, stderr = client.exec_command(
+            '{} {}'.format(self.SHELL, shlex.quote(command)), timeout=self.TIMEOUT)
+        output = stdout.read().decode().strip()
+        return_code = stdout.channel.recv_exit_status()
+        if return_code and not quiet:
+            logger.warn('Command "{}" failed on {}: {}'.format(
+                command, host, stderr.read().decode().strip()))
+        return CommandResult(output, return_code)
+
+    def _call(self, host: str, task: Callable, *args, **kwargs):
+        self.local.host = host
+        try:
+            return task(*args, **kwargs)
+        finally:
+            self.local.host = None
+
+    def execute(self, task: Callable, hosts: List[str], *args, **kwargs) -> dict:
+        """Run the task against all hosts concurrently, like Fabric's execute."""
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=max(len(hosts), 1))
+        futures = {
+            host: self.executor.submit(self._call, host, task, *args, **kwargs)
+            for host in hosts
+        }
+        results = {}
+        for host, future in futures.items():
+            try:
+                results[host] = future.result()
+            except Exception as e:
+                logger.warn('Remote task {} failed on {}: {}'.format(task.__name__, host, e))
+                results[host] = e
+        return results
+
+    def read_proc(self, path: str, interval: float) -> str:
+        """Return the latest content of a /proc file on the current host.
+
+        The first call starts a ProcStreamer for the host, afterwards samples
+        are served from the stream without running any remote commands.
+        """
+        host = self.host
+        with self.lock:
+            streamer = self.streamers.get(host)
+            if streamer is None:
+                streamer = self.streamers[host] = ProcStreamer(self, host, interval)
+        return streamer.read(path)
+
+
+class ProcStreamer:
+
+    """A persistent remote sampler that streams /proc files over one channel.
+
+    The remote side is a shell loop that prints every registered file after a
+    frame marker once per interval. A reader thread keeps the latest frame, so
+    readers always get the most recent snapshot. Registering a new path
+    restarts the remote loop with the extended file list, and so does a read
+    when the channel has died or frames stopped arriving.
+    """
+
+    FRAME = '@@frame'
+
+    FILE = '@@file'
+
+    WAIT_TIMEOUT = 30  # seconds
+
+    STALE_INTERVALS = 3  # A frame older than that many intervals is stale
+
+    def __init__(self, pool: SSHPool, host: str, interval: float):
+        self.pool = pool
+        self.host = host
+        self.interval = interval
+        self.paths: List[str] = []
+        self.latest: Dict[str, str] = {}
+        self.updated_at = 0.0
+        self.updated = threading.Condition()
+        self.channel = None
+        self.thread = None
+
+    def command(self) -> str:
+        files = '; '.join('echo {} {}; cat {}'.format(self.FILE, path, path)
+                          for path in self.paths)
+        return 'while true; do echo {}; {}; sleep {}; done'.format(
+            self.FRAME, files, self.interval)
+
+    def start(self):
+        if self.channel is not None:
+            self.channel.close()
+        with self.updated:
+            self.latest = {}
+        transport = self.pool.get_client(self.host).get_transport()
+        self.channel = transport.open_session()
+        self.channel.exec_command(self.command())
+        self.thread = threading.Thread(target=self.consume, args=(self.channel,))
+        self.thread.daemon = True
+        self.thread.start()
+
+    def is_stale(self) -> bool:
+        if self.thread is None or not self.thread.is_alive():
+            return True
+        return bool(self.latest) and \
+            time.time() - self.updated_at > self.STALE_INTERVALS * self.interval
+
+    def consume(self, channel: paramiko.Channel):
+        frame, path, lines = {}, None, []
+        for line in channel.makefile('r'):
+            line = line.rstrip('\n')
+            if line == self.FRAME or line.startswith(self.FILE):
+                if path is not None:
+                    frame[path] = '\n'.join(lines)
+                if line == self.FRAME:
+                    if frame:
+                        with self.updated:
+                            self.latest = frame
+                            self.updated_at = time.time()
+                            self.updated.notify_all()
+                    frame, path = {}, None
+                else:
+                    path = line.split(' ', 1)[1]
+                lines = []
+            else:
+                lines.append(line)
+
+        with self.updated:  # The channel is closed, wake up the readers
+            self.updated.notify_all()
+
+    def read(self, path: str) -> str:
+        """Return the latest content of the path, raise if no fresh frame arrives."""
+        if path not in self.paths:
+            self.paths.append(path)
+            self.start()
+        elif self.is_stale():
+            logger.warn('Restarting the stale /proc stream from {}'.format(self.host))
+            self.start()
+
+        deadline = time.time() + self.WAIT_TIMEOUT
+        with self.updated:
+            while path not in self.latest:
+                if not self.thread.is_alive():
+                    raise ConnectionError('The /proc stream from {} closed'.format(self.host))
+                if not self.updated.wait(timeout=deadline - time.time()):
+                    raise TimeoutError('No samples of {} from {}'.format(path, self.host))
+            return self.latest[path]
@@ -7,8 +7,8 @@ class TPStats(RemoteStats):
         ("rss", 1),    # already in bytes
     )
 
-    def __init__(self, hosts, workers, user, password):
-        super().__init__(hosts, workers, user, password)
+    def __init__(self, hosts, workers, user, password, ssh_pool=None):
+        super().__init__(hosts, workers, user, password, ssh_pool=ssh_pool)
         self.typeperf_cmd = "typeperf \"\\Process(*{}*)\\Working Set\" -sc 1|sed '3q;d'"
 
     @parallel_task(server_side=True)
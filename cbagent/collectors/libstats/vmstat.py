@@ -5,7 +5,7 @@ class VMStat(RemoteStats):
 
     def get_vmstat(self) -> dict:
         stats = {'allocstall': 0}
-        stdout = self.run('cat /proc/vmstat')
+        stdout = self.read_proc('/proc/vmstat')
         for line in stdout.splitlines():
             fields = line.split()
             metric, value = fields[0], fields[1]
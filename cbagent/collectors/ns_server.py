@@ -1,10 +1,26 @@
+from typing import List, Tuple
+
 from cbagent.collectors.collector import Collector
 
 
 class NSServer(Collector):
 
+    """Bucket stats from ns_server.
+
+    By default every sample requests the last minute of stats and keeps only
+    the most recent point. In the incremental mode the request carries the
+    timestamp of the last point seen (haveTStamp), so ns_server returns only
+    newer points, and all of them are stored with their server timestamps.
+    The first sample of a bucket stores its most recent point only.
+    """
+
     COLLECTOR = "ns_server"
 
+    def __init__(self, settings):
+        super().__init__(settings)
+        self.incremental = getattr(settings, 'ns_server_incremental', False)
+        self.last_timestamps = {}
+
     def _get_stats_uri(self):
         for bucket, stats in self.get_buckets(with_stats=True):
             uri = stats["uri"]
@@ -23,15 +39,63 @@ class NSServer(Collector):
             stats[metric] = values[-1]  # only the most recent sample
         return stats
 
+    def _get_new_stats(self, uri: str, bucket: str) -> List[Tuple[int, dict]]:
+        """Return the (timestamp, stats) points added since the previous sample."""
+        last_timestamp = self.last_timestamps.get(bucket)
+        if last_timestamp is not None:
+            uri = '{}{}zoom=minute&haveTStamp={}'.format(uri, '&' if '?' in uri else '?',
+                                                         last_timestamp)
+        samples = self.get_http(path=uri)
+
+        if samples["op"]["lastTStamp"] == 0:
+            # Index and N1QL nodes don't have stats in ns_server
+            return []
+
+        samples = samples['op']['samples']
+        timestamps = samples.get('timestamp', [])
+        if not timestamps:
+            return []
+
+        first = 0
+        if last_timestamp is None:
+            first = len(timestamps) - 1
+        points = []
+        for i in range(first, len(timestamps)):
+            if last_timestamp is not None and timestamps[i] <= last_timestamp:
+                continue
+            stats = {}
+            for metric, values in samples.items():
+                if i < len(values):
+                    stats[metric.replace('/', '_')] = values[i]
+            points.append((int(timestamps[i]) * 10 ** 6, stats))  # ms -> ns, like latencies
+
+        self.last_timestamps[bucket] = max(timestamps[-1], last_timestamp or 0)
+        return points
+
     def sample(self):
-        for uri, bucket in self._get_stats_uri():
-            stats = self._get_stats(uri)
+        if self.incremental:
+            return self.sample_incremental()
+
+        targets = list(self._get_stats_uri())
+        samples = self.fan_out(self._get_stats, [uri for uri, _ in targets])
+        for (_, bucket), stats in zip(targets, samples):
             if not stats:
                 continue
             self.update_metric_metadata(stats.keys(), bucket)
             self.append_to_store(stats, cluster=self.cluster, bucket=bucket,
                                  collector=self.COLLECTOR)
 
+    def sample_incremental(self):
+        targets = list(self._get_stats_uri())
+        samples = self.fan_out(lambda target: self._get_new_stats(*target), targets)
+        for (_, bucket), points in zip(targets, samples):
+            if not points:
+                continue
+            self.update_metric_metadata(points[-1][1].keys(), bucket)
+            for timestamp, stats in points:
+                self.append_to_store(stats, cluster=self.cluster, bucket=bucket,
+                                     collector=self.COLLECTOR, timestamp=timestamp)
+
     def update_metadata(self):
         self.mc.add_cluster()
 
@@ -117,8 +181,9 @@ class XdcrStats(Collector):
         return stats
 
     def sample(self):
-        for bucket, uri in self._get_stats_uri():
-            stats = self._get_stats(bucket, uri)
+        targets = list(self._get_stats_uri())
+        samples = self.fan_out(lambda target: self._get_stats(*target), targets)
+        for (bucket, _), stats in zip(targets, samples):
             if not stats:
                 continue
             self.update_metric_metadata(stats.keys(), bucket)
@@ -31,9 +31,7 @@ class SecondaryDebugStats(Collector):
                              server=self.index_node,
                              port=self.PORT)
 
-    def _get_secondary_debugstats(self, bucket=None, index=None) -> dict:
-        stats = self.get_stats()
-
+    def _get_secondary_debugstats(self, stats: dict, bucket=None, index=None) -> dict:
         samples = dict()
         for metric in self.METRICS:
             _metric = bucket and "{}:{}".format(bucket, metric) or metric
@@ -47,7 +45,7 @@ class SecondaryDebugStats(Collector):
         return samples
 
     def sample(self):
-        stats = self._get_secondary_debugstats()
+        stats = self._get_secondary_debugstats(self.get_stats())
         if stats:
             self.update_metric_metadata(self.METRICS)
             self.store.append(stats, cluster=self.cluster,
@@ -68,8 +66,9 @@ class SecondaryDebugStatsBucket(SecondaryDebugStats):
     )
 
     def sample(self):
+        all_stats = self.get_stats()  # The same document has the stats of all buckets
         for bucket in self.get_buckets():
-            stats = self._get_secondary_debugstats(bucket=bucket)
+            stats = self._get_secondary_debugstats(all_stats, bucket=bucket)
             if stats:
                 self.update_metric_metadata(self.METRICS, bucket=bucket)
                 self.append_to_store(stats, cluster=self.cluster, bucket=bucket,
@@ -107,13 +106,15 @@ class SecondaryDebugStatsIndex(SecondaryDebugStats):
     )
 
     def sample(self):
+        all_stats = self.get_stats()
         for index, bucket, scope, collection in self.get_all_indexes():
             if scope and collection and \
                             scope != "_default" and collection != "_default":
                 full_index_name = "{}:{}:{}".format(scope, collection, index)
-                stats = self._get_secondary_debugstats(bucket=bucket, index=full_index_name)
+                stats = self._get_secondary_debugstats(all_stats, bucket=bucket,
+                                                       index=full_index_name)
             else:
-                stats = self._get_secondary_debugstats(bucket=bucket, index=index)
+                stats = self._get_secondary_debugstats(all_stats, bucket=bucket, index=index)
             if stats:
                 _index = "{}.{}".format(bucket, index)
                 self.update_metric_metadata(self.METRICS, index=_index)
@@ -15,8 +15,8 @@ class SecondaryStats(Collector):
         return stats
 
     def sample(self):
-        for bucket in self.get_buckets():
-            stats = self._get_secondary_stats(bucket)
+        buckets = list(self.get_buckets())
+        for bucket, stats in zip(buckets, self.fan_out(self._get_secondary_stats, buckets)):
             if stats:
                 self.update_metric_metadata(stats.keys(), bucket=bucket)
                 self.append_to_store(stats, cluster=self.cluster,
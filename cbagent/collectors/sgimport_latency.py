@@ -20,6 +20,8 @@ class SGImportLatency(Collector):
 
     METRICS = "sgimport_latency"
 
+    SCHEDULABLE = False
+
     INITIAL_POLLING_INTERVAL = 0.001  # 1 ms
 
     TIMEOUT = 600
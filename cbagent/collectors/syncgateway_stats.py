@@ -262,7 +262,6 @@ class SyncGatewayStats(Collector):
         self.mc = MetadataClient(settings)
 
         self.metrics = set()
-        self.updater = None
 
         if test.settings.syncgateway_settings.log_streaming:
             self.METRICS_CAPELLA += (
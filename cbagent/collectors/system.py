@@ -4,6 +4,7 @@ from cbagent.collectors.libstats.meminfo import MemInfo
 from cbagent.collectors.libstats.net import NetStat
 from cbagent.collectors.libstats.pcstat import PCStat
 from cbagent.collectors.libstats.psstats import PSStats
+from cbagent.collectors.libstats.sshpool import SSHPool
 from cbagent.collectors.libstats.sysdig import SysdigStat
 from cbagent.collectors.libstats.typeperfstats import TPStats
 from cbagent.collectors.libstats.vmstat import VMStat
@@ -11,6 +12,8 @@ from cbagent.collectors.libstats.vmstat import VMStat
 
 class System(Collector):
 
+    SCHEDULABLE = False  # Remote sampling forks processes via Fabric
+
     def get_nodes(self):
         return self.settings.hostnames or super().get_nodes()
 
@@ -34,6 +37,10 @@ class System(Collector):
 
         super().__init__(settings)
 
+        self.ssh_pool = None
+        if getattr(settings, 'ssh_pool', False):
+            self.ssh_pool = SSHPool(user=self.ssh_username, password=self.ssh_password)
+
 
 class PS(System):
 
@@ -46,7 +53,8 @@ class PS(System):
                                workers=self.workers,
                                user=self.ssh_username,
                                password=self.ssh_password,
-                               interval=self.interval)
+                               interval=self.interval,
+                               ssh_pool=self.ssh_pool)
 
     def sample(self):
         for process in self.settings.server_processes:
@@ -70,9 +78,13 @@ class IO(System):
         self.sampler = IOStat(hosts=self.nodes,
                               workers=self.workers,
                               user=self.ssh_username,
-                              password=self.ssh_password)
+                              password=self.ssh_password,
+                              ssh_pool=self.ssh_pool)
 
     def sample(self):
+        if not self.sampler.cache:
+            self.sampler.cache_devices(self.partitions)
+
         for node, stats in self.sampler.get_server_samples(self.partitions).items():
             self.add_stats(node, stats)
 
@@ -92,11 +104,16 @@ class Disk(System):
         self.sampler = DiskStats(hosts=self.nodes,
                                  workers=self.workers,
                                  user=self.ssh_username,
-                                 password=self.ssh_password)
+                                 password=self.ssh_password,
+                                 interval=self.interval,
+                                 ssh_pool=self.ssh_pool)
 
         self.initial_stats = {}
 
     def sample(self):
+        if not self.sampler.cache:
+            self.sampler.cache_devices(self.partitions, client_side=False)
+
         for node, stats in self.sampler.get_server_samples(self.partitions).items():
             if not self.initial_stats.get(node):
                 self.initial_stats[node] = stats.copy()
@@ -117,7 +134,8 @@ class PageCache(System):
         self.sampler = PCStat(hosts=self.nodes,
                               workers=self.workers,
                               user=self.ssh_username,
-                              password=self.ssh_password)
+                              password=self.ssh_password,
+                              ssh_pool=self.ssh_pool)
 
     def sample(self):
         for node, stats in self.sampler.get_samples(self.partitions).items():
@@ -134,7 +152,8 @@ class Net(System):
         self.sampler = NetStat(hosts=self.nodes,
                                workers=self.workers,
                                user=self.ssh_username,
-                               password=self.ssh_password)
+                               password=self.ssh_password,
+                               ssh_pool=self.ssh_pool)
 
     def sample(self):
         for node, stats in self.sampler.get_samples().items():
@@ -149,7 +168,8 @@ class TypePerf(PS):
         self.sampler = TPStats(hosts=self.nodes,
                                workers=self.workers,
                                user=self.ssh_username,
-                               password=self.ssh_password)
+                               password=self.ssh_password,
+                               ssh_pool=self.ssh_pool)
 
 
 class Sysdig(System):
@@ -162,7 +182,8 @@ class Sysdig(System):
         self.sampler = SysdigStat(hosts=self.nodes,
                                   workers=self.workers,
                                   user=self.ssh_username,
-                                  password=self.ssh_password)
+                                  password=self.ssh_password,
+                                  ssh_pool=self.ssh_pool)
 
     def sample(self):
         processes = self.settings.traced_processes
@@ -180,7 +201,9 @@ class Memory(System):
         self.sampler = MemInfo(hosts=self.nodes,
                                workers=self.workers,
                                user=self.ssh_username,
-                               password=self.ssh_password)
+                               password=self.ssh_password,
+                               interval=self.interval,
+                               ssh_pool=self.ssh_pool)
 
     def sample(self):
         for node, stats in self.sampler.get_samples().items():
@@ -197,7 +220,9 @@ class VMSTAT(System):
         self.sampler = VMStat(hosts=self.nodes,
                               workers=self.workers,
                               user=self.ssh_username,
-                              password=self.ssh_password)
+                              password=self.ssh_password,
+                              interval=self.interval,
+                              ssh_pool=self.ssh_pool)
 
     def sample(self):
         for node, stats in self.sampler.get_samples().items():
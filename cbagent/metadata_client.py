@@ -1,4 +1,8 @@
-from typing import Dict, List
+import fcntl
+import json
+import os
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
 
 import requests
 from decorator import decorator
@@ -29,10 +33,11 @@ class RestClient:
         self.session = requests.Session()
 
     @interrupt
-    def post(self, url, data):
-        r = self.session.post(url=url, data=data)
+    def post(self, url, data=None, json=None):
+        r = self.session.post(url=url, data=data, json=json)
         if r.status_code == 500:
             raise InternalServerError(url)
+        return r
 
     @interrupt
     def get(self, url, params):
@@ -42,12 +47,76 @@ class RestClient:
         return r.json()
 
 
+MetricEntry = Tuple[str, Optional[str], Optional[str], Optional[str], str, Optional[str]]
+
+
+class MetadataRegistry:
+
+    """Metrics already registered in cbmonitor, persisted in a local file.
+
+    Every line of the file is one (cluster, bucket, index, server, metric,
+    collector) entry in JSON. The file lives as long as one CbAgent and is
+    shared by all its collector processes: registration happens under an
+    exclusive file lock, after reading the lines appended by others since the
+    last registration, so every entry is sent to cbmonitor once. Entries are
+    only recorded once cbmonitor has accepted them.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.known: Set[MetricEntry] = set()
+        self.offset = 0
+        self.lock = threading.Lock()
+
+    def refresh(self, fh):
+        fh.seek(self.offset)
+        for line in fh:
+            if not line.endswith('\n'):  # A partially written line
+                break
+            self.known.add(tuple(json.loads(line)))
+            self.offset += len(line.encode())
+
+    def register(self, entries: List[MetricEntry], callback: Callable[[list], bool]) -> bool:
+        """Call back with the entries that are not in the registry yet.
+
+        The entries are recorded only if the callback reports success. Return
+        whether all entries are registered.
+        """
+        with self.lock, open(self.path, 'a+') as fh:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+            try:
+                self.refresh(fh)
+                missing = [entry for entry in dict.fromkeys(entries)
+                           if entry not in self.known]
+                if not missing:
+                    return True
+                if not callback(missing):
+                    return False
+
+                fh.seek(0, os.SEEK_END)
+                for entry in missing:
+                    fh.write(json.dumps(entry) + '\n')
+                fh.flush()
+                self.known.update(missing)
+                self.offset = fh.tell()
+                return True
+            finally:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+
 class MetadataClient(RestClient):
 
+    BULK_PATH = "/add_metrics/"
+
     def __init__(self, settings):
         super(MetadataClient, self).__init__()
         self.settings = settings
         self.base_url = "http://{}/cbmonitor".format(settings.cbmonitor_host)
+        self.bulk_supported = True
+
+        self.registry = None
+        if path := getattr(settings, 'metadata_registry', None):
+            self.registry = MetadataRegistry(path)
 
     def get_clusters(self) -> List[str]:
         url = self.base_url + "/get_clusters/"
@@ -122,7 +191,50 @@ class MetadataClient(RestClient):
                 if extra_param == "bucket" and value in self.settings.serverless_db_names:
                     value = self.settings.serverless_db_names[value]
                 data[extra_param] = value
-        self.post(url, data)
+        return self.post(url, data)
+
+    def add_metrics(self, names: Iterable[str], bucket: str = None, index: str = None,
+                    server: str = None, collector: str = None) -> bool:
+        """Register several metrics of the same bucket/index/server at once.
+
+        Return whether cbmonitor accepted all of them.
+        """
+        if bucket in self.settings.serverless_db_names:
+            bucket = self.settings.serverless_db_names[bucket]
+        entries = [(self.settings.cluster, bucket, index, server, name, collector)
+                   for name in names]
+        if not entries:
+            return True
+
+        if self.registry is None:
+            return self._add_metrics(entries)
+        return self.registry.register(entries, self._add_metrics)
+
+    def _add_metrics(self, entries: List[MetricEntry]) -> bool:
+        """Register the entries and return whether cbmonitor accepted all of them."""
+        if self.bulk_supported:
+            url = self.base_url + self.BULK_PATH
+            payload = []
+            for entry in entries:
+                data = dict(zip(("cluster", "bucket", "index", "server", "name", "collector"),
+                                entry))
+                payload.append({k: v for k, v in data.items() if v is not None})
+            r = self.post(url, json=payload)
+            if r is not None and r.ok:
+                return True
+            if r is not None and r.status_code in (404, 405):
+                logger.warn("Bulk metric registration is not supported, "
+                            "using single-metric requests")
+                self.bulk_supported = False
+            else:
+                logger.warn("Bulk metric registration failed, "
+                            "falling back to single-metric requests")
+
+        succeeded = True
+        for _, bucket, index, server, name, collector in entries:
+            r = self.add_metric(name, bucket, index, server, collector)
+            succeeded &= r is not None and r.ok
+        return succeeded
 
     def add_snapshot(self, name: str):
         url = self.base_url + "/add_snapshot/"
@@ -0,0 +1,76 @@
+import asyncio
+import math
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from cbagent.collectors.collector import Collector
+from logger import logger
+
+
+class CollectorScheduler:
+
+    """Drive many collectors from a single event loop.
+
+    Every collector is sampled on a fixed grid of ticks anchored at a common
+    start time, so the sampling schedule doesn't drift and collectors with
+    the same interval take their samples together. The blocking sample()
+    calls run concurrently in a bounded thread pool, collectors fan out their
+    per-bucket and per-node requests within a sample (Collector.fan_out), and
+    all collectors share one pooled keep-alive HTTP session, which holds a
+    connection pool per node.
+    """
+
+    MAX_WORKERS = 32
+
+    def __init__(self, collectors: List[Collector], max_workers: int = MAX_WORKERS):
+        self.collectors = collectors
+        self.max_workers = min(max_workers, max(len(collectors), 1))
+
+    def init_session(self) -> requests.Session:
+        num_nodes = len({node for c in self.collectors for node in c.nodes}) or 1
+        adapter = HTTPAdapter(pool_connections=num_nodes,
+                              pool_maxsize=max(self.max_workers, Collector.MAX_FAN_OUT))
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    async def schedule(self, collector: Collector, start: float,
+                       executor: ThreadPoolExecutor):
+        loop = asyncio.get_running_loop()
+        tick = 0
+        while True:
+            try:
+                await loop.run_in_executor(executor, collector.sample)
+            except IndexError:
+                pass
+            except Exception as e:
+                logger.warn("Unexpected exception in {}: {}"
+                            .format(collector.__class__.__name__, e))
+
+            # Skip the ticks that were missed by a slow sample
+            tick = max(tick + 1, math.ceil((loop.time() - start) / collector.interval))
+            await asyncio.sleep(start + tick * collector.interval - loop.time())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            await asyncio.gather(*[
+                self.schedule(collector, start, executor) for collector in self.collectors
+            ])
+
+    def run(self):
+        session = self.init_session()
+        for collector in self.collectors:
+            if not collector.cloud_enabled:
+                collector.session = session
+            collector._init_pool()
+
+        try:
+            asyncio.run(self._run())
+        except KeyboardInterrupt:
+            pass
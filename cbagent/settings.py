@@ -1,3 +1,6 @@
+import os
+import tempfile
+
 from perfrunner.settings import CBMONITOR_HOST
 from perfrunner.tests import PerfTest
 
@@ -22,6 +25,18 @@ class CbAgentSettings:
         self.cbmonitor_host = CBMONITOR_HOST
         self.interval = test.test_config.stats_settings.interval
         self.lat_interval = test.test_config.stats_settings.lat_interval
+        self.scheduler = test.test_config.stats_settings.scheduler
+        self.ssh_pool = test.test_config.stats_settings.ssh_pool
+        self.ns_server_incremental = test.test_config.stats_settings.ns_server_incremental
+        self.rest_cache_dir = None
+        if test.test_config.stats_settings.rest_cache:
+            shm = '/dev/shm' if os.path.isdir('/dev/shm') else None
+            self.rest_cache_dir = tempfile.mkdtemp(prefix='cbagent-rest-', dir=shm)
+        self.metadata_registry = None
+        if test.test_config.stats_settings.metadata_registry:
+            fd, self.metadata_registry = tempfile.mkstemp(prefix='cbagent-metadata-',
+                                                          suffix='.jsonl')
+            os.close(fd)
         self.buckets = buckets
         self.collections = None
         self.indexes = {}
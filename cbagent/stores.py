@@ -1,16 +1,92 @@
+import asyncio
 import json
-from typing import Dict, List
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
 
 from requests import Session
 
+from logger import logger
+
+
+class BufferedWriter:
+
+    """Accumulate data points per db and flush them as multi-point payloads.
+
+    A flush is triggered once MAX_POINTS points are buffered or MAX_DELAY
+    seconds have passed since the previous flush. The coroutine that triggers
+    a flush waits for it to complete, which throttles the producers, and at
+    most MAX_PENDING requests are in flight at any time. A background timer
+    flushes points of quiet series that no append would otherwise flush.
+    """
+
+    MAX_POINTS = 10 ** 4
+
+    MAX_DELAY = 5  # seconds
+
+    MAX_PENDING = 8
+
+    def __init__(self, store: 'PerfStore',
+                 max_points: int = MAX_POINTS,
+                 max_delay: float = MAX_DELAY,
+                 max_pending: int = MAX_PENDING):
+        self.store = store
+        self.max_points = max_points
+        self.max_delay = max_delay
+        self.pending = asyncio.Semaphore(max_pending)
+        self.buffers = defaultdict(list)
+        self.buffered = 0
+        self.last_flush = time.monotonic()
+        self.closing = asyncio.Event()
+
+    async def append(self, db: str, data: dict, timestamp: Optional[int]):
+        self.buffers[db].append({'ts': timestamp, 'data': data})
+        self.buffered += 1
+        if self.buffered >= self.max_points or \
+                time.monotonic() - self.last_flush >= self.max_delay:
+            await self.flush()
+
+    async def flush(self):
+        buffers, self.buffers = self.buffers, defaultdict(list)
+        self.buffered = 0
+        self.last_flush = time.monotonic()
+        await asyncio.gather(*[
+            self.flush_db(db, points) for db, points in buffers.items()
+        ])
+
+    async def flush_periodically(self):
+        """Flush stale points every max_delay seconds until close() is called."""
+        while not self.closing.is_set():
+            try:
+                await asyncio.wait_for(self.closing.wait(), timeout=self.max_delay)
+            except asyncio.TimeoutError:
+                if self.buffered and time.monotonic() - self.last_flush >= self.max_delay:
+                    await self.flush()
+
+    async def close(self):
+        self.closing.set()
+        await self.flush()
+
+    async def flush_db(self, db: str, points: List[dict]):
+        async with self.pending:
+            if self.store.bulk_supported and await self.store.async_push_bulk(db, points):
+                return
+            for point in points:
+                await self.store.async_push(db, point['data'], point['ts'])
+
 
 class PerfStore:
 
+    BULK_PATH = 'bulk'
+
     def __init__(self, host: str):
         self.session = Session()
         self.async_session = None
         self.base_url = 'http://{}:8080'.format(host)
         self.dbs = set()
+        self.writer = None
+        self.bulk_supported = True
 
     @staticmethod
     def build_dbname(cluster: str,
@@ -36,11 +112,52 @@ class PerfStore:
         async with self.async_session.post(url=url, json=data) as response:
             return await response.json()
 
+    async def async_push_bulk(self, db: str, points: List[dict]) -> bool:
+        """Post multiple timestamped data points in a single request.
+
+        Return whether the store accepted the points, the caller re-sends them
+        one by one otherwise. Stores without the bulk endpoint (404/405) don't
+        get any further bulk requests.
+        """
+        url = '{}/{}/{}'.format(self.base_url, db, self.BULK_PATH)
+        async with self.async_session.post(url=url, json=points) as response:
+            if response.status in (404, 405):
+                logger.warn('Bulk ingest is not supported by the store, '
+                            'falling back to single-point requests')
+                self.bulk_supported = False
+                return False
+            if not 200 <= response.status < 300:
+                logger.warn('Bulk ingest into {} failed with HTTP {}, '
+                            'retrying with single-point requests'.format(db, response.status))
+                return False
+            return True
+
+    @asynccontextmanager
+    async def buffered(self, **kwargs):
+        """Route all async appends through a BufferedWriter until exit."""
+        self.writer = BufferedWriter(self, **kwargs)
+        timer = asyncio.create_task(self.writer.flush_periodically())
+        try:
+            yield self.writer
+            await self.writer.close()
+            await timer
+        finally:
+            timer.cancel()
+            self.writer = None
+
     def get_values(self, db: str, metric) -> List[float]:
         url = '{}/{}/{}'.format(self.base_url, db, metric)
         data = self.session.get(url).json()
         return [d[1] for d in data]
 
+    def get_values_if_exists(self, db: str, metric: str) -> Optional[List[float]]:
+        """Fetch a series with a single request, return None if it doesn't exist."""
+        url = '{}/{}/{}'.format(self.base_url, db, metric)
+        response = self.session.get(url)
+        if response.status_code != 200:
+            return None
+        return [d[1] for d in response.json()]
+
     def get_summary(self, db: str, metric: str) -> Dict[str, float]:
         url = '{}/{}/{}/summary'.format(self.base_url, db, metric)
         return self.session.get(url).json()
@@ -66,4 +183,6 @@ class PerfStore:
     async def append_async(self, data, cluster=None, server=None, bucket=None,
                            index=None, collector=None, timestamp=None):
         db = self.build_dbname(cluster, server, bucket, index, collector)
+        if self.writer is not None:
+            return await self.writer.append(db, data, timestamp)
         return await self.async_push(db, data, timestamp)
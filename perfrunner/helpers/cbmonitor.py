@@ -1,3 +1,4 @@
+import shutil
 import time
 from collections import OrderedDict
 from copy import copy
@@ -26,6 +27,7 @@ from cbagent.collectors import (
     EventingStats,
     FTSCollector,
     FTSUtilisationCollector,
+    IOAmplification,
     JTSCollector,
     KVLatency,
     KVStoreStats,
@@ -59,6 +61,7 @@ from cbagent.collectors import (
     XdcrStats,
 )
 from cbagent.metadata_client import MetadataClient
+from cbagent.scheduler import CollectorScheduler
 from cbagent.settings import CbAgentSettings
 from cbagent.stores import PerfStore
 from logger import logger
@@ -112,6 +115,7 @@ class CbAgent:
         if self.test.test_config.stats_settings.enabled:
             self.stop()
             self.reconstruct()
+            self.test.metrics.series.clear()
             # self.find_time_series()
             self.add_snapshots()
             self.cleanup_spring_worker_files()
@@ -138,6 +142,7 @@ class CbAgent:
                        eventing_stats=False,
                        fts_stats=False,
                        index_latency=False,
+                       io_amplification=False,
                        iostat=True,
                        jts_stats=False,
                        kv_dedup=False,
@@ -235,6 +240,8 @@ class CbAgent:
                     if not self.test.cloud_infra:
                         if disk:
                             self.add_io_collector(Disk)
+                        if io_amplification:
+                            self.add_collector(IOAmplification, self.test)
                         if iostat:
                             self.add_io_collector(IO)
                 else:
@@ -350,7 +357,15 @@ class CbAgent:
 
     def start(self):
         logger.info('Starting stats collectors')
-        self.processes = [Process(target=c.collect) for c in self.collectors]
+        collectors = self.collectors
+        self.processes = []
+        if self.settings.scheduler == 'asyncio':
+            scheduled = [c for c in collectors if c.SCHEDULABLE]
+            collectors = [c for c in collectors if not c.SCHEDULABLE]
+            if scheduled:
+                scheduler = CollectorScheduler(scheduled)
+                self.processes.append(Process(target=scheduler.run))
+        self.processes += [Process(target=c.collect) for c in collectors]
         for p in self.processes:
             p.start()
 
@@ -358,6 +373,10 @@ class CbAgent:
         logger.info('Terminating stats collectors')
         for p in self.processes:
             p.terminate()
+        if self.settings.rest_cache_dir:
+            shutil.rmtree(self.settings.rest_cache_dir, ignore_errors=True)
+        if self.settings.metadata_registry:
+            Path(self.settings.metadata_registry).unlink(missing_ok=True)
 
     def reconstruct(self):
         logger.info('Reconstructing measurements')
@@ -1,5 +1,8 @@
+import os
 import socket
+import threading
 import time
+from typing import Dict, Optional, Tuple, Union
 
 from mc_bin_client.mc_bin_client import MemcachedClient
 
@@ -9,27 +12,109 @@ SOCKET_RETRY_INTERVAL = 2
 MAX_RETRY = 600
 
 
+def typed_value(value: str) -> Union[int, float, str]:
+    for cast in int, float:
+        try:
+            return cast(value)
+        except ValueError:
+            pass
+    return value
+
+
+def typed_stats(stats: Dict[str, str]) -> dict:
+    """Convert numeric stat values to numbers, the same way `cbstats -j` does."""
+    return {stat: typed_value(value) for stat, value in stats.items()}
+
+
+def disk_ops(stats: dict) -> Dict[str, int]:
+    """Return the background fetches and the mutations counted in the STAT response.
+
+    These are the operations that the storage engine I/O is amortized over.
+    """
+    sets = 0
+    for state in 'active', 'replica', 'pending':
+        for op in 'create', 'update':
+            sets += int(stats['vb_{}_ops_{}'.format(state, op)])
+    return {'get_ops': int(stats['ep_bg_fetched']), 'set_ops': sets}
+
+
+class StatsConnection:
+
+    """An authenticated connection to one node and the bucket it has selected."""
+
+    def __init__(self):
+        self.client: Optional[MemcachedClient] = None
+        self.bucket: Optional[str] = None
+        self.lock = threading.Lock()
+
+    def close(self):
+        if self.client is not None:
+            try:
+                self.client.close()
+            except Exception:
+                pass
+        self.client = self.bucket = None
+
+
 class MemcachedHelper:
 
+    """Memcached STAT requests over persistent binary-protocol connections.
+
+    Every node gets one authenticated connection that is reused by all calls,
+    switching buckets only when needed. Connections are opened lazily and the
+    pool is discarded in forked processes, so a helper created in the parent
+    process can be shared with the collectors.
+    """
+
     def __init__(self, cluster_spec: ClusterSpec, test_config: TestConfig):
         self.username, self.password = cluster_spec.rest_credentials
         if test_config.cluster.ipv6:
             self.family = socket.AF_INET6
         else:
             self.family = socket.AF_INET
+        self.pid = os.getpid()
+        self.connections: Dict[Tuple[str, int], StatsConnection] = {}
+        self.lock = threading.Lock()
+
+    def connect(self, host: str, port: int) -> MemcachedClient:
+        mc = MemcachedClient(host=host, port=port, family=self.family)
+        mc.enable_xerror()
+        mc.hello("mc")
+        mc.sasl_auth_plain(user=self.username, password=self.password)
+        return mc
+
+    def get_connection(self, host: str, port: int) -> StatsConnection:
+        with self.lock:
+            if self.pid != os.getpid():  # Never share sockets with the parent process
+                self.pid = os.getpid()
+                self.connections = {}
+            connection = self.connections.get((host, port))
+            if connection is None:
+                connection = self.connections[host, port] = StatsConnection()
+            return connection
+
+    def request_stats(self, host: str, port: int, bucket: str, stats: str) -> dict:
+        connection = self.get_connection(host, port)
+        with connection.lock:
+            try:
+                if connection.client is None:
+                    connection.client = self.connect(host, port)
+                if connection.bucket != bucket:
+                    connection.client.bucket_select(bucket)
+                    connection.bucket = bucket
+                return connection.client.stats(stats)
+            except Exception:
+                connection.close()
+                raise
 
-    def get_stats(self, host: str, port: int, bucket: str, stats: str = '') -> dict:
+    def get_stats(self, host: str, port: int, bucket: str, stats: str = '',
+                  max_retry: int = MAX_RETRY) -> dict:
         retries = 0
         while True:
             try:
-                mc = MemcachedClient(host=host, port=port, family=self.family)
-                mc.enable_xerror()
-                mc.hello("mc")
-                mc.sasl_auth_plain(user=self.username, password=self.password)
-                mc.bucket_select(bucket)
-                return mc.stats(stats)
+                return self.request_stats(host, port, bucket, stats)
             except Exception:
-                if retries < MAX_RETRY:
+                if retries < max_retry:
                     retries += 1
                     time.sleep(SOCKET_RETRY_INTERVAL)
                 else:
@@ -1,10 +1,11 @@
 from __future__ import annotations
 
 import glob
+import json
 import os
-import re
 import statistics
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from pathlib import Path
 from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple, Union
 
 import numpy as np
@@ -13,6 +14,7 @@ from cbagent.stores import PerfStore
 from logger import logger
 from perfrunner.settings import CBMONITOR_HOST, ClusterSpec, TestConfig
 from perfrunner.workloads.bigfun.query_gen import Query
+from spring.histogram import MERGED_HISTOGRAMS, LatencyHistogram
 
 if TYPE_CHECKING:
     from perfrunner.tests import PerfTest
@@ -43,6 +45,56 @@ def strip(s: str) -> str:
     return s.lower()
 
 
+def sum_series(series: List[np.ndarray]) -> np.ndarray:
+    """Sum time series point by point, truncating them to the shortest one."""
+    if not series:
+        return np.empty(0)
+    length = min(len(values) for values in series)
+    return np.sum([values[:length] for values in series], axis=0)
+
+
+class SeriesCache:
+
+    """In-memory cache of the time series fetched from the stats store.
+
+    Every (db, metric) pair is fetched at most once per test. Missing series
+    are cached as None so that they are not requested again either.
+    """
+
+    def __init__(self, store: Optional[PerfStore]):
+        self.store = store
+        self.series: Dict[Tuple[str, str], Optional[np.ndarray]] = {}
+
+    def get(self, db: str, metric: str) -> Optional[np.ndarray]:
+        key = db, metric
+        if key not in self.series:
+            values = self.store.get_values_if_exists(db, metric)
+            if values is not None:
+                values = np.asarray(values, dtype=float)
+            self.series[key] = values
+        return self.series[key]
+
+    def get_all(self, dbs: Iterable[str], metric: str) -> List[np.ndarray]:
+        return [values for db in dbs if (values := self.get(db, metric)) is not None]
+
+    def concat(self, dbs: Iterable[str], metric: str, required: bool = False) -> np.ndarray:
+        """Concatenate the given series, raise if required and none of them has data."""
+        dbs = list(dbs)
+        if series := self.get_all(dbs, metric):
+            values = np.concatenate(series)
+        else:
+            values = np.empty(0)
+        if required and not len(values):
+            raise ValueError('No data for {}/{}'.format(','.join(dbs), metric))
+        return values
+
+    def sum(self, dbs: Iterable[str], metric: str) -> np.ndarray:
+        return sum_series(self.get_all(dbs, metric))
+
+    def clear(self):
+        self.series.clear()
+
+
 @dataclass
 class CH2Metrics:
     # transactions
@@ -81,6 +133,90 @@ class CH3Metrics(CH2Metrics):
     fts_qph: float = 0
 
 
+@dataclass
+class YCSBLog:
+
+    """Results extracted from one or more YCSB logs.
+
+    A log is parsed in a single streaming pass. The time series latencies of
+    every operation go to a histogram, so the results of several YCSB
+    instances can be merged and the percentiles are computed over all of
+    them at once.
+    """
+
+    throughput: int = 0
+    gcs: int = 0
+    histograms: Dict[str, LatencyHistogram] = field(default_factory=dict)
+    latency_sums: Dict[str, float] = field(default_factory=dict)
+    max_latencies: Dict[str, float] = field(default_factory=dict)
+    failures: Dict[str, int] = field(default_factory=dict)
+
+    @classmethod
+    def parse(cls, filename: str) -> YCSBLog:
+        log = cls()
+        throughput = None
+        with open(filename) as fh:
+            for line in fh:
+                if not line.startswith('['):
+                    continue
+                fields = line.split(', ')
+                if len(fields) != 3:
+                    continue
+                io_type, name, value = fields[0][1:-1], fields[1], fields[2]
+
+                if name.isdigit():  # Time series, [READ], 1000, 345.6
+                    if name != '0':  # The first, partial interval is ignored
+                        log.record_latency(io_type, float(value))
+                elif name == 'MaxLatency(us)':
+                    log.max_latencies[io_type] = max(float(value) / 1000,
+                                                     log.max_latencies.get(io_type, 0))
+                elif name == 'Operations' and io_type.endswith('-FAILED'):
+                    io_type = io_type.split('-')[0]
+                    log.failures[io_type] = log.failures.get(io_type, 0) + int(value)
+                elif name == 'Throughput(ops/sec)' and io_type == 'OVERALL':
+                    if throughput is None:
+                        throughput = int(float(value))
+                elif name == 'Count' and io_type == 'TOTAL_GCs':
+                    log.gcs += int(value)
+        log.throughput = throughput or 0
+        return log
+
+    def record_latency(self, io_type: str, latency: float):
+        """Record a time series latency value given in microseconds."""
+        if io_type not in self.histograms:
+            self.histograms[io_type] = LatencyHistogram()
+            self.latency_sums[io_type] = 0
+        self.histograms[io_type].record(latency / LatencyHistogram.UNIT)
+        self.latency_sums[io_type] += latency
+
+    def merge(self, other: YCSBLog):
+        self.throughput += other.throughput
+        self.gcs += other.gcs
+        for io_type, histogram in other.histograms.items():
+            if io_type in self.histograms:
+                self.histograms[io_type].merge(histogram)
+                self.latency_sums[io_type] += other.latency_sums[io_type]
+            else:
+                self.histograms[io_type] = histogram
+                self.latency_sums[io_type] = other.latency_sums[io_type]
+        for io_type, latency in other.max_latencies.items():
+            self.max_latencies[io_type] = max(latency, self.max_latencies.get(io_type, 0))
+        for io_type, failures in other.failures.items():
+            self.failures[io_type] = self.failures.get(io_type, 0) + failures
+
+    def latencies(self, percentile: Number) -> Dict[str, float]:
+        """Return the percentile and the average latency of every operation in ms."""
+        lat_dic = {}
+        for io_type, histogram in self.histograms.items():
+            if "FAILED" in io_type or "CLEANUP" in io_type:
+                continue
+            p_lat = histogram.percentiles([percentile])[percentile]
+            lat_dic['{}th Percentile {}'.format(percentile, io_type)] = round(p_lat, 3)
+            a_lat = self.latency_sums[io_type] / histogram.total_count / 1000
+            lat_dic['Average {}'.format(io_type)] = round(a_lat, 3)
+        return lat_dic
+
+
 class MetricHelper:
 
     def __init__(self, test: PerfTest):
@@ -91,6 +227,8 @@ class MetricHelper:
             self.store = None
         else:
             self.store = PerfStore(CBMONITOR_HOST)
+        self.series = SeriesCache(self.store)
+        self.ycsb_logs: Dict[Tuple, YCSBLog] = {}
 
     @property
     def _title(self) -> str:
@@ -324,7 +462,7 @@ class MetricHelper:
                   cluster_idx: int = 0,
                   collector: str = 'ns_server',
                   stat_group: str = '',
-                  metric: str = 'ops') -> List[int]:
+                  metric: str = 'ops') -> np.ndarray:
         """Calculate total ops/sec over a given set of buckets on a given cluster.
 
          At each time point, sum ops/sec for buckets (to get time series of total ops/sec):
@@ -340,20 +478,17 @@ class MetricHelper:
         If no cluster_idx is specified, use the first cluster (the default).
         """
         buckets = buckets or self._bucket_names
-        values = []
-        for bucket in buckets:
-            bucket_group = '{}{}'.format(bucket, '_' + stat_group if stat_group != '' else '')
-            db = self.store.build_dbname(cluster=self.test.cbmonitor_clusters[cluster_idx],
-                                         collector=collector,
-                                         bucket=bucket_group)
-            if self.store.exists(db, metric=metric):
-                return_ops = self.store.get_values(db, metric=metric)
-                if len(values) != 0:
-                    sum_ops = [ops1 + ops2 for ops1, ops2 in zip(values, return_ops)]
-                    values = sum_ops
-                else:
-                    values = return_ops
-        return values
+        dbs = [
+            self.store.build_dbname(cluster=self.test.cbmonitor_clusters[cluster_idx],
+                                    collector=collector,
+                                    bucket=self._bucket_group(bucket, stat_group))
+            for bucket in buckets
+        ]
+        return self.series.sum(dbs, metric)
+
+    @staticmethod
+    def _bucket_group(bucket: str, stat_group: str) -> str:
+        return '{}{}'.format(bucket, '_' + stat_group if stat_group != '' else '')
 
     def _avg_ops(self,
                  buckets: List[str] = [],
@@ -377,7 +512,8 @@ class MetricHelper:
 
         If no cluster_idx is specified, use the first cluster (the default).
         """
-        if values := self._ops_data(buckets, cluster_idx, collector, stat_group, metric):
+        values = self._ops_data(buckets, cluster_idx, collector, stat_group, metric)
+        if len(values):
             return int(np.average(values))
         return -1
 
@@ -404,7 +540,8 @@ class MetricHelper:
 
         If no cluster_idx is specified, use the first cluster (the default).
         """
-        if values := self._ops_data(buckets, cluster_idx, collector, stat_group, metric):
+        values = self._ops_data(buckets, cluster_idx, collector, stat_group, metric)
+        if len(values):
             return int(np.percentile(values, percentile))
         return -1
 
@@ -528,18 +665,73 @@ class MetricHelper:
         values += self.store.get_values(db, metric=metric)
         return int(np.percentile(values, percentile))
 
-    def get_collector_values(self, collector):
-        values = []
-        for bucket in self._bucket_names:
+    @staticmethod
+    def _summarize_series(values: np.ndarray) -> Dict[str, float]:
+        return {
+            'avg': round(float(np.mean(values)), 2),
+            'p95': round(float(np.percentile(values, 95)), 2),
+            'max': round(float(np.max(values)), 2),
+        }
+
+    def summarize_node_metrics(self, collector: str, servers: Iterable[str],
+                               metrics: Iterable[str]) -> Dict[str, Dict[str, dict]]:
+        """Return the average, 95th percentile and peak of per-node series of the phase."""
+        summary = {}
+        for server in servers:
             db = self.store.build_dbname(cluster=self.test.cbmonitor_clusters[0],
                                          collector=collector,
-                                         bucket=bucket)
-            values += self.store.get_values(db, metric=collector)
-        return values
+                                         server=server)
+            for metric in metrics:
+                values = self.series.get(db, metric)
+                if values is None or not len(values):
+                    continue
+                summary.setdefault(server, {})[metric] = self._summarize_series(values)
+        return summary
+
+    def io_amplification(self, servers: Iterable[str], metric_names: Iterable[str],
+                         phase: Optional[str] = None) -> List[Metric]:
+        """Generate average, 95th percentile and peak per-interval I/O amplification metrics.
+
+        The per-interval samples of all given KV nodes are combined. Tests that report several
+        phases pass a phase name, which becomes part of the metric ID and title.
+        """
+        stat_titles = {'avg': 'Avg', 'p95': '95th percentile', 'max': 'Max'}
+        test_id = self.test_config.name
+        if phase:
+            test_id += '_' + phase.replace(',', '').replace(' ', '_').casefold()
+        dbs = [
+            self.store.build_dbname(cluster=self.test.cbmonitor_clusters[0],
+                                    collector='io_amplification',
+                                    server=server)
+            for server in servers
+        ]
+        metrics = []
+        for metric in metric_names:
+            values = self.series.concat(dbs, metric)
+            if not len(values):
+                continue
+            for stat, value in self._summarize_series(values).items():
+                metric_id = '{}_{}_{}'.format(test_id, metric, stat)
+                metric_title = metric.replace('_amp', '_amplification').replace('_', ' ')
+                title = '{} {}, {}'.format(stat_titles[stat], metric_title, self._title)
+                if phase:
+                    title += ', {}'.format(phase)
+                metric_info = self._metric_info(metric_id, title, chirality=-1)
+                metrics.append((value, self._snapshots, metric_info))
+        return metrics
+
+    def get_collector_values(self, collector) -> np.ndarray:
+        dbs = [
+            self.store.build_dbname(cluster=self.test.cbmonitor_clusters[0],
+                                    collector=collector,
+                                    bucket=bucket)
+            for bucket in self._bucket_names
+        ]
+        return self.series.concat(dbs, metric=collector, required=True)
 
     def count_overthreshold_value_of_collector(self, collector, threshold):
         values = self.get_collector_values(collector)
-        return sum(v >= threshold for v in values)
+        return int(np.count_nonzero(values >= threshold))
 
     def get_percentile_value_of_collector(self, collector, percentile):
         values = self.get_collector_values(collector)
@@ -666,12 +858,13 @@ class MetricHelper:
         return latency, self._snapshots, metric_info
 
     def _query_latency(self, percentile: Number, cluster_idx: int = 0) -> float:
-        values = []
-        for bucket in self._bucket_names:
-            db = self.store.build_dbname(cluster=self.test.cbmonitor_clusters[cluster_idx],
-                                         collector='spring_query_latency',
-                                         bucket=bucket)
-            values += self.store.get_values(db, metric='latency_query')
+        dbs = [
+            self.store.build_dbname(cluster=self.test.cbmonitor_clusters[cluster_idx],
+                                    collector='spring_query_latency',
+                                    bucket=bucket)
+            for bucket in self._bucket_names
+        ]
+        values = self.series.concat(dbs, metric='latency_query', required=True)
 
         query_latency = np.percentile(values, percentile)
         if query_latency < 100:
@@ -779,30 +972,55 @@ class MetricHelper:
                     collector: str,
                     stat_group: str = '',
                     cluster_idx: int = 0) -> list[float]:
-        timings = []
-        metric = 'latency_{}'.format(operation)
-        for bucket in self._bucket_names:
-            bucket_group = '{}{}'.format(bucket, '_' + stat_group if stat_group != '' else '')
-
-            db = self.store.build_dbname(cluster=self.test.cbmonitor_clusters[cluster_idx],
-                                         collector=collector,
-                                         bucket=bucket_group)
+        percentiles = list(percentiles)
+        histogram = None
+        if collector == 'spring_latency':
+            histogram = self._kv_latency_histogram(operation, stat_group, cluster_idx)
 
-            if self.store.exists(db, metric):
-                timings += self.store.get_values(db, metric=metric)
+        if histogram is not None:
+            values = list(histogram.percentiles(percentiles).values())
+        else:
+            metric = 'latency_{}'.format(operation)
+            dbs = [
+                self.store.build_dbname(cluster=self.test.cbmonitor_clusters[cluster_idx],
+                                        collector=collector,
+                                        bucket=self._bucket_group(bucket, stat_group))
+                for bucket in self._bucket_names
+            ]
+            timings = self.series.concat(dbs, metric)
 
-        if not timings:
-            logger.warn('No latency data found for operation = {}, collector = {}, stat_group = {}'
-                        .format(operation, collector, stat_group))
-            return []
+            if not len(timings):
+                logger.warn('No latency data found for operation = {}, collector = {}, '
+                            'stat_group = {}'.format(operation, collector, stat_group))
+                return []
+            values = np.percentile(timings, percentiles).tolist()
 
         latencies = [
-            round(latency) if (latency := np.percentile(timings, p)) > 100 else round(latency, 2)
-            for p in percentiles
+            round(latency) if latency > 100 else round(latency, 2)
+            for latency in values
         ]
 
         return latencies
 
+    def _kv_latency_histogram(self,
+                              operation: str,
+                              stat_group: str = '',
+                              cluster_idx: int = 0) -> Optional[LatencyHistogram]:
+        """Return the merged latency histogram of the phase if the workload recorded one."""
+        filename = Path(self.test.cbmonitor_clusters[cluster_idx]) / MERGED_HISTOGRAMS
+        if not filename.exists():
+            return None
+
+        with open(filename) as fh:
+            bucket_groups = json.load(fh)
+
+        histogram = LatencyHistogram()
+        for bucket in self._bucket_names:
+            histograms = bucket_groups.get(self._bucket_group(bucket, stat_group), {})
+            if sparse := histograms.get(operation):
+                histogram.merge(LatencyHistogram.from_sparse(sparse))
+        return histogram if histogram.total_count else None
+
     def observe_latency(self, percentile: Number) -> Metric:
         metric_id = '{}_{:g}th'.format(self.test_config.name, percentile)
         title = '{:g}th percentile {}'.format(percentile, self._title)
@@ -1117,24 +1335,30 @@ class MetricHelper:
             return False
         return True
 
-    def _parse_ycsb_throughput(self, operation: str = "access") -> int:
-        throughput = 0
+    def _parse_ycsb_logs(self, operation: str = "access") -> YCSBLog:
+        """Parse and merge the YCSB logs of the given phase.
+
+        The merged result is cached until any of the log files changes, so all
+        YCSB metrics of a phase share one pass over the logs.
+        """
         if operation == "load":
-            ycsb_log_files = [filename
-                              for filename in glob.glob("YCSB/ycsb_load_*.log")
-                              if "stderr" not in filename]
+            pattern = "YCSB/ycsb_load_*.log"
         else:
-            ycsb_log_files = [filename
-                              for filename in glob.glob("YCSB/ycsb_run_*.log")
-                              if "stderr" not in filename]
+            pattern = "YCSB/ycsb_run_*.log"
+        ycsb_log_files = sorted(filename for filename in glob.glob(pattern)
+                                if "stderr" not in filename)
+
+        key = tuple((filename, os.stat(filename).st_mtime, os.stat(filename).st_size)
+                    for filename in ycsb_log_files)
+        if key not in self.ycsb_logs:
+            ycsb_log = YCSBLog()
+            for filename in ycsb_log_files:
+                ycsb_log.merge(YCSBLog.parse(filename))
+            self.ycsb_logs[key] = ycsb_log
+        return self.ycsb_logs[key]
 
-        for filename in ycsb_log_files:
-            with open(filename) as fh:
-                for line in fh.readlines():
-                    if line.startswith('[OVERALL], Throughput(ops/sec)'):
-                        throughput += int(float(line.split()[-1]))
-                        break
-        return throughput
+    def _parse_ycsb_throughput(self, operation: str = "access") -> int:
+        return self._parse_ycsb_logs(operation).throughput
 
     def _parse_pytpcc_throughput(self) -> int:
         executed = 0
@@ -1150,131 +1374,23 @@ class MetricHelper:
                             executed = line.split()[1]
         return int(executed)
 
-    def _ycsb_perc_calc(self, _temp: List[Number], io_type: str, percentile: Number,
-                        lat_dic: Dict[str, Number], _fc: int) -> Dict[str, Number]:
-        pio_type = '{}th Percentile {}'.format(percentile, io_type)
-        p_lat = round(np.percentile(_temp, percentile) / 1000, 3)
-        if _fc > 1:
-            p_lat = round((((lat_dic[pio_type] * (_fc - 1)) + p_lat) / _fc), 3)
-        lat_dic.update({pio_type: p_lat})
-        return lat_dic
+    def _parse_ycsb_latency(self, percentile: Number,
+                            operation: str = "access") -> Dict[str, float]:
+        return self._parse_ycsb_logs(operation).latencies(percentile)
 
-    def _ycsb_avg_calc(self, _temp: List[Number], io_type: str, lat_dic: Dict[str, Number],
-                       _fc: int) -> Dict[str, Number]:
-        aio_type = 'Average {}'.format(io_type)
-        a_lat = round((sum(_temp) / len(_temp)) / 1000, 3)
-        if _fc > 1:
-            a_lat = round((((lat_dic[aio_type] * (_fc - 1)) + a_lat) / _fc), 3)
-        lat_dic.update({aio_type: a_lat})
-        return lat_dic
+    def ycsb_get_max_latency(self) -> Dict[str, float]:
+        return {
+            io_type: max_latency
+            for io_type, max_latency in self._parse_ycsb_logs().max_latencies.items()
+            if io_type != "CLEANUP" and "FAILED" not in io_type
+        }
 
-    def _parse_ycsb_latency(self, percentile: str, operation: str = "access") -> int:
-        lat_dic = {}
-        _temp = []
-        _fc = 1
-        if operation == "load":
-            ycsb_log_files = [filename
-                              for filename in glob.glob("YCSB/ycsb_load_*.log")
-                              if "stderr" not in filename]
-        else:
-            ycsb_log_files = [filename
-                              for filename in glob.glob("YCSB/ycsb_run_*.log")
-                              if "stderr" not in filename]
-        for filename in ycsb_log_files:
-            fh2 = open(filename)
-            _l1 = fh2.readlines()
-            _l1_len = len(_l1)
-            fh = open(filename)
-            _c = 0
-            for x in range(_l1_len - 1):
-                line = fh.readline()
-                if re.search('], (.*?)000,', line):
-                    io_type = line.split('[')[1].split(']')[0]
-                    _n = 0
-                    while (line.startswith('[{}]'.format(io_type))):
-                        lat = float(line.split()[-1])
-                        _temp.append(lat)
-                        line = fh.readline()
-                        _n += 1
-                    _temp.sort()
-                    if "FAILED" not in io_type and "CLEANUP" not in io_type:
-                        lat_dic = self._ycsb_perc_calc(_temp=_temp,
-                                                       io_type=io_type,
-                                                       lat_dic=lat_dic,
-                                                       _fc=_fc,
-                                                       percentile=percentile)
-                        lat_dic = self._ycsb_avg_calc(_temp=_temp,
-                                                      io_type=io_type,
-                                                      lat_dic=lat_dic,
-                                                      _fc=_fc)
-                    _temp.clear()
-                    _c += _n
-                _c += 1
-                x += _c
-            _fc += 1
-        return lat_dic
+    def ycsb_get_failed_ops(self) -> Dict[str, int]:
+        failures = self._parse_ycsb_logs().failures
+        return {io_type: failures.get(io_type, 0) for io_type in ("READ", "UPDATE")}
 
-    def ycsb_get_max_latency(self):
-        max_lats = {}
-        ycsb_log_files = [filename
-                          for filename in glob.glob("YCSB/ycsb_run_*.log")
-                          if "stderr" not in filename]
-        for filename in ycsb_log_files:
-            fh = open(filename)
-            lines = fh.readlines()
-            num_lines = len(lines)
-
-            fh2 = open(filename)
-            for x in range(0, num_lines):
-                line = fh2.readline()
-                if line.find("], MaxLatency(us),") >= 1:
-                    parts = line.split(",")
-                    type = parts[0].replace("[", "").replace("]", "")
-                    if type == "CLEANUP"\
-                            or "FAILED" in type:
-                        continue
-                    value = parts[2].strip()
-                    max_lats[type] = max(float(value)/1000.0, max_lats.get(type, 0))
-
-        return max_lats
-
-    def ycsb_get_failed_ops(self):
-        failures = {"READ": 0, "UPDATE": 0}
-        ycsb_log_files = [filename
-                          for filename in glob.glob("YCSB/ycsb_run_*.log")
-                          if "stderr" not in filename]
-        for filename in ycsb_log_files:
-            fh = open(filename)
-            lines = fh.readlines()
-            num_lines = len(lines)
-
-            fh2 = open(filename)
-            for x in range(0, num_lines):
-                line = fh2.readline()
-                if line.find("-FAILED], Operations,") >= 1:
-                    parts = line.split(",")
-                    type = parts[0].replace("[", "").replace("]", "").split("-")[0]
-                    if type in ["READ", "UPDATE"]:
-                        value = parts[2].strip()
-                        failures[type] = int(value) + failures.get(type, 0)
-        return failures
-
-    def ycsb_get_gcs(self):
-        ycsb_log_files = [filename
-                          for filename in glob.glob("YCSB/ycsb_run_*.log")
-                          if "stderr" not in filename]
-        gcs = 0
-        for filename in ycsb_log_files:
-            fh = open(filename)
-            lines = fh.readlines()
-            num_lines = len(lines)
-            fh2 = open(filename)
-            for x in range(0, num_lines):
-                line = fh2.readline()
-                if line.find("[TOTAL_GCs], Count,") >= 0:
-                    gcs += int(line.split(",")[2].strip())
-
-        return gcs
+    def ycsb_get_gcs(self) -> int:
+        return self._parse_ycsb_logs().gcs
 
     def ycsb_gcs(self) -> Metric:
         title = '{}, {}'.format("Garbage Collections", self._title)
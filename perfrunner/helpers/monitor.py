@@ -4,6 +4,7 @@ from typing import Callable, Optional
 from logger import logger
 from perfrunner.helpers import misc
 from perfrunner.helpers.rest import RestType
+from perfrunner.helpers.waiter import AdaptivePoller
 from perfrunner.remote import Remote
 from perfrunner.settings import ClusterSpec
 
@@ -86,11 +87,14 @@ class Monitor:
         is_running = True
         last_progress = 0
         last_progress_time = time.time()
+        poller = AdaptivePoller(self.POLLING_INTERVAL)
 
         while is_running:
-            time.sleep(self.POLLING_INTERVAL)
+            time.sleep(poller.next_interval())
 
             is_running, progress = self.rest.get_task_status(host, task_type="rebalance")
+            if progress is not None:
+                poller.observe(100 - progress)
             if progress == last_progress:
                 if time.time() - last_progress_time > self.REBALANCE_TIMEOUT:
                     logger.interrupt("Rebalance hung")
@@ -129,12 +133,12 @@ class Monitor:
             completion_message = rebalance_report["completionMessage"]
             logger.interrupt(f"Rebalance failed with message {completion_message}")
 
-    def _wait_for_empty_queues(self, host, bucket, queues, stats_function):
+    def _wait_for_empty_queues(self, host, bucket, queues, stats_function) -> float:
         metrics = list(queues)
 
-        start_time = time.time()
-        while metrics:
+        def get_queue_size() -> int:
             bucket_stats = stats_function(host, bucket)
+            queue_size = 0
             # As we are changing metrics in the loop; take a copy of it to
             # iterate over.
             for metric in list(metrics):
@@ -143,6 +147,7 @@ class Monitor:
                     last_value = stats[-1]
                     if last_value:
                         logger.info('{} = {:,}'.format(metric, last_value))
+                        queue_size += last_value
                         continue
                     else:
                         logger.info('{} reached 0'.format(metric))
@@ -150,27 +155,26 @@ class Monitor:
                 else:
                     logger.info('{} reached 0'.format(metric))
                     metrics.remove(metric)
-            if metrics:
-                time.sleep(self.POLLING_INTERVAL)
-            if time.time() - start_time > self.TIMEOUT:
-                raise Exception('Monitoring got stuck')
+            return queue_size
 
-    def _wait_for_empty_dcp_queues(self, host, bucket, stats_function):
-        start_time = time.time()
-        while True:
+        poller = AdaptivePoller(self.POLLING_INTERVAL, timeout=self.TIMEOUT)
+        return poller.wait(get_queue_size)
+
+    def _wait_for_empty_dcp_queues(self, host, bucket, stats_function) -> float:
+        def get_items_remaining() -> Optional[int]:
             kv_dcp_stats = stats_function(host, bucket)
             try:
                 if stats := int(kv_dcp_stats['data'][0]['values'][-1][1]):
                     logger.info('{} = {}'.format('ep_dcp_replica_items_remaining', stats))
                 else:
                     logger.info('{} reached 0'.format('ep_dcp_replica_items_remaining'))
-                    break
+                return stats
             except Exception:
-                pass
+                return None
 
-            if time.time() - start_time > self.TIMEOUT:
-                raise Exception('DCP queue Monitoring got stuck')
-            time.sleep(self.POLLING_INTERVAL)
+        poller = AdaptivePoller(self.POLLING_INTERVAL, timeout=self.TIMEOUT,
+                                message='DCP queue Monitoring got stuck')
+        return poller.wait(get_items_remaining)
 
     def _wait_for_replica_count_match(self, host, bucket):
         start_time = time.time()
@@ -586,8 +590,7 @@ class Monitor:
         indexes_remaining = [1 for _ in index_nodes]
 
         def update_indexes_remaining():
-            for i, node in enumerate(index_nodes):
-                indexes_remaining[i] = self.rest.indexes_per_node(node)
+            indexes_remaining[:] = self.rest.fan_out(self.rest.indexes_per_node, index_nodes)
 
         while (sum(indexes_remaining) != 0):
             time.sleep(self.POLLING_INTERVAL_INDEXING)
@@ -615,17 +618,19 @@ class Monitor:
                 if status == 'Ready':
                     indexes_ready[i] = 1
 
-        init_ts = time.time()
-        while sum(indexes_ready) != len(indexes):
-            time.sleep(self.POLLING_INTERVAL_INDEXING)
+        def get_num_indexes_pending() -> int:
             update_indexes_ready()
-        finish_ts = time.time()
+            return len(indexes) - sum(indexes_ready)
+
+        init_ts = time.time()
+        poller = AdaptivePoller(self.POLLING_INTERVAL_INDEXING)
+        finish_ts = poller.wait(get_num_indexes_pending)
         logger.info('secondary index build time: {}'.format(finish_ts - init_ts))
         time_elapsed = round(finish_ts - init_ts)
         return time_elapsed
 
-    def wait_for_secindex_init_build_collections(self, host,
-                                                 indexes, recovery=False, created=False):
+    def wait_for_secindex_init_build_collections(self, host, indexes, recovery=False,
+                                                 created=False) -> float:
         # POLL until initial index build is complete
         if created:
             check_for_status = 'Created'
@@ -673,12 +678,15 @@ class Monitor:
         else:
             polling_interval = self.POLLING_INTERVAL_INDEXING*10
 
-        while sum(indexes_ready) != len(indexes):
-            time.sleep(polling_interval)
+        def get_num_indexes_pending() -> int:
             update_indexes_ready()
+            return len(indexes) - sum(indexes_ready)
+
+        finish_ts = AdaptivePoller(polling_interval).wait(get_num_indexes_pending)
         logger.info('secondary index build complete: {}'.format(indexes))
+        return finish_ts
 
-    def wait_for_secindex_incr_build(self, index_nodes, bucket, indexes, numitems):
+    def wait_for_secindex_incr_build(self, index_nodes, bucket, indexes, numitems) -> float:
         # POLL until incremental index build is complete
         logger.info('expecting {} num_docs_indexed for indexes {}'.format(numitems, indexes))
 
@@ -702,18 +710,15 @@ class Monitor:
                 val2 = data[key]
                 val = int(val1) + int(val2)
                 num_pending.append(val)
-            return num_pending
+            return sum(num_pending)
 
-        expected_num_pending = [0] * len(indexes)
-        while True:
-            time.sleep(self.POLLING_INTERVAL_INDEXING)
-            curr_num_pending = get_num_docs_index_pending()
-            if curr_num_pending == expected_num_pending:
-                break
+        finish_ts = AdaptivePoller(self.POLLING_INTERVAL_INDEXING).wait(get_num_docs_index_pending)
         curr_num_indexed = get_num_docs_indexed()
         logger.info("Number of Items indexed {}".format(curr_num_indexed))
+        return finish_ts
 
-    def wait_for_secindex_incr_build_collections(self, index_nodes, index_map, expected_num_docs):
+    def wait_for_secindex_incr_build_collections(self, index_nodes, index_map,
+                                                 expected_num_docs) -> float:
         indexes = []
         for bucket_name, scope_map in index_map.items():
             for scope_name, collection_map in scope_map.items():
@@ -754,17 +759,14 @@ class Monitor:
                 val2 = data[key]
                 val = int(val1) + int(val2)
                 num_pending.append(val)
-            return num_pending
+            return sum(num_pending)
 
-        expected_num_pending = [0] * len(indexes)
-        while True:
-            time.sleep(self.POLLING_INTERVAL_INDEXING * 10)
-            curr_num_pending = get_num_docs_index_pending()
-            if curr_num_pending == expected_num_pending:
-                break
+        poller = AdaptivePoller(self.POLLING_INTERVAL_INDEXING * 10)
+        finish_ts = poller.wait(get_num_docs_index_pending)
 
         curr_num_indexed = get_num_docs_indexed()
         logger.info("Number of Items indexed {}".format(curr_num_indexed))
+        return finish_ts
 
     def wait_for_num_connections(self, index_node, expected_connections):
         curr_connections = self.rest.get_index_num_connections(index_node)
@@ -819,8 +821,7 @@ class Monitor:
             try:
                 persist = 0
                 compact = 0
-                for host in hosts:
-                    stats = self.rest.get_fts_stats(host)
+                for stats in self.rest.fan_out(self.rest.get_fts_stats, hosts):
                     persist += stats[f"{bucket}:{index}:num_recs_to_persist"]
                     compact += stats[f"{bucket}:{index}:total_compactions"]
                 pending_items = persist or compact
@@ -848,8 +849,7 @@ class Monitor:
                 persist = 0
                 current_file_merge_total = 0
                 current_mem_merge_total = 0
-                for host in hosts:
-                    stats = self.rest.get_fts_stats(host)
+                for stats in self.rest.fan_out(self.rest.get_fts_stats, hosts):
                     persist += stats[metric]
                     current_file_merge_total += stats[file_merge_ops]
                     current_mem_merge_total += stats[mem_merge_ops]
@@ -905,8 +905,8 @@ class Monitor:
     def get_num_analytics_items(self, analytics_node: str, bucket: str) -> int:
         stats_key = '{}:all:incoming_records_count_total'.format(bucket)
         num_items = 0
-        for node in self.rest.get_active_nodes_by_role(analytics_node, 'cbas'):
-            stats = self.rest.get_analytics_stats(node)
+        nodes = self.rest.get_active_nodes_by_role(analytics_node, 'cbas')
+        for stats in self.rest.fan_out(self.rest.get_analytics_stats, nodes):
             num_items += stats.get(stats_key, 0)
         return num_items
 
@@ -1420,16 +1420,19 @@ class Monitor:
                                                     "sgw_replication_pull_rev_send_count")
         return pull_count
 
+    def _sgw_hosts(self, hosts: list[str]) -> list[str]:
+        # Only the first host is polled on Capella
+        if self.cluster_spec.capella_infrastructure:
+            return hosts[:1]
+        return hosts
+
     def wait_sgw_push_start(self, hosts: list[str], num_buckets: int, initial_docs: int):
         retries = 0
         max_retries = 900
         while True:
-            push_count = 0
             start_time = time.time()
-            for host in hosts:
-                push_count += self.get_sgw_push_count(host, num_buckets)
-                if self.cluster_spec.capella_infrastructure:
-                    break
+            push_count = sum(self.rest.fan_out(self.get_sgw_push_count, self._sgw_hosts(hosts),
+                                              num_buckets))
 
             if push_count > initial_docs:
                 return start_time, push_count
@@ -1445,12 +1448,9 @@ class Monitor:
         retries = 0
         max_retries = 900
         while True:
-            pull_count = 0
             start_time = time.time()
-            for host in hosts:
-                pull_count += self.get_sgw_pull_count(host, num_buckets)
-                if self.cluster_spec.capella_infrastructure:
-                    break
+            pull_count = sum(self.rest.fan_out(self.get_sgw_pull_count, self._sgw_hosts(hosts),
+                                              num_buckets))
 
             if pull_count > initial_docs:
                 return start_time, pull_count
@@ -1466,16 +1466,15 @@ class Monitor:
         retries = 0
         max_retries = 360
         last_push_count = 0
+        poller = AdaptivePoller(self.POLLING_INTERVAL_SGW)
         while True:
-            push_count = 0
-            finished_time = time.time()
-            for host in hosts:
-                push_count += self.get_sgw_push_count(host, num_buckets)
-                if self.cluster_spec.capella_infrastructure:
-                    break
+            poll_time = time.time()
+            push_count = sum(self.rest.fan_out(self.get_sgw_push_count, self._sgw_hosts(hosts),
+                                              num_buckets))
+            poller.observe(target_docs - push_count, poll_time)
 
             if push_count >= target_docs:
-                return finished_time, push_count
+                return poller.completion_time(), push_count
             logger.info("push count: {}".format(push_count))
             if push_count == last_push_count:
                 retries += 1
@@ -1484,22 +1483,21 @@ class Monitor:
                         "Push failed to complete..."
                     )
             last_push_count = push_count
-            time.sleep(self.POLLING_INTERVAL_SGW)
+            time.sleep(poller.next_interval())
 
     def wait_sgw_pull_docs(self, hosts: list[str], num_buckets: int, target_docs: int):
         retries = 0
         max_retries = 360
         last_pull_count = 0
+        poller = AdaptivePoller(self.POLLING_INTERVAL_SGW)
         while True:
-            pull_count = 0
-            finished_time = time.time()
-            for host in hosts:
-                pull_count += self.get_sgw_pull_count(host, num_buckets)
-                if self.cluster_spec.capella_infrastructure:
-                    break
+            poll_time = time.time()
+            pull_count = sum(self.rest.fan_out(self.get_sgw_pull_count, self._sgw_hosts(hosts),
+                                              num_buckets))
+            poller.observe(target_docs - pull_count, poll_time)
 
             if pull_count >= target_docs:
-                return finished_time, pull_count
+                return poller.completion_time(), pull_count
             logger.info("pull count: {}".format(pull_count))
             if pull_count == last_pull_count:
                 retries += 1
@@ -1508,7 +1506,7 @@ class Monitor:
                         "Pull failed to complete..."
                     )
             last_pull_count = pull_count
-            time.sleep(self.POLLING_INTERVAL_SGW)
+            time.sleep(poller.next_interval())
 
     def wait_sgw_log_streaming_status(self, desired_status: str):
         retries = 0
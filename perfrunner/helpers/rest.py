@@ -1,10 +1,13 @@
 import base64
 import json
 import os
+import random
 import time
 from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from http.cookiejar import DefaultCookiePolicy
 from json import JSONDecodeError
-from typing import Callable, Iterator, Literal, Optional, Union
+from typing import Callable, Iterable, Iterator, Literal, Optional, Union
 from urllib.parse import urlparse
 
 import requests
@@ -12,6 +15,7 @@ from capella.columnar.CapellaAPI import CapellaAPI as CapellaAPIColumnar
 from capella.dedicated.CapellaAPI import CapellaAPI as CapellaAPIDedicated
 from capella.serverless.CapellaAPI import CapellaAPI as CapellaAPIServerless
 from decorator import decorator
+from requests.adapters import HTTPAdapter
 from requests.exceptions import ConnectionError
 
 from logger import logger
@@ -25,6 +29,28 @@ from perfrunner.utils.terraform import (
 
 MAX_RETRY = 20
 RETRY_DELAY = 10
+RETRY_BASE_DELAY = 0.5
+
+# Persistent connections per host and process
+POOL_SIZE = 16
+
+# Maximum number of nodes queried concurrently by RestBase.fan_out
+MAX_FAN_OUT = 32
+
+# Requests fail if a connection cannot be established within CONNECT_TIMEOUT. Read timeouts are
+# only enforced for GET requests to the endpoints polled below, other requests wait as long as
+# the server needs.
+CONNECT_TIMEOUT = 30
+READ_TIMEOUTS = {
+    '/pools/default': 60,
+    '/pools/default/tasks': 60,
+    '/pools/default/rebalanceProgress': 60,
+    '/pools/default/stats/range': 120,
+    '/pools/nodes': 60,
+    '/api/v1/stats': 120,
+    '/api/v1/bucket': 120,
+    '/api/v1/stats/indexer': 120,
+}
 
 # Used ports, named to match doc:
 # https://docs.couchbase.com/server/current/install/install-ports.html#detailed-port-description
@@ -51,25 +77,49 @@ ELASTICSEARCH_REST_PORT = 9200
 ELASTICSEARCH_REST_PORT_SSL = 19200
 
 
+def backoff_delay(attempt: int, max_delay: float) -> float:
+    """Return an exponential backoff delay with +/-50% jitter.
+
+    The jitter is centered on the delay, so concurrent clients don't retry in lockstep and the
+    mean delay is not shortened.
+    """
+    delay = min(max_delay, RETRY_BASE_DELAY * 2 ** attempt)
+    return random.uniform(delay / 2, 3 * delay / 2)
+
+
 @decorator
 def retry(method: Callable, *args, **kwargs):
+    """Retry failed requests with exponential backoff.
+
+    Requests are retried until the time spent sleeping reaches MAX_RETRY times the maximum delay,
+    the same budget as with fixed delays: 400s for connection errors and timeouts, 200s for HTTP
+    errors. Short delays in the beginning add attempts instead of shortening the budget.
+    """
     r = namedtuple('request', ['url'])('')
     url = kwargs.get('url')
-    for _ in range(MAX_RETRY):
+    attempt = 0
+    budget_used = 0.0
+    while budget_used < 1:
         try:
             r = method(*args, **kwargs)
             r.raise_for_status()
             return r
         except ConnectionError:
-            time.sleep(RETRY_DELAY * 2)
-            continue
+            max_delay = RETRY_DELAY * 2
+        except requests.exceptions.Timeout as e:
+            logger.warn('Retrying {}: {}'.format(url, e))
+            max_delay = RETRY_DELAY * 2
         except requests.exceptions.HTTPError as e:
             logger.warn(e)
             logger.warn(r.text)
             logger.warn('Retrying {}'.format(r.url))
-            time.sleep(RETRY_DELAY)
+            max_delay = RETRY_DELAY
+        delay = backoff_delay(attempt, max_delay)
+        time.sleep(delay)
+        budget_used += delay / (MAX_RETRY * max_delay)
+        attempt += 1
     logger.interrupt('Request {} failed after {} attempts'.format(
-        url, MAX_RETRY
+        url, attempt
     ))
 
 
@@ -93,18 +143,61 @@ class RestBase:
         self.auth = self.rest_username, self.rest_password
         self.cluster_spec = cluster_spec
         self.use_tls = use_tls
+        self.sessions = {}
+        self.executors = {}
 
     def _set_auth(self, **kwargs) -> tuple[str, str]:
         return self.auth
 
+    def _session(self, url: str) -> requests.Session:
+        """Return a keep-alive session for the host of the given url.
+
+        Sessions are never shared across processes, forked children open their own connections.
+        """
+        key = os.getpid(), urlparse(url).netloc
+        session = self.sessions.get(key)
+        if session is None:
+            session = requests.Session()
+            session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))  # Stateless auth
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE, pool_block=True)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            self.sessions[key] = session
+        return session
+
+    def fan_out(self, func: Callable, hosts: Iterable[str], *args, **kwargs) -> list:
+        """Call `func(host, *args, **kwargs)` for all hosts concurrently.
+
+        Results are returned in the order of hosts, the first exception is re-raised.
+        """
+        hosts = list(hosts)
+        if len(hosts) <= 1:
+            return [func(host, *args, **kwargs) for host in hosts]
+
+        executor = self.executors.get(os.getpid())
+        if executor is None:
+            executor = self.executors[os.getpid()] = ThreadPoolExecutor(MAX_FAN_OUT)
+        futures = [executor.submit(func, host, *args, **kwargs) for host in hosts]
+        return [future.result() for future in futures]
+
+    @staticmethod
+    def _timeout(url: str) -> tuple[float, Optional[float]]:
+        return CONNECT_TIMEOUT, READ_TIMEOUTS.get(urlparse(url).path.rstrip('/'))
+
+    def _request(self, method: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("auth", self._set_auth(**kwargs))
+        if method == 'GET':
+            kwargs.setdefault("timeout", self._timeout(kwargs['url']))
+        else:
+            kwargs.setdefault("timeout", (CONNECT_TIMEOUT, None))
+        return self._session(kwargs['url']).request(method, verify=False, **kwargs)
+
     @retry
     def get(self, **kwargs) -> requests.Response:
-        kwargs.setdefault("auth", self._set_auth(**kwargs))
-        return requests.get(verify=False, **kwargs)
+        return self._request('GET', **kwargs)
 
     def _post(self, **kwargs) -> requests.Response:
-        kwargs.setdefault("auth", self._set_auth(**kwargs))
-        return requests.post(verify=False, **kwargs)
+        return self._request('POST', **kwargs)
 
     @retry
     def post(self, **kwargs) -> requests.Response:
@@ -116,27 +209,25 @@ class RestBase:
         return session.post(verify=False, **kwargs)
 
     def _put(self, **kwargs) -> requests.Response:
-        kwargs.setdefault("auth", self._set_auth(**kwargs))
-        return requests.put(verify=False, **kwargs)
+        return self._request('PUT', **kwargs)
 
     @retry
     def put(self, **kwargs) -> requests.Response:
         return self._put(**kwargs)
 
     def _delete(self, **kwargs) -> requests.Response:
-        kwargs.setdefault("auth", self._set_auth(**kwargs))
-        return requests.delete(verify=False, **kwargs)
+        return self._request('DELETE', **kwargs)
 
     def delete(self, **kwargs) -> requests.Response:
         return self._delete(**kwargs)
 
     @retry
     def cblite_post(self, **kwargs) -> requests.Response:
-        return requests.post(**kwargs)
+        return self._session(kwargs['url']).post(**kwargs)
 
     @retry
     def cblite_get(self, **kwargs) -> requests.Response:
-        return requests.get(**kwargs)
+        return self._session(kwargs['url']).get(**kwargs)
 
     def _get_api_url(self, host: str, path: str,
                      plain_port: str = REST_PORT, ssl_port: str = REST_PORT_SSL) -> str:
@@ -917,13 +1008,15 @@ class DefaultRestHelper(RestBase):
 
     def get_index_stats(self, hosts: list[str]) -> dict:
         data = {}
-        for host in hosts:
-            url = self._get_api_url(host=host, path='stats', plain_port=INDEXING_PORT,
-                                    ssl_port=INDEXING_PORT_SSL)
-            host_data = self.get(url=url)
-            data.update(host_data.json())
+        for host_data in self.fan_out(self.get_index_node_stats, hosts):
+            data.update(host_data)
         return data
 
+    def get_index_node_stats(self, host: str) -> dict:
+        url = self._get_api_url(host=host, path='stats', plain_port=INDEXING_PORT,
+                                ssl_port=INDEXING_PORT_SSL)
+        return self.get(url=url).json()
+
     def get_index_num_connections(self, host: str) -> int:
         url = self._get_api_url(host=host, path='stats', plain_port=INDEXING_PORT,
                                 ssl_port=INDEXING_PORT_SSL)
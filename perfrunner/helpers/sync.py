@@ -1,18 +1,75 @@
 import threading
+import time
+from ctypes import c_double
+from multiprocessing import RawArray
+from typing import Optional, Tuple
 
+from logger import logger
 
-class SyncHotWorkload:
 
-    def __init__(self, current_hot_load_start, timer_elapse):
+class HotWindow:
+
+    """The position of a moving working set in shared memory.
+
+    The coordinator publishes hot-window epochs, workers read them without
+    taking any locks. Updates are guarded by a sequence counter (a seqlock):
+    the writer makes the counter odd while it is updating the epoch, readers
+    retry if they saw an odd or changed counter.
+
+    In the "jump" mode the working set moves by working_set_moving_docs at the
+    start of every epoch. In the "smooth" mode it slides by the same number of
+    documents continuously over the course of every epoch.
+    """
+
+    SEQUENCE, EPOCH, EPOCH_START = range(3)
+
+    def __init__(self, move_time: float, smooth: bool = False):
+        self.move_time = move_time
+        self.smooth = smooth
+        self.state = RawArray(c_double, 3)
+
+    def publish(self, epoch: int, epoch_start: float):
+        self.state[self.SEQUENCE] += 1
+        self.state[self.EPOCH] = epoch
+        self.state[self.EPOCH_START] = epoch_start
+        self.state[self.SEQUENCE] += 1
+
+    def read(self) -> Tuple[int, float]:
+        while True:
+            sequence = self.state[self.SEQUENCE]
+            if sequence % 2 == 0:
+                epoch, epoch_start = self.state[self.EPOCH], self.state[self.EPOCH_START]
+                if self.state[self.SEQUENCE] == sequence:
+                    return int(epoch), epoch_start
+
+    def position(self, now: Optional[float] = None) -> float:
+        """Return the number of moves made so far, fractional in the smooth mode."""
+        epoch, epoch_start = self.read()
+        if not self.smooth or not epoch_start:
+            return epoch
+        now = now or time.time()
+        return epoch + min((now - epoch_start) / self.move_time, 1)
+
+
+class WorkingSetCoordinator:
+
+    """Start a new hot-window epoch every working_set_move_time seconds."""
+
+    def __init__(self, hot_window: HotWindow):
+        self.hot_window = hot_window
+        self.epoch = 0
         self.timer = None
-        self.current_hot_load_start = current_hot_load_start
-        self.timer_elapse = timer_elapse
-
-    def start_timer(self, ws):
-        self.timer_elapse.value = 1
-        if ws.working_set_move_time:
-            self.timer = threading.Timer(ws.working_set_move_time, self.start_timer, args=[ws])
-            self.timer.start()
+
+    def start_timer(self):
+        self.hot_window.publish(self.epoch, time.time())
+        self.timer = threading.Timer(self.hot_window.move_time, self.next_epoch)
+        self.timer.daemon = True
+        self.timer.start()
+
+    def next_epoch(self):
+        self.epoch += 1
+        logger.info('Moving the working set, epoch {}'.format(self.epoch))
+        self.start_timer()
 
     def stop_timer(self):
         if self.timer:
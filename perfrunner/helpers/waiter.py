@@ -0,0 +1,100 @@
+import time
+from collections import deque
+from typing import Callable, Optional
+
+
+class AdaptivePoller:
+
+    """Poll a progress probe, speeding up as the remaining work drains.
+
+    The probe returns the amount of outstanding work (queue size, pending
+    docs, indexes not ready yet, etc.). The poller estimates the drain rate
+    from recent samples and, once the expected completion is closer than the
+    regular interval, sleeps for a fraction of the ETA instead. The moment
+    the work reached zero is interpolated from the rate, so measured times are
+    not quantized to the polling interval.
+    """
+
+    MIN_INTERVAL = 0.1  # seconds
+
+    HISTORY = 5  # samples used for the rate estimate
+
+    def __init__(self, interval: float, min_interval: float = MIN_INTERVAL,
+                 timeout: Optional[float] = None, message: str = 'Monitoring got stuck'):
+        self.interval = interval
+        self.min_interval = min(min_interval, interval)
+        self.timeout = timeout
+        self.message = message
+        self.start_time = time.time()
+        self.samples = deque(maxlen=self.HISTORY)
+
+    def observe(self, remaining: float, timestamp: Optional[float] = None):
+        if timestamp is None:
+            timestamp = time.time()
+        self.samples.append((timestamp, remaining))
+
+    @property
+    def remaining(self) -> Optional[float]:
+        if self.samples:
+            return self.samples[-1][1]
+
+    @property
+    def done(self) -> bool:
+        return bool(self.samples) and self.remaining <= 0
+
+    def rate(self, samples: Optional[list] = None) -> Optional[float]:
+        """Return the drain rate in units per second, None if there is no progress."""
+        samples = self.samples if samples is None else samples
+        if len(samples) < 2:
+            return None
+        (t0, r0), (t1, r1) = samples[0], samples[-1]
+        if t1 <= t0 or r1 >= r0:
+            return None
+        return (r0 - r1) / (t1 - t0)
+
+    def next_interval(self) -> float:
+        rate = self.rate()
+        if not rate or self.remaining is None:
+            return self.interval
+        eta = self.remaining / rate
+        return max(self.min_interval, min(self.interval, eta / 2))
+
+    def sleep(self):
+        if self.timeout and time.time() - self.start_time > self.timeout:
+            raise Exception(self.message)
+        time.sleep(self.next_interval())
+
+    def completion_time(self) -> float:
+        """Estimate when the remaining work reached zero.
+
+        An overshoot (e.g. a counter that passed its target) is interpolated
+        linearly between the last two samples. An exact zero is extrapolated
+        from the rate observed before it, bounded by the last two samples.
+        """
+        t1, r1 = self.samples[-1]
+        if len(self.samples) < 2:
+            return t1
+        t0, r0 = self.samples[-2]
+        if r0 <= 0 or t1 <= t0:
+            return t1
+        if r1 < 0:
+            return t0 + (t1 - t0) * r0 / (r0 - r1)
+        rate = self.rate(list(self.samples)[:-1])
+        if not rate:
+            return t1
+        return min(t1, t0 + r0 / rate)
+
+    def wait(self, probe: Callable[[], Optional[float]]) -> float:
+        """Poll the probe until it reports no remaining work.
+
+        Every sample is timestamped with the midpoint of the probe call.
+        Return the interpolated completion timestamp.
+        """
+        while True:
+            t0 = time.time()
+            remaining = probe()
+            if remaining is not None:  # The probe may fail to get a sample
+                self.observe(remaining, (t0 + time.time()) / 2)
+            if self.done:
+                return self.completion_time()
+            self.sleep()
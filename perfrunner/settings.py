@@ -996,6 +996,16 @@ class StatsSettings:
 
     REPORT_FOR_ALL_CLUSTERS = 0
 
+    SCHEDULER = 'process'  # options: process, asyncio
+
+    SSH_POOL = 'false'
+
+    REST_CACHE = 'false'
+
+    NS_SERVER_INCREMENTAL = 'false'
+
+    METADATA_REGISTRY = 'true'
+
     def __init__(self, options: dict):
         self.enabled = int(options.get('enabled', self.ENABLED))
         self.post_to_sf = int(options.get('post_to_sf', self.POST_TO_SF))
@@ -1011,6 +1021,13 @@ class StatsSettings:
             options.get('traced_processes', '').split()
         self.secondary_statsfile = options.get('secondary_statsfile',
                                                self.SECONDARY_STATSFILE)
+        self.scheduler = options.get('scheduler', self.SCHEDULER)
+        self.ssh_pool = maybe_atoi(options.get('ssh_pool', self.SSH_POOL))
+        self.rest_cache = maybe_atoi(options.get('rest_cache', self.REST_CACHE))
+        self.ns_server_incremental = maybe_atoi(options.get('ns_server_incremental',
+                                                            self.NS_SERVER_INCREMENTAL))
+        self.metadata_registry = maybe_atoi(options.get('metadata_registry',
+                                                        self.METADATA_REGISTRY))
 
         # Not used by all test classes, but can be used to decide whether to report KPIs for all
         # clusters or just the first (the default)
@@ -1377,6 +1394,7 @@ class PhaseSettings:
     ASYNC = False
 
     KEY_FMTR = 'decimal'
+    KEY_CACHE_SIZE = 0  # Cached key strings and alphabets per worker, 0 disables the cache
 
     ITEMS = 0
     SIZE = 2048
@@ -1392,6 +1410,7 @@ class PhaseSettings:
     WORKING_SET_ACCESS = 100
     WORKING_SET_MOVE_TIME = 0
     WORKING_SET_MOVE_DOCS = 0
+    WORKING_SET_MOVE_MODE = 'jump'  # 'jump' or 'smooth'
 
     THROUGHPUT = float('inf')
     QUERY_THROUGHPUT = float('inf')
@@ -1523,6 +1542,12 @@ class PhaseSettings:
 
     PER_COLLECTION_LATENCY = False
 
+    LATENCY_HISTOGRAMS = 'false'
+    LATENCY_DUMP_FORMAT = 'csv'  # options: csv, binary
+    OPEN_LOOP = 'false'
+    KV_PIPELINE = 0  # In-flight KV operations per worker, 0 uses the synchronous client
+    CPU_CORES = 0  # Cores per workload instance for CPU pinning, 0 disables pinning
+
     def __init__(self, options: dict):
         # Common settings
         self.time = int(options.get('time', self.TIME))
@@ -1569,9 +1594,12 @@ class PhaseSettings:
                                                      self.WORKING_SET_MOVE_TIME))
         self.working_set_moving_docs = int(options.get('working_set_moving_docs',
                                                        self.WORKING_SET_MOVE_DOCS))
+        self.working_set_move_mode = options.get('working_set_move_mode',
+                                                 self.WORKING_SET_MOVE_MODE)
         self.workers = int(options.get('workers', self.WORKERS))
         self.run_async = bool(int(options.get('async', self.ASYNC)))
         self.key_fmtr = options.get('key_fmtr', self.KEY_FMTR)
+        self.key_cache_size = int(options.get('key_cache_size', self.KEY_CACHE_SIZE))
 
         self.hot_reads = self.HOT_READS
         self.seq_upserts = self.SEQ_UPSERTS
@@ -1610,6 +1638,13 @@ class PhaseSettings:
         if isinstance(self.throughput_percentiles, str):
             self.throughput_percentiles = [float(x) for x in self.throughput_percentiles.split(',')]
 
+        self.latency_histograms = maybe_atoi(options.get('latency_histograms',
+                                                         self.LATENCY_HISTOGRAMS))
+        self.latency_dump_format = options.get('latency_dump_format', self.LATENCY_DUMP_FORMAT)
+        self.open_loop = maybe_atoi(options.get('open_loop', self.OPEN_LOOP))
+        self.kv_pipeline = int(options.get('kv_pipeline', self.KV_PIPELINE))
+        self.cpu_cores = int(options.get('cpu_cores', self.CPU_CORES))
+
         # Views settings
         self.ddocs = None
         self.index_type = None
@@ -9,7 +9,7 @@ from typing import Callable, Iterable, List, Optional
 from logger import logger
 from perfrunner.helpers import local
 from perfrunner.helpers.cluster import ClusterManager
-from perfrunner.helpers.memcached import MemcachedHelper
+from perfrunner.helpers.memcached import MemcachedHelper, disk_ops
 from perfrunner.helpers.metrics import MetricHelper
 from perfrunner.helpers.misc import pretty_dict, read_json
 from perfrunner.helpers.monitor import Monitor
@@ -702,19 +702,10 @@ class PerfTest:
         ret_stats = dict()
         for bucket in self.test_config.buckets:
             for server in self.rest.get_active_nodes_by_role(self.master_node, "kv"):
-                ret_stats[server] = dict()
                 port = self.rest.get_memcached_port(server)
 
                 stats = self.memcached.get_stats(server, port, bucket)
-                ret_stats[server]["get_ops"] = int(stats['ep_bg_fetched'])
-                sets = \
-                    int(stats['vb_active_ops_create']) \
-                    + int(stats['vb_replica_ops_create']) \
-                    + int(stats['vb_pending_ops_create']) \
-                    + int(stats['vb_active_ops_update']) \
-                    + int(stats['vb_replica_ops_update']) \
-                    + int(stats['vb_pending_ops_update'])
-                ret_stats[server]["set_ops"] = sets
+                ret_stats[server] = disk_ops(stats)
         return ret_stats
 
     def get_rebalance_timings(self):
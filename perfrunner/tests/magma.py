@@ -1,14 +1,16 @@
 import copy
 import json
 import time
-from typing import Callable
+from typing import Callable, Optional
 
 from decorator import decorator
 
+from cbagent.collectors import IOAmplification
 from logger import logger
 from perfrunner.helpers import local
 from perfrunner.helpers.cbmonitor import timeit, with_stats
 from perfrunner.helpers.config_files import TimeTrackingFile
+from perfrunner.helpers.memcached import typed_stats
 from perfrunner.helpers.misc import pretty_dict, read_json
 from perfrunner.helpers.profiler import with_profiles
 from perfrunner.helpers.worker import (
@@ -36,10 +38,21 @@ def with_console_stats(method: Callable, *args, **kwargs):
     helper.reset_kv_stats()
     helper.save_stats()
     method(*args, **kwargs)
-    helper.print_amplifications(doc_size=helper.test_config.access_settings.size)
+    helper.print_amplifications(doc_size=helper.doc_size)
     helper.print_kvstore_stats()
 
 
+@decorator
+def with_extra_access_doc_size(method: Callable, *args, **kwargs):
+    """Compute amplification of the decorated phase using the extra access document size."""
+    helper = args[0]
+    helper.doc_size = helper.test_config.extra_access_settings.size
+    try:
+        return method(*args, **kwargs)
+    finally:
+        helper.doc_size = helper.test_config.access_settings.size
+
+
 class MagmaBenchmarkTest(PerfTest):
 
     def __init__(self, *args):
@@ -328,9 +341,13 @@ class MagmaBenchmarkTest(PerfTest):
 
 class KVTest(PerfTest):
     COLLECTORS = {'disk': True, 'latency': True, 'net': False, 'kvstore': True,
-                  'vmstat': True, 'cbstats_memory': True, 'cbstats_all': True}
+                  'vmstat': True, 'cbstats_memory': True, 'cbstats_all': True,
+                  'io_amplification': True}
     CB_STATS_PORT = 11209
 
+    AMPLIFICATION_KPIS = ('physical_write_amp', 'physical_read_amp',
+                          'virtual_write_amp', 'virtual_read_amp')
+
     def __init__(self, *args):
         super().__init__(*args)
         local.extract_cb_any(filename='couchbase')
@@ -338,20 +355,15 @@ class KVTest(PerfTest):
         self.disk_stats = {}
         self.memcached_stats = {}
         self.disk_ops = {}
+        self.doc_size = self.test_config.access_settings.size
         self.iterator = TargetIterator(self.cluster_spec, self.test_config,
                                        self.test_config.load_settings.key_prefix)
 
     def print_kvstore_stats(self):
         try:
-            uname, pwd = self.cluster_spec.rest_credentials
-            stdout, returncode = local.run_cbstats("kvstore", self.master_node, self.CB_STATS_PORT,
-                                                   uname, pwd, self.test_config.buckets[0])
-            if returncode != 0:
-                logger.warning("KVTest failed to get kvstore stats from server: {}"
-                               .format(self.master_node))
-                return
-
-            data = json.loads(stdout)
+            data = self.memcached.get_stats(self.master_node, self.CB_STATS_PORT,
+                                            self.test_config.buckets[0], 'kvstore', max_retry=0)
+            data = typed_stats(data)
             stats = {}
             for key, value in data.items():
                 if key.startswith(("rw_0:", "rw_1:", "rw_2:", "rw_3:")):
@@ -456,6 +468,33 @@ class KVTest(PerfTest):
         self._print_amplifications(old_stats=self.memcached_stats, now_stats=now_memcached_ops,
                                    now_ops=now_ops, doc_size=doc_size, stat_type="Virtual")
 
+        self.print_amplification_series()
+
+    def print_amplification_series(self):
+        """Log the per-interval amplification of the last phase: average, p95 and peak."""
+        if not self.test_config.stats_settings.enabled or \
+                not self.COLLECTORS.get('io_amplification'):
+            return
+        summary = self.metrics.summarize_node_metrics(
+            collector=IOAmplification.COLLECTOR,
+            servers=self.rest.get_active_nodes_by_role(self.master_node, "kv"),
+            metrics=IOAmplification.METRICS)
+        logger.info("Amplification over the intervals of {}: {}".format(
+            self.cbmonitor_clusters[0], pretty_dict(summary)))
+
+    def report_kpi(self, *args, **kwargs):
+        super().report_kpi(*args, **kwargs)
+        self._report_amplification_kpi()
+
+    def _report_amplification_kpi(self, phase: Optional[str] = None):
+        if self.test_config.stats_settings.enabled and self.COLLECTORS.get('io_amplification'):
+            for metric in self.metrics.io_amplification(
+                servers=self.rest.get_active_nodes_by_role(self.master_node, "kv"),
+                metric_names=self.AMPLIFICATION_KPIS,
+                phase=phase,
+            ):
+                self.reporter.post(*metric)
+
     def wait_for_fragmentation(self):
         for master in self.cluster_spec.masters:
             for bucket in self.test_config.buckets:
@@ -561,6 +600,7 @@ class KVTest(PerfTest):
 
 
 class StabilityBootstrap(KVTest):
+    @with_extra_access_doc_size
     @with_console_stats
     def run_extra_access(self):
         self.COLLECTORS["latency"] = False
@@ -783,11 +823,13 @@ class SingleNodeThroughputDGMMagmaTest(ThroughputDGMMagmaTest):
 
         self.COLLECTORS["kvstore"] = False
         self.COLLECTORS["disk"] = False
+        self.COLLECTORS["io_amplification"] = False
         self.COLLECTORS["latency"] = False
         self.COLLECTORS["vmstat"] = False
         self.restart()
         self.COLLECTORS["kvstore"] = True
         self.COLLECTORS["disk"] = True
+        self.COLLECTORS["io_amplification"] = True
         self.COLLECTORS["latency"] = True
         self.COLLECTORS["vmstat"] = True
 
@@ -839,11 +881,13 @@ class SingleNodeMixedLatencyDGMTest(SingleNodeThroughputDGMMagmaTest):
 
         self.COLLECTORS["kvstore"] = False
         self.COLLECTORS["disk"] = False
+        self.COLLECTORS["io_amplification"] = False
         self.COLLECTORS["latency"] = False
         self.COLLECTORS["vmstat"] = False
         self.restart()
         self.COLLECTORS["kvstore"] = True
         self.COLLECTORS["disk"] = True
+        self.COLLECTORS["io_amplification"] = True
         self.COLLECTORS["latency"] = True
         self.COLLECTORS["vmstat"] = True
 
@@ -882,6 +926,7 @@ class PillowFightDGMTest(StabilityBootstrap):
 
         PerfTest.access(self, task=pillowfight_task)
 
+    @with_extra_access_doc_size
     @with_stats
     def run_extra_access(self):
         logger.info("Starting first access phase")
@@ -991,6 +1036,7 @@ class WarmupDGMTest(StabilityBootstrap):
 
         self.COLLECTORS["kvstore"] = False
         self.COLLECTORS["disk"] = False
+        self.COLLECTORS["io_amplification"] = False
         self.COLLECTORS["latency"] = False
         self.COLLECTORS["vmstat"] = False
         time_elapsed = self.warmup()
@@ -1001,7 +1047,7 @@ class WarmupDGMTest(StabilityBootstrap):
 class YCSBThroughputHIDDTest(YCSBThroughputTest, KVTest):
 
     COLLECTORS = {'disk': True, 'net': True, 'kvstore': True, 'vmstat': True,
-                  'cbstats_memory': True, 'cbstats_all': True}
+                  'cbstats_memory': True, 'cbstats_all': True, 'io_amplification': True}
 
     def __init__(self, *args):
         KVTest.__init__(self, *args)
@@ -1017,6 +1063,7 @@ class YCSBThroughputHIDDTest(YCSBThroughputTest, KVTest):
             self.print_amplifications(doc_size=self.test_config.access_settings.size)
             KVTest.print_kvstore_stats(self)
 
+    @with_extra_access_doc_size
     @with_stats
     def run_extra_access(self):
         self.reset_kv_stats()
@@ -1024,7 +1071,7 @@ class YCSBThroughputHIDDTest(YCSBThroughputTest, KVTest):
         self.build_ycsb(self.test_config.extra_access_settings.ycsb_client)
         logger.info("Starting first access phase")
         PerfTest.access(self, task=ycsb_task, settings=self.test_config.extra_access_settings)
-        self.print_amplifications(doc_size=self.test_config.extra_access_settings.size)
+        self.print_amplifications(doc_size=self.doc_size)
         KVTest.print_kvstore_stats(self)
 
     def run(self):
@@ -1133,6 +1180,11 @@ class YCSBThroughputLatencyHIDDPhaseTest(YCSBThroughputHIDDTest):
                         *self.metrics.ycsb_latency_phase(key, latency_dic[key], phase, workload)
                     )
 
+    def report_kpi(self, phase: int, workload: str, operation: str = "access"):
+        PerfTest.report_kpi(self, phase, workload, operation)
+        # Every phase is reported, so the phase is part of the amplification metrics
+        self._report_amplification_kpi(phase='Phase {}, {}'.format(phase, workload))
+
     @with_stats
     def custom_load(self, phase):
         KVTest.save_stats(self)
@@ -1300,7 +1352,8 @@ class JavaDCPThroughputDGMTest(KVTest):
 class RebalanceKVDGMTest(RebalanceKVTest, StabilityBootstrap):
 
     COLLECTORS = {'disk': True, 'latency': True, 'net': False, 'kvstore': True,
-                  'vmstat': True, 'cbstats_memory': True, 'cbstats_all': True}
+                  'vmstat': True, 'cbstats_memory': True, 'cbstats_all': True,
+                  'io_amplification': True}
 
     def __init__(self, *args):
         RebalanceKVTest.__init__(self, *args)
@@ -3,6 +3,7 @@ import csv
 import json
 import subprocess
 import time
+from typing import Optional
 
 import numpy
 
@@ -23,6 +24,24 @@ from perfrunner.tests.rebalance import AutoFailoverAndFailureDetectionTest, Reba
 from spring.docgen import decimal_fmtr
 
 
+def read_scan_latencies(*stats_files: str) -> numpy.ndarray:
+    """Read the scan latencies from one or more cbindexperf stats files.
+
+    Every row ends with the Nth-latency field. The files are parsed in chunks
+    of lines straight into NumPy arrays, and the files of several cbindexperf
+    clients are merged into one array.
+    """
+    chunks = []
+    for stats_file in stats_files:
+        with open(stats_file) as f:
+            while lines := f.readlines(SecondaryIndexTest.STATS_FILE_CHUNK_SIZE):
+                chunks.append(numpy.array([line.rpartition(':')[2] for line in lines],
+                                          dtype=numpy.float64))
+    if not chunks:
+        return numpy.empty(0)
+    return numpy.concatenate(chunks)
+
+
 class SecondaryIndexTest(PerfTest):
 
     """Measure time it takes to build secondary index.
@@ -36,6 +55,8 @@ class SecondaryIndexTest(PerfTest):
 
     SECONDARY_STATS_FILE = '/root/statsfile'
 
+    STATS_FILE_CHUNK_SIZE = 16 * 1024 ** 2  # bytes
+
     def __init__(self, *args):
         super().__init__(*args)
 
@@ -139,6 +160,11 @@ class SecondaryIndexTest(PerfTest):
         else:
             logger.info('Existing 2i latency stats file removed')
 
+    def calculate_scan_latencies(self, stats_files: Optional[list[str]] = None) -> list[float]:
+        """Return the 0th to 99th percentiles of scan latencies."""
+        scan_latencies = read_scan_latencies(*(stats_files or [self.SECONDARY_STATS_FILE]))
+        return numpy.percentile(scan_latencies, range(100)).tolist()
+
     def cloud_restore(self):
         self.remote.extract_cb_any(filename='couchbase',
                                    worker_home=self.worker_manager.WORKER_HOME)
@@ -298,11 +324,11 @@ class SecondaryIndexTest(PerfTest):
                 self.remote.build_secondary_index_collections_cloud(
                     self.index_nodes, build_options, self.is_ssl, self.admin_auth,
                     self.refresh_settings)
-            self.monitor.wait_for_secindex_init_build_collections(
+            finish_ts = self.monitor.wait_for_secindex_init_build_collections(
                 self.index_nodes[0],
                 self.indexes)
 
-            time_elapsed = time.time() - build_start
+            time_elapsed = finish_ts - build_start
         else:
             self.remote.build_secondary_index(
                 self.index_nodes,
@@ -579,9 +605,9 @@ class InitialandIncrementalSecondaryIndexTest(SecondaryIndexTest):
         self.print_index_disk_usage(heap_profile=False)
 
     @with_stats
-    @timeit
     @with_profiles
-    def build_incrindex(self):
+    def build_incrindex(self) -> float:
+        t0 = time.time()
         if self.test_config.collection.collection_map is not None:
             coll_map = self.test_config.collection.collection_map
             num_access_collections = 0
@@ -597,18 +623,19 @@ class InitialandIncrementalSecondaryIndexTest(SecondaryIndexTest):
                 * self.test_config.cluster.num_buckets // num_access_collections
 
             self.access()
-            self.monitor.wait_for_secindex_incr_build_collections(
+            finish_ts = self.monitor.wait_for_secindex_incr_build_collections(
                 self.index_nodes,
                 self.indexes,
                 expected_docs)
         else:
             self.access()
             numitems = self.test_config.load_settings.items + self.test_config.access_settings.items
-            self.monitor.wait_for_secindex_incr_build(
+            finish_ts = self.monitor.wait_for_secindex_incr_build(
                 self.index_nodes,
                 self.bucket,
                 list(self.indexes.keys()),
                 numitems)
+        return finish_ts - t0  # Elapsed time in seconds
 
     def run_recovery_scenario(self):
         if self.run_recovery_test:
@@ -702,9 +729,9 @@ class InitialandIncrementalandRecoverySecondaryIndexTest(InitialandIncrementalSe
             # Measure recovery time for index
             self.remote.kill_process_on_index_node("indexer")
             start_time = time.time()
-            self.monitor.wait_for_secindex_init_build_collections(
+            finish_ts = self.monitor.wait_for_secindex_init_build_collections(
                 self.index_nodes[0], self.indexes, recovery=True)
-            recovery_time = time.time() - start_time
+            recovery_time = finish_ts - start_time
             self.report_kpi(recovery_time, 'Recovery')
 
 
@@ -893,24 +920,6 @@ class SecondaryIndexingScanTest(SecondaryIndexTest):
                                                            percentile=95,
                                                            title=title))
 
-    def calculate_scan_latencies(self):
-
-        scan_latencies = []
-        percentile_latencies = []
-
-        with open(self.SECONDARY_STATS_FILE, 'r') as f:
-            reader = csv.reader(f)
-            for row in reader:
-                nth_lat_str = row[-1]
-                nth_lat_val = nth_lat_str.split(":")[-1]
-                val = nth_lat_val.strip()
-                scan_latencies.append(float(val))
-
-        for percentile in range(100):
-            percentile_latencies.append(numpy.percentile(scan_latencies, percentile))
-
-        return percentile_latencies
-
     def run(self):
         self.remove_statsfile()
         self.load()
@@ -1962,24 +1971,6 @@ class SecondaryIndexingThroughputNoAccessTest(SecondaryIndexingThroughputTest):
         else:
             logger.info('Existing scan result file removed')
 
-    def calculate_scan_latencies(self):
-
-        scan_latencies = []
-        percentile_latencies = []
-
-        with open(self.SECONDARY_STATS_FILE, 'r') as f:
-            reader = csv.reader(f)
-            for row in reader:
-                nth_lat_str = row[-1]
-                nth_lat_val = nth_lat_str.split(":")[-1]
-                val = nth_lat_val.strip()
-                scan_latencies.append(float(val))
-
-        for percentile in range(100):
-            percentile_latencies.append(numpy.percentile(scan_latencies, percentile))
-
-        return percentile_latencies
-
     def _report_kpi(self,
                     percentile_latencies,
                     scan_thr: float = 0,
@@ -2065,24 +2056,6 @@ class InMemoryCompressionTest(SecondaryIndexingThroughputTest):
         else:
             logger.info('Existing scan result file removed')
 
-    def calculate_scan_latencies(self):
-
-        scan_latencies = []
-        percentile_latencies = []
-
-        with open(self.SECONDARY_STATS_FILE, 'r') as f:
-            reader = csv.reader(f)
-            for row in reader:
-                nth_lat_str = row[-1]
-                nth_lat_val = nth_lat_str.split(":")[-1]
-                val = nth_lat_val.strip()
-                scan_latencies.append(float(val))
-
-        for percentile in range(100):
-            percentile_latencies.append(numpy.percentile(scan_latencies, percentile))
-
-        return percentile_latencies
-
     def _report_kpi(self, percentile_latencies, scan_thr: float = 0):
         title = "Secondary Scan Throughput (scanps) {}" \
             .format(str(self.test_config.showfast.title).strip())
@@ -2156,24 +2129,6 @@ class InitialScanThroughputLatencyCloudTest(SecondaryIndexingThroughputTest):
         else:
             logger.info('Existing scan result file removed')
 
-    def calculate_scan_latencies(self):
-
-        scan_latencies = []
-        percentile_latencies = []
-
-        with open(self.SECONDARY_STATS_FILE, 'r') as f:
-            reader = csv.reader(f)
-            for row in reader:
-                nth_lat_str = row[-1]
-                nth_lat_val = nth_lat_str.split(":")[-1]
-                val = nth_lat_val.strip()
-                scan_latencies.append(float(val))
-
-        for percentile in range(100):
-            percentile_latencies.append(numpy.percentile(scan_latencies, percentile))
-
-        return percentile_latencies
-
     def _report_kpi(self,
                     percentile_latencies,
                     scan_thr: float = 0,
@@ -2236,24 +2191,6 @@ class ThroughputLatencyMutationScanCloudTest(SecondaryIndexingThroughputTest):
         else:
             logger.info('Existing scan result file removed')
 
-    def calculate_scan_latencies(self):
-
-        scan_latencies = []
-        percentile_latencies = []
-
-        with open(self.SECONDARY_STATS_FILE, 'r') as f:
-            reader = csv.reader(f)
-            for row in reader:
-                nth_lat_str = row[-1]
-                nth_lat_val = nth_lat_str.split(":")[-1]
-                val = nth_lat_val.strip()
-                scan_latencies.append(float(val))
-
-        for percentile in range(100):
-            percentile_latencies.append(numpy.percentile(scan_latencies, percentile))
-
-        return percentile_latencies
-
     def _report_kpi(self,
                     percentile_latencies,
                     scan_thr: float = 0,
@@ -6,7 +6,9 @@ import time
 import zipfile
 from argparse import ArgumentParser
 from collections import defaultdict
-from collections.abc import Callable
+from collections.abc import Iterable
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
 from functools import cached_property
 from multiprocessing import set_start_method
 from pathlib import Path
@@ -30,49 +32,134 @@ GOLANG_LOG_FILES = ("eventing.log",
                     "projector.log",
                     "query.log")
 
+PANIC = 'panic'
+
+STORAGE_CORRUPTED = 'Storage corrupted and unrecoverable'
+
+
+@dataclass
+class ZipScanResult:
+    panic_files: list[str] = field(default_factory=list)
+    crash_files: list[str] = field(default_factory=list)
+    storage_corrupted_files: list[str] = field(default_factory=list)
+    errors: list[tuple[str, ...]] = field(default_factory=list)
+    version: str = 'Unknown'
+
+
+class ZipLogScanner:
+
+    """Scan cbcollect zips for failures and error logs in a single pass.
+
+    Every zip member is streamed once in chunks that end on a line boundary.
+    All checks that apply to the member run against each chunk while it is
+    in memory, and a member is not read any further once all of them have
+    matched. Zips are scanned in parallel, one node per process.
+    """
+
+    CHUNK_SIZE = 4 * 1024 ** 2
+
+    # Plain substring search is much faster than a regex alternation in CPython
+    FAILURE_PATTERNS = {
+        'panic': PANIC.encode(),
+        'storage_corrupted': STORAGE_CORRUPTED.encode(),
+    }
+
+    # <logger>:<level>,<datetime>,<user@address>:<component><line>:<error_title>:<line>]<error_body>
+    # Keep the following groups: logger, title, error_body
+    ERROR_LOG_RE = r'\[(\w+):\w+,\d+-\d+-\d+T\d+:\d+:\d+.\d+-\d+:\d+,\w+@.*?:\w+<.*>:(.*):\d+\](.*)'
+
+    VERSION_RE = r'[.*\s*.*]*(\sINFO\sCouchbase\sversion\s)(.*)\sstarting'
+
+    def __init__(self, collect_errors: bool = True):
+        self.collect_errors = collect_errors
+
+    @staticmethod
+    def content_checks(name: str) -> set[str]:
+        checks = set()
+        if any(log_file in name for log_file in GOLANG_LOG_FILES):
+            checks.add('panic')
+        if 'indexer.log' in name:
+            checks.add('storage_corrupted')
+        return checks
+
+    def read_chunks(self, zf: zipfile.ZipFile, name: str) -> Iterable[bytes]:
+        """Yield the content of a zip member in chunks of whole lines."""
+        tail = b''
+        with zf.open(name) as fh:
+            while chunk := fh.read(self.CHUNK_SIZE):
+                chunk = tail + chunk
+                end = chunk.rfind(b'\n') + 1
+                if not end:
+                    tail = chunk
+                    continue
+                tail = chunk[end:]
+                yield chunk[:end]
+        if tail:
+            yield tail
+
+    def scan_member(self, zf: zipfile.ZipFile, name: str, result: ZipScanResult):
+        checks = self.content_checks(name)
+        collect_errors = self.collect_errors and 'error.log' in name
+        find_version = self.collect_errors and 'memcached.log' in name \
+            and result.version == 'Unknown'
+        if not (checks or collect_errors or find_version):
+            return
+
+        matched = set()
+        for chunk in self.read_chunks(zf, name):
+            for check in checks - matched:
+                if self.FAILURE_PATTERNS[check] in chunk:
+                    matched.add(check)
+            if collect_errors:
+                result.errors.extend(re.findall(self.ERROR_LOG_RE,
+                                                chunk.decode(errors='replace')))
+            if find_version:
+                if match := re.search(self.VERSION_RE, chunk.decode(errors='replace')):
+                    result.version = match.group().split('-')[0].split()[-1]
+                    find_version = False
+            if not (checks - matched or collect_errors or find_version):
+                break
+
+        if 'panic' in matched:
+            result.panic_files.append(name)
+        if 'storage_corrupted' in matched:
+            result.storage_corrupted_files.append(name)
+
+    def scan(self, filename: str) -> ZipScanResult:
+        result = ZipScanResult()
+        with zipfile.ZipFile(filename) as zf:
+            for name in zf.namelist():
+                if name.endswith('.dmp'):
+                    result.crash_files.append(name)
+                else:
+                    self.scan_member(zf, name, result)
+        return result
+
+    def scan_all(self, filenames: Iterable[str]) -> dict[str, ZipScanResult]:
+        filenames = sorted(filenames)
+        if len(filenames) < 2:
+            return {filename: self.scan(filename) for filename in filenames}
+
+        workers = min(len(filenames), os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return dict(zip(filenames, executor.map(self.scan, filenames)))
+
 
 class LogsVerifier:
 
-    def check_file_for(self, filename: str, predicate_func: Callable,
-                       processor_func: Callable) -> list[str]:
-        """Check files contained in the zipfile for conditions provided by the functions.
-
-        predicate_func: Condition to match filenames.
-        processor_func: Condition to match file contents.
-        Return filenames passing both condition functions.
-        """
-        zf = zipfile.ZipFile(filename)
-        error_files = []
-        for name in zf.namelist():
-            if predicate_func(name) and processor_func(zf.read(name)):
-                error_files.append(name)
-        return error_files
-
-    def check_for_golang_panic(self, filename: str) -> list[str]:
-        return self.check_file_for(filename,
-                                   lambda name:
-                                   any(log_file in name for log_file in GOLANG_LOG_FILES),
-                                   lambda data: ('panic' in str(data)))
-
-    def check_for_crash_files(self, filename: str) -> list[str]:
-        return self.check_file_for(filename,
-                                   lambda name: name.endswith('.dmp'),
-                                   lambda _: True)
-
-    def check_for_storage_corrupted(self, filename: str) -> list[str]:
-        return self.check_file_for(filename,
-                                   lambda name: 'indexer.log' in name,
-                                   lambda data: 'Storage corrupted and unrecoverable' in str(data))
-
-    def process_logs(self, is_capella: bool, remote: RemoteLinux):
+    def process_logs(self, is_capella: bool, remote: RemoteLinux,
+                     scans: dict[str, ZipScanResult] = None):
+        if scans is None:
+            scans = ZipLogScanner(collect_errors=False).scan_all(glob.iglob('./*.zip'))
+
         failures = defaultdict(dict)
-        for filename in glob.iglob('./*.zip'):
-            if panic_files := self.check_for_golang_panic(filename):
-                failures['panics'][filename] = panic_files
-            if crash_files := self.check_for_crash_files(filename):
-                failures['crashes'][filename] = crash_files
-            if storage_corrupted_files := self.check_for_storage_corrupted(filename):
-                failures['storage_corrupted'][filename] = storage_corrupted_files
+        for filename, result in scans.items():
+            if result.panic_files:
+                failures['panics'][filename] = result.panic_files
+            if result.crash_files:
+                failures['crashes'][filename] = result.crash_files
+            if result.storage_corrupted_files:
+                failures['storage_corrupted'][filename] = result.storage_corrupted_files
                 if not is_capella:
                     remote.collect_index_datafiles()
 
@@ -81,9 +168,6 @@ class LogsVerifier:
 
 
 class LokiLogsProcessor(LogsVerifier):
-    # <logger>:<level>,<datetime>,<user@address>:<component><line>:<error_title>:<line>]<error_body>
-    # Keep the following groups: logger, title, error_body
-    ERROR_LOG_RE = r'\[(\w+):\w+,\d+-\d+-\d+T\d+:\d+:\d+.\d+-\d+:\d+,\w+@.*?:\w+<.*>:(.*):\d+\](.*)'
 
     LOKI_PUSH_API = 'http://172.23.123.237/loki/loki/api/v1/push'
 
@@ -96,40 +180,21 @@ class LokiLogsProcessor(LogsVerifier):
     def _job_name(self) -> str:
         return os.environ.get('BUILD_TAG', 'local')
 
-    def get_version(self, filename: str) -> str:
-        # Assume all nodes have the same server version, so get it once
-        if self.version:
-            return self.version
-
-        self.check_file_for(filename,
-                            lambda name: 'memcached.log' in name,
-                            self._read_server_version)
-        return self.version
+    def process_logs(self, is_capella: bool, remote, scans: dict[str, ZipScanResult] = None):
+        if scans is None:
+            scans = ZipLogScanner().scan_all(glob.iglob('./*.zip'))
 
-    def _read_server_version(self, data: bytes):
-        try:
-            file_content = data.decode()
-            group = re.search(r'[.*\s*.*]*(\sINFO\sCouchbase\sversion\s)(.*)\sstarting',
-                              file_content).group()
-            self.version = group.split('-')[0].split()[-1]
-        except Exception:
-            self.version = 'Unknown'
-
-    def process_logs(self, is_capella: bool, remote):
-        for filename in glob.iglob('./*.zip'):
+        for filename, result in scans.items():
             try:
-                self.check_file_for(filename,
-                                    lambda name: 'error.log' in name,
-                                    self.collect_errors)
-                self.store_logs(filename, is_capella, self.get_version(filename))
+                self.logs = [ErrorEvent(error) for error in result.errors]
+                # Assume all nodes have the same server version, so get it once
+                if self.version in (None, 'Unknown'):
+                    self.version = result.version
+                self.store_logs(filename, is_capella, self.version)
                 self.logs.clear()
             except Exception as e:
                 logger.warn(e)
 
-    def collect_errors(self, data: bytes):
-        for error in  re.findall(self.ERROR_LOG_RE, data.decode()):
-            self.logs.append(ErrorEvent(error))
-
     def store_logs(self, filename: str, is_capella: bool, version: str):
         # For each error, convert to loki with extra parameters
         # source: ns_server | datadog | others
@@ -307,12 +372,15 @@ def main():
         if os.path.exists(logs):
             shutil.make_archive('tools', 'zip', logs)
 
+    # Scan all logs once
+    scans = ZipLogScanner().scan_all(glob.iglob('./*.zip'))
+
     # Push log lines to Loki
     loki_manager = LokiLogsProcessor()
-    loki_manager.process_logs(cluster_spec.capella_infrastructure, remote)
+    loki_manager.process_logs(cluster_spec.capella_infrastructure, remote, scans)
     # Process logs, throw exception if any
     analyser = LogsVerifier()
-    analyser.process_logs(cluster_spec.capella_infrastructure, remote)
+    analyser.process_logs(cluster_spec.capella_infrastructure, remote, scans)
 
 
 if __name__ == '__main__':
@@ -2,6 +2,7 @@ import time
 from ctypes import CDLL
 from datetime import timedelta
 
+from acouchbase.cluster import Cluster as AIOCluster
 from couchbase import subdocument
 from couchbase.cluster import (
     Cluster,
@@ -15,7 +16,15 @@ from couchbase_core.cluster import PasswordAuthenticator
 from couchbase_core.views.params import ViewQuery
 from txcouchbase.cluster import TxCluster
 
-from spring.cbgen_helpers import backoff, get_connection, quiet, time_all, timeit
+from spring.cbgen_helpers import (
+    backoff,
+    get_connection,
+    quiet,
+    quiet_async,
+    time_all,
+    time_all_async,
+    timeit,
+)
 
 
 class CBAsyncGen3:
@@ -103,6 +112,81 @@ class CBAsyncGen3:
         return self.collection.remove(key)
 
 
+class CBAIOGen3:
+
+    """asyncio client that keeps many KV operations in flight on one connection.
+
+    The methods are coroutines with the same arguments as in CBGen3. The
+    collection is passed down explicitly since operations run concurrently.
+    Every operation is timed on its own, like the @time_all methods of CBGen3.
+    """
+
+    TIMEOUT = 600  # seconds
+
+    def __init__(self, **kwargs):
+        self.connection_string, cert_path = get_connection(**kwargs)
+        timeout = ClusterTimeoutOptions(kv_timeout=timedelta(seconds=self.TIMEOUT))
+        self.options = ClusterOptions(
+            authenticator=PasswordAuthenticator(
+                kwargs["username"], kwargs["password"], cert_path=cert_path
+            ),
+            timeout_options=timeout,
+        )
+        self.bucket_name = kwargs['bucket']
+        self.cluster = None
+        self.collections = dict()
+
+    async def connect_collections(self, scope_collection_list):
+        # The cluster is bound to the running event loop, so it cannot be created earlier
+        self.cluster = AIOCluster(connection_string=self.connection_string, options=self.options)
+        await self.cluster.on_connect()
+        bucket = self.cluster.bucket(self.bucket_name)
+        await bucket.on_connect()
+        for scope_collection in scope_collection_list:
+            scope, collection = scope_collection.split(":")
+            if scope == "_default" and collection == "_default":
+                self.collections[scope_collection] = bucket.default_collection()
+            else:
+                self.collections[scope_collection] = bucket.scope(scope).collection(collection)
+
+    async def create(self, target: str, *args, **kwargs):
+        return await self.do_update(self.collections[target], *args, **kwargs)
+
+    async def create_durable(self, target: str, *args, **kwargs):
+        return await self.do_update_durable(self.collections[target], *args, **kwargs)
+
+    async def read(self, target: str, *args, **kwargs):
+        return await self.do_read(self.collections[target], *args, **kwargs)
+
+    async def update(self, target: str, *args, **kwargs):
+        return await self.do_update(self.collections[target], *args, **kwargs)
+
+    async def update_durable(self, target: str, *args, **kwargs):
+        return await self.do_update_durable(self.collections[target], *args, **kwargs)
+
+    async def delete(self, target: str, *args, **kwargs):
+        return await self.do_delete(self.collections[target], *args, **kwargs)
+
+    @time_all_async
+    async def do_update(self, collection, key: str, doc: dict, persist_to: int = 0,
+                        replicate_to: int = 0, ttl: int = 0):
+        await collection.upsert(key, doc, persist_to=persist_to, replicate_to=replicate_to,
+                                ttl=ttl)
+
+    @time_all_async
+    async def do_update_durable(self, collection, key: str, doc: dict,
+                                durability: int = None, ttl: int = 0):
+        await collection.upsert(key, doc, durability_level=durability, ttl=ttl)
+
+    @time_all_async
+    async def do_read(self, collection, key: str):
+        await collection.get(key)
+
+    @quiet_async
+    async def do_delete(self, collection, key: str):
+        await collection.remove(key)
+
+
 class CBGen3(CBAsyncGen3):
 
     TIMEOUT = 600  # seconds
@@ -1,3 +1,4 @@
+import asyncio
 import random
 from collections import defaultdict
 from threading import Timer
@@ -127,6 +128,37 @@ def time_all(method: Callable, *args, **kwargs):
         error_tracker.track(method.__name__, e)
 
 
+@decorator
+async def quiet_async(method: Callable, *args, **kwargs):
+    try:
+        return await method(*args, **kwargs)
+    except CouchbaseError as e:
+        error_tracker.track(method.__name__, e)
+
+
+@decorator
+async def time_all_async(method: Callable, *args, **kwargs):
+    """Coroutine version of time_all, backing off doesn't block other operations."""
+    try:
+        retry_delay = 0.1
+        has_retried = False
+        start_time = time()
+        while True:
+            try:
+                t0 = time()
+                await method(*args, **kwargs)
+                t1 = time()
+                if has_retried:
+                    return t1 - t0, t1 - start_time
+                return t1 - t0, t1 - t0
+            except TemporaryFailError:
+                has_retried = True
+                await asyncio.sleep(retry_delay)
+                retry_delay *= 1 + 0.1 * random.random()
+    except CouchbaseError as e:
+        error_tracker.track(method.__name__, e)
+
+
 def get_connection(**kwargs) -> tuple[str, Optional[str]]:
     """Create a desired combination of connection string and certificate from the kwargs input."""
     scheme = "couchbase"
@@ -6,6 +6,7 @@ import time
 import uuid
 from collections import deque
 from datetime import date, datetime, timedelta
+from functools import lru_cache
 from typing import Iterator, List, Tuple
 
 import numpy as np
@@ -32,6 +33,12 @@ from spring.dictionary import (
     ZIP_CODES,
 )
 
+try:
+    from fastdocgen import build_document as native_build_document
+    from fastdocgen import build_string as native_build_string
+except ImportError:  # The extension was built before the native builders were added
+    native_build_document = native_build_string = None
+
 PRIME = 4889388631
 
 MAX_PRIME = 25191867719
@@ -70,8 +77,49 @@ def hex_fmtr(key: int, prefix: str) -> str:
     return key
 
 
+def format_key(number: int, prefix: str, fmtr: str) -> str:
+    if fmtr == 'hash':
+        return hash_fmtr(number, prefix)
+    if fmtr == 'hex':
+        return hex_fmtr(number, prefix)
+    if fmtr == 'no_hash':
+        return str(number)
+    return decimal_fmtr(number, prefix)
+
+
+def key_alphabet(key: str) -> str:
+    return hex_digest(key) + hex_digest(key[::-1])
+
+
+class KeyCache:
+
+    """Bounded LRU caches of key strings and their document alphabets.
+
+    Workloads with a small hot working set format and hash the same keys over
+    and over again. The cache is disabled by default, workers enable it with
+    the key_cache_size setting.
+    """
+
+    def __init__(self, size: int = 0):
+        self.resize(size)
+
+    def resize(self, size: int):
+        self.size = size
+        if size:
+            self.string = lru_cache(maxsize=size)(format_key)
+            self.alphabet = lru_cache(maxsize=size)(key_alphabet)
+        else:
+            self.string = format_key
+            self.alphabet = key_alphabet
+
+
+KEY_CACHE = KeyCache()
+
+
 class Key:
 
+    __slots__ = ('number', 'prefix', 'hit', 'fmtr')
+
     def __init__(self, number: int, prefix: str, fmtr: str, hit: bool = False):
         self.number = number
         self.prefix = prefix
@@ -80,13 +128,11 @@ class Key:
 
     @property
     def string(self) -> str:
-        if self.fmtr == 'hash':
-            return hash_fmtr(self.number, self.prefix)
-        if self.fmtr == 'hex':
-            return hex_fmtr(self.number, self.prefix)
-        if self.fmtr == 'no_hash':
-            return str(self.number)
-        return decimal_fmtr(self.number, self.prefix)
+        return KEY_CACHE.string(self.number, self.prefix, self.fmtr)
+
+
+def keys_from_numbers(numbers: np.ndarray, prefix: str, fmtr: str) -> List[Key]:
+    return [Key(number=number, prefix=prefix, fmtr=fmtr) for number in numbers.tolist()]
 
 
 class NewOrderedKey:
@@ -110,6 +156,10 @@ class NewOrderedKey:
     def next(self, curr_items: int) -> Key:
         return Key(number=curr_items, prefix=self.prefix, fmtr=self.fmtr)
 
+    def next_batch(self, n: int, curr_items: int) -> List[Key]:
+        return [Key(number=number, prefix=self.prefix, fmtr=self.fmtr)
+                for number in range(curr_items, curr_items + n)]
+
 
 class KeyForRemoval:
 
@@ -122,6 +172,10 @@ class KeyForRemoval:
     def next(self, curr_deletes: int) -> Key:
         return Key(number=curr_deletes, prefix=self.prefix, fmtr=self.fmtr)
 
+    def next_batch(self, n: int, curr_deletes: int) -> List[Key]:
+        return [Key(number=number, prefix=self.prefix, fmtr=self.fmtr)
+                for number in range(curr_deletes, curr_deletes + n)]
+
 
 class UniformKey:
 
@@ -149,6 +203,10 @@ class UniformKey:
         number = random.randrange(curr_deletes, curr_items)
         return Key(number=number, prefix=self.prefix, fmtr=self.fmtr)
 
+    def next_batch(self, n: int, curr_items: int, curr_deletes: int, *args) -> List[Key]:
+        numbers = np.random.randint(curr_deletes, curr_items, size=n)
+        return keys_from_numbers(numbers, self.prefix, self.fmtr)
+
 
 class WorkingSetKey:
 
@@ -196,37 +254,61 @@ class WorkingSetKey:
         number = random.randrange(left_boundary, right_boundary)
         return Key(number=number, prefix=self.prefix, fmtr=self.fmtr, hit=hit)
 
+    def next_batch(self, n: int, curr_items: int, curr_deletes: int, *args) -> List[Key]:
+        num_cold_items = curr_items - self.num_hot_items
+
+        hits = np.random.randint(0, 101, size=n) <= self.working_set_access
+        numbers = np.empty(n, dtype=np.int64)
+        num_hits = np.count_nonzero(hits)
+        if num_hits:
+            numbers[hits] = np.random.randint(num_cold_items, curr_items, size=num_hits)
+        if num_hits < n:
+            numbers[~hits] = np.random.randint(curr_deletes, num_cold_items, size=n - num_hits)
+
+        return [Key(number=number, prefix=self.prefix, fmtr=self.fmtr, hit=hit)
+                for number, hit in zip(numbers.tolist(), hits.tolist())]
+
 
 class MovingWorkingSetKey:
 
+    """Sample keys from a working set that moves through the key space.
+
+    The position of the working set comes from the shared HotWindow. Workers
+    call move() once per batch, so all keys of a batch come from the same
+    window and the shared state is not touched on every operation.
+    """
+
     def __init__(self, ws: WorkloadSettings, prefix: str):
         self.working_set = ws.working_set
         self.working_set_access = ws.working_set_access
         self.working_set_moving_docs = ws.working_set_moving_docs
+        self.initial_offset = int(ws.items * ws.working_set / 100)
         self.prefix = prefix
         self.fmtr = ws.key_fmtr
+        self.position = 0
 
-    def next(self, curr_items: int, curr_deletes: int,
-             current_hot_load_start: int, timer_elapse: int) -> Key:
+    def move(self, position: float):
+        self.position = position
+
+    def hot_range(self, curr_items: int, curr_deletes: int) -> Tuple[int, int]:
         num_existing_items = curr_items - curr_deletes
         num_hot_items = int(num_existing_items * self.working_set / 100)
+        # Wrap around to prevent going beyond the existing documents
+        num_items = max(num_existing_items - num_hot_items, 1)
+        offset = self.initial_offset + int(self.position * self.working_set_moving_docs)
+        left_boundary = curr_deletes + offset % num_items
+        return left_boundary, left_boundary + num_hot_items
 
-        if timer_elapse.value:
-            from logger import logger
-            timer_elapse.value = 0
-            # Create next hot_load_start, add working_set_move_docs and then
-            # modulus to prevent going beyond num_docs
-            num_items = num_existing_items - num_hot_items
-            offset = current_hot_load_start.value + self.working_set_moving_docs
-            current_hot_load_start.value = int(offset % num_items)
-            logger.info("New hotload start {} end {}".format(current_hot_load_start.value,
-                        current_hot_load_start.value + num_hot_items))
-
-        left_boundary = curr_deletes + current_hot_load_start.value
-        right_boundary = left_boundary + num_hot_items
+    def next(self, curr_items: int, curr_deletes: int, *args) -> Key:
+        left_boundary, right_boundary = self.hot_range(curr_items, curr_deletes)
         number = random.randrange(left_boundary, right_boundary)
         return Key(number=number, prefix=self.prefix, fmtr=self.fmtr)
 
+    def next_batch(self, n: int, curr_items: int, curr_deletes: int, *args) -> List[Key]:
+        left_boundary, right_boundary = self.hot_range(curr_items, curr_deletes)
+        numbers = np.random.randint(left_boundary, right_boundary, size=n)
+        return keys_from_numbers(numbers, self.prefix, self.fmtr)
+
 
 class ContinuousKey:
 
@@ -244,6 +326,11 @@ class ZipfKey(ContinuousKey):
             number = curr_items - 1
         return Key(number=number, prefix=self.prefix, fmtr=self.fmtr)
 
+    def next_batch(self, n: int, curr_items: int, curr_deletes: int, *args) -> List[Key]:
+        numbers = curr_items - np.random.zipf(a=self.alpha, size=n)
+        numbers[numbers <= curr_deletes] = curr_items - 1
+        return keys_from_numbers(numbers, self.prefix, self.fmtr)
+
 
 class PowerKey(ContinuousKey):
 
@@ -252,6 +339,11 @@ class PowerKey(ContinuousKey):
         number = curr_deletes + int(r * (curr_items - curr_deletes - 1))
         return Key(number=number, prefix=self.prefix, fmtr=self.fmtr)
 
+    def next_batch(self, n: int, curr_items: int, curr_deletes: int, *args) -> List[Key]:
+        r = np.random.power(a=self.alpha, size=n)
+        numbers = curr_deletes + (r * (curr_items - curr_deletes - 1)).astype(np.int64)
+        return keys_from_numbers(numbers, self.prefix, self.fmtr)
+
 
 class SequentialKey:
 
@@ -324,7 +416,7 @@ class String:
 
     @staticmethod
     def build_alphabet(key: str) -> str:
-        return hex_digest(key) + hex_digest(key[::-1])
+        return KEY_CACHE.alphabet(key)
 
     @staticmethod
     def build_alphabet_md5(key: str) -> str:
@@ -332,6 +424,8 @@ class String:
 
     @staticmethod
     def build_string(alphabet: str, length: float) -> str:
+        if native_build_string is not None and alphabet.isascii():
+            return native_build_string(alphabet, length)
         length_int = int(length)
         num_slices = int(math.ceil(length / 64))  # 64 == len(alphabet)
         body = num_slices * alphabet
@@ -436,9 +530,11 @@ class Document(String):
             return 0
         return self._get_variation_coeff() * (self.avg_size - self.OVERHEAD)
 
-    def next(self, key: Key) -> dict:
-        alphabet = self.build_alphabet(key.string)
-        size = self._size()
+    def build_document(self, alphabet: str, size: float) -> dict:
+        if native_build_document is not None:
+            # Same fields as below, random offsets are drawn in the same order
+            name, domain = random.randint(1, 9), random.randint(12, 18)
+            return native_build_document(alphabet, size, name, domain)
 
         return {
             'name': self.build_name(alphabet),
@@ -452,6 +548,12 @@ class Document(String):
             'body': self.build_string(alphabet, size),
         }
 
+    def next(self, key: Key) -> dict:
+        alphabet = self.build_alphabet(key.string)
+        size = self._size()
+
+        return self.build_document(alphabet, size)
+
 
 class SGImportLatencyDocument(Document):
 
@@ -459,17 +561,7 @@ class SGImportLatencyDocument(Document):
         alphabet = self.build_alphabet(key)
         size = self._size()
 
-        return {
-            'name': self.build_name(alphabet),
-            'email': self.build_email(alphabet),
-            'alt_email': self.build_alt_email(alphabet),
-            'city': self.build_city(alphabet),
-            'realm': self.build_realm(alphabet),
-            'coins': self.build_coins(alphabet),
-            'category': self.build_category(alphabet),
-            'achievements': self.build_achievements(alphabet),
-            'body': self.build_string(alphabet, size),
-        }
+        return self.build_document(alphabet, size)
 
 
 class GroupedDocument(Document):
@@ -1,4 +1,6 @@
+#define PY_SSIZE_T_CLEAN
 #include <Python.h>
+#include <math.h>
 
 struct module_state {
     PyObject *error;
@@ -7,12 +9,8 @@ struct module_state {
 #define GETSTATE(m) ((struct module_state*)PyModule_GetState(m))
 
 static PyObject *
-build_achievements(PyObject *self, PyObject *args)
+_build_achievements(const char *alphabet)
 {
-    char *alphabet;
-    if (!PyArg_ParseTuple(args, "s", &alphabet))
-        return NULL;
-
     const int offset = 42;
     const int max_len = 16;
 
@@ -44,10 +42,137 @@ build_achievements(PyObject *self, PyObject *args)
     return py_array;
 }
 
+static PyObject *
+build_achievements(PyObject *self, PyObject *args)
+{
+    char *alphabet;
+    if (!PyArg_ParseTuple(args, "s", &alphabet))
+        return NULL;
+
+    return _build_achievements(alphabet);
+}
+
+
+static PyObject *
+_build_string(const char *alphabet, Py_ssize_t alphabet_len, double length)
+{
+    /* Same as String.build_string: repeat the alphabet and truncate it */
+    Py_ssize_t length_int = (Py_ssize_t)length;
+    Py_ssize_t num_slices = (Py_ssize_t)ceil(length / 64);  /* 64 == len(alphabet) */
+    Py_ssize_t body_len = num_slices * alphabet_len;
+    if (length_int < body_len)
+        body_len = length_int;
+    if (body_len <= 0 || alphabet_len == 0)
+        return PyUnicode_FromStringAndSize(NULL, 0);
+
+    PyObject *body = PyUnicode_New(body_len, 127);
+    if (body == NULL)
+        return NULL;
+
+    char *data = (char *)PyUnicode_1BYTE_DATA(body);
+    Py_ssize_t filled = alphabet_len < body_len ? alphabet_len : body_len;
+    memcpy(data, alphabet, filled);
+    while (filled < body_len) {
+        /* Double the copied block on every iteration */
+        Py_ssize_t chunk = filled < body_len - filled ? filled : body_len - filled;
+        memcpy(data + filled, data, chunk);
+        filled += chunk;
+    }
+    return body;
+}
+
+static PyObject *
+build_string(PyObject *self, PyObject *args)
+{
+    const char *alphabet;
+    Py_ssize_t alphabet_len;
+    double length;
+    if (!PyArg_ParseTuple(args, "s#d", &alphabet, &alphabet_len, &length))
+        return NULL;
+
+    return _build_string(alphabet, alphabet_len, length);
+}
+
+static int
+set_item(PyObject *doc, const char *field, PyObject *value)
+{
+    if (value == NULL)
+        return -1;
+    int ret = PyDict_SetItemString(doc, field, value);
+    Py_DECREF(value);
+    return ret;
+}
+
+static PyObject *
+join_fields(const char *first, const char *second, const char *separator)
+{
+    /* "%s %s" for names and "%s@%s.com" for emails, both parts are 6 characters long */
+    char buf[17];
+    int email = separator[0] == '@';
+    memcpy(buf, first, 6);
+    buf[6] = separator[0];
+    memcpy(buf + 7, second, 6);
+    if (email)
+        memcpy(buf + 13, ".com", 4);
+    return PyUnicode_FromStringAndSize(buf, email ? 17 : 13);
+}
+
+static PyObject *
+build_achievements_or_zero(const char *alphabet)
+{
+    /* Same as Document.build_achievements */
+    PyObject *achievements = _build_achievements(alphabet);
+    if (achievements != NULL && PyList_GET_SIZE(achievements) == 0) {
+        Py_DECREF(achievements);
+        return Py_BuildValue("[i]", 0);
+    }
+    return achievements;
+}
+
+static PyObject *
+build_document(PyObject *self, PyObject *args)
+{
+    const char *alphabet;
+    Py_ssize_t alphabet_len;
+    double size;
+    int name, domain;
+    if (!PyArg_ParseTuple(args, "s#dii", &alphabet, &alphabet_len, &size, &name, &domain))
+        return NULL;
+
+    if (alphabet_len < 64) {
+        PyErr_SetString(PyExc_ValueError, "alphabet must be at least 64 characters long");
+        return NULL;
+    }
+
+    PyObject *doc = PyDict_New();
+    if (doc == NULL)
+        return NULL;
+
+    char coins[5] = {alphabet[36], alphabet[37], alphabet[38], alphabet[39], 0};
+    double coins_value = strtol(coins, NULL, 16) / 100.0;
+    int category = strtol((char[]){alphabet[41], 0}, NULL, 16) % 3;
+
+    if (set_item(doc, "name", join_fields(alphabet, alphabet + 6, " ")) ||
+        set_item(doc, "email", join_fields(alphabet + 12, alphabet + 18, "@")) ||
+        set_item(doc, "alt_email", join_fields(alphabet + name, alphabet + domain, "@")) ||
+        set_item(doc, "city", PyUnicode_FromStringAndSize(alphabet + 24, 6)) ||
+        set_item(doc, "realm", PyUnicode_FromStringAndSize(alphabet + 30, 6)) ||
+        set_item(doc, "coins", PyFloat_FromDouble(coins_value > 0.1 ? coins_value : 0.1)) ||
+        set_item(doc, "category", PyLong_FromLong(category)) ||
+        set_item(doc, "achievements", build_achievements_or_zero(alphabet)) ||
+        set_item(doc, "body", _build_string(alphabet, alphabet_len, size))) {
+        Py_DECREF(doc);
+        return NULL;
+    }
+    return doc;
+}
+
 
 static PyMethodDef
 fastdocgen_methods[] = {
     {"build_achievements",  build_achievements, METH_VARARGS, NULL},
+    {"build_string",  build_string, METH_VARARGS, NULL},
+    {"build_document",  build_document, METH_VARARGS, NULL},
     {NULL, NULL, 0, NULL}
 };
 
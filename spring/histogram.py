@@ -0,0 +1,219 @@
+import json
+from array import array
+from ctypes import c_uint64
+from multiprocessing import Array
+from typing import Iterable, Optional, Union
+
+import numpy as np
+
+from logger import logger
+
+HistogramKey = tuple[str, Optional[str]]
+
+MERGED_HISTOGRAMS = 'kv-histograms.json'  # Per-phase result of KVLatency.reconstruct()
+
+
+class LatencyHistogram:
+
+    """Fixed-size log-linear latency histogram (HDR-style).
+
+    Values are recorded in microseconds. Every power-of-two range is split into
+    SUB_BUCKETS // 2 linear sub-buckets, which bounds the relative error of any
+    reported value by 1 / (SUB_BUCKETS // 2).
+    """
+
+    SUB_BUCKET_BITS = 8
+    SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+    HALF_SUB_BUCKETS = SUB_BUCKETS // 2
+
+    MAX_VALUE_BITS = 32  # ~71 minutes in microseconds
+    MAX_VALUE = (1 << MAX_VALUE_BITS) - 1
+
+    LENGTH = (MAX_VALUE_BITS - SUB_BUCKET_BITS + 1) * HALF_SUB_BUCKETS + HALF_SUB_BUCKETS
+
+    UNIT = 10 ** 6  # Seconds to microseconds
+
+    def __init__(self, counts: Optional[Iterable[int]] = None):
+        if counts is None:
+            self.counts = array('Q', bytes(8 * self.LENGTH))
+        else:
+            self.counts = array('Q', counts)
+
+    @classmethod
+    def index(cls, value: int) -> int:
+        if value < cls.SUB_BUCKETS:
+            return value
+        if value > cls.MAX_VALUE:
+            value = cls.MAX_VALUE
+        magnitude = value.bit_length() - cls.SUB_BUCKET_BITS
+        return magnitude * cls.HALF_SUB_BUCKETS + (value >> magnitude)
+
+    @classmethod
+    def lowest_value(cls, index: int) -> int:
+        if index < cls.SUB_BUCKETS:
+            return index
+        magnitude = index // cls.HALF_SUB_BUCKETS - 1
+        sub_bucket = index - magnitude * cls.HALF_SUB_BUCKETS
+        return sub_bucket << magnitude
+
+    @classmethod
+    def bucket_values(cls) -> np.ndarray:
+        """Return the midpoint of every bucket in microseconds."""
+        indexes = np.arange(cls.LENGTH, dtype=np.int64)
+        magnitudes = np.where(indexes < cls.SUB_BUCKETS, 0,
+                              indexes // cls.HALF_SUB_BUCKETS - 1)
+        sub_buckets = indexes - magnitudes * cls.HALF_SUB_BUCKETS
+        lowest = np.left_shift(sub_buckets, magnitudes)
+        width = np.left_shift(1, magnitudes)
+        return lowest + (width - 1) / 2
+
+    def record(self, value: float):
+        """Record a latency value given in seconds."""
+        self.counts[self.index(int(value * self.UNIT))] += 1
+
+    def merge(self, other: 'LatencyHistogram'):
+        merged = self.as_array() + other.as_array()
+        self.counts = array('Q', merged.tobytes())
+
+    def as_array(self) -> np.ndarray:
+        return np.frombuffer(self.counts, dtype=np.uint64)
+
+    @property
+    def total_count(self) -> int:
+        return int(self.as_array().sum())
+
+    def percentiles(self, percentiles: Iterable[float]) -> dict[float, float]:
+        """Return the requested percentiles in milliseconds."""
+        counts = self.as_array()
+        cumulative = np.cumsum(counts)
+        total = cumulative[-1] if len(cumulative) else 0
+        if not total:
+            return {p: 0.0 for p in percentiles}
+
+        percentiles = list(percentiles)
+        ranks = np.ceil(np.array(percentiles) / 100 * total).clip(min=1)
+        indexes = np.searchsorted(cumulative, ranks)
+        values = self.bucket_values()[indexes] * 1000 / self.UNIT
+        return dict(zip(percentiles, values.tolist()))
+
+    def summary(self, percentiles: Iterable[float]) -> dict:
+        counts = self.as_array()
+        nonzero = np.flatnonzero(counts)
+        if not len(nonzero):
+            return {'count': 0}
+
+        values = self.bucket_values()
+        scale = 1000 / self.UNIT  # Microseconds to milliseconds
+        return {
+            'count': int(counts.sum()),
+            'min': float(self.lowest_value(int(nonzero[0])) * scale),
+            'max': float(values[nonzero[-1]] * scale),
+            'mean': float((values * counts).sum() / counts.sum() * scale),
+            'percentiles': self.percentiles(percentiles),
+        }
+
+    def to_sparse(self) -> list[list[int]]:
+        counts = self.as_array()
+        return [[int(i), int(counts[i])] for i in np.flatnonzero(counts)]
+
+    @classmethod
+    def from_sparse(cls, sparse: list[list[int]]) -> 'LatencyHistogram':
+        histogram = cls()
+        for index, count in sparse:
+            histogram.counts[index] += count
+        return histogram
+
+
+class SharedHistograms:
+
+    """A block of latency histograms in shared memory.
+
+    Every (operation, target) pair gets a fixed slot so that worker processes
+    can merge their local histograms into one exact result.
+    """
+
+    def __init__(self, keys: Iterable[HistogramKey]):
+        self.slots = {key: slot for slot, key in enumerate(keys)}
+        self.shared = Array(c_uint64, len(self.slots) * LatencyHistogram.LENGTH)
+
+    def _view(self) -> np.ndarray:
+        return np.frombuffer(self.shared.get_obj(), dtype=np.uint64)\
+            .reshape(len(self.slots), LatencyHistogram.LENGTH)
+
+    def merge(self, histograms: dict[HistogramKey, LatencyHistogram]):
+        with self.shared.get_lock():
+            view = self._view()
+            for key, histogram in histograms.items():
+                slot = self.slots.get(key)
+                if slot is None:
+                    logger.warn('No shared histogram for {}'.format(key))
+                    continue
+                view[slot] += histogram.as_array()
+
+    def histograms(self) -> dict[HistogramKey, LatencyHistogram]:
+        with self.shared.get_lock():
+            view = self._view()
+            return {
+                key: LatencyHistogram(view[slot].tobytes())
+                for key, slot in self.slots.items()
+                if view[slot].any()
+            }
+
+    def dump(self, filename: str, percentiles: Iterable[float], bucket: Optional[str] = None):
+        """Write the merged histograms to a local JSON file."""
+        logger.info('Writing latency histograms to {}'.format(filename))
+        percentiles = list(percentiles)
+        results = []
+        for (operation, target), histogram in self.histograms().items():
+            summary = histogram.summary(percentiles)
+            logger.info('Latency {} {}: {}'.format(operation, target or '', summary))
+            results.append({
+                'bucket': bucket,
+                'operation': operation,
+                'target': target,
+                'summary': summary,
+                'counts': histogram.to_sparse(),
+            })
+        with open(filename, 'w') as fh:
+            json.dump(results, fh)
+
+
+class HistogramReservoir:
+
+    """Record every measurement into per-(operation, target) histograms.
+
+    This is a drop-in replacement for Reservoir that keeps exact percentiles
+    for all operations instead of a bounded sample.
+    """
+
+    def __init__(self, shared: SharedHistograms):
+        self.shared = shared
+        self.histograms = {}
+
+    def _histogram(self, key: HistogramKey) -> LatencyHistogram:
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = LatencyHistogram()
+        return histogram
+
+    def update(self, operation: str, value: Union[float, tuple[float, float]],
+               target: Optional[str] = None):
+        if not value:  # Ignore bad results
+            return
+
+        if isinstance(value, float):
+            latency_single, latency_total = value, None
+        else:
+            latency_single, latency_total = value
+
+        self._histogram((operation, target)).record(latency_single)
+        if latency_total:
+            self._histogram(('total_' + operation, target)).record(latency_total)
+
+    def dump(self, filename: str, binary: bool = False):
+        """Merge local histograms into shared memory.
+
+        The merged result is written once per workload by WorkloadGen.
+        """
+        self.shared.merge(self.histograms)
+        self.histograms = {}
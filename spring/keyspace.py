@@ -0,0 +1,66 @@
+from ctypes import c_int64
+from multiprocessing import Array
+from typing import Dict, Iterable, List, Tuple
+
+
+class KeySpace:
+
+    """Per-target [curr_items, deleted_items] counters in shared memory.
+
+    This replaces a Manager().dict(): all counters live in one shared array,
+    so a reservation is a short critical section in the calling process
+    instead of a round-trip to the manager process.
+    """
+
+    def __init__(self, targets: Dict[str, Tuple[int, int]]):
+        self.slots = {target: slot for slot, target in enumerate(targets)}
+        self.counters = Array(c_int64, 2 * len(self.slots))
+        for target, (curr_items, deleted_items) in targets.items():
+            self[target] = [curr_items, deleted_items]
+
+    def __contains__(self, target: str) -> bool:
+        return target in self.slots
+
+    def __getitem__(self, target: str) -> List[int]:
+        slot = 2 * self.slots[target]
+        with self.counters.get_lock():
+            return self.counters.get_obj()[slot:slot + 2]
+
+    def __setitem__(self, target: str, value: Iterable[int]):
+        slot = 2 * self.slots[target]
+        with self.counters.get_lock():
+            self.counters.get_obj()[slot:slot + 2] = list(value)
+
+    def keys(self) -> Iterable[str]:
+        return self.slots.keys()
+
+    def reserve(self, target: str, creates: int, deletes: int) -> Tuple[int, int]:
+        """Atomically claim ranges of new keys and keys for removal.
+
+        Return the counters before the reservation, the caller owns the next
+        `creates` and `deletes` key IDs from these positions.
+        """
+        slot = 2 * self.slots[target]
+        with self.counters.get_lock():
+            counters = self.counters.get_obj()
+            curr_items, deleted_items = counters[slot], counters[slot + 1]
+            counters[slot] = curr_items + creates
+            counters[slot + 1] = deleted_items + deletes
+        return curr_items, deleted_items
+
+
+class KeyRange:
+
+    """Key IDs claimed from a KeySpace in bulk and handed out batch by batch."""
+
+    def __init__(self, curr_items: int, deleted_items: int, batches: int):
+        self.curr_items = curr_items
+        self.deleted_items = deleted_items
+        self.batches = batches
+
+    def next(self, creates: int, deletes: int) -> Tuple[int, int]:
+        curr_items, deleted_items = self.curr_items, self.deleted_items
+        self.curr_items += creates
+        self.deleted_items += deletes
+        self.batches -= 1
+        return curr_items, deleted_items
@@ -0,0 +1,160 @@
+import glob
+import os
+import re
+from typing import Dict, List, Optional, Set
+
+import psutil
+
+from logger import logger
+
+NODE_PATH = '/sys/devices/system/node'
+
+
+def parse_cpulist(cpulist: str) -> List[int]:
+    """Parse a kernel CPU list such as "0-3,8,10-11"."""
+    cpus = []
+    for chunk in cpulist.strip().split(','):
+        if not chunk:
+            continue
+        first, _, last = chunk.partition('-')
+        cpus += range(int(first), int(last or first) + 1)
+    return cpus
+
+
+def numa_nodes() -> Dict[int, List[int]]:
+    """Return the CPUs of every NUMA node that this process may run on.
+
+    Machines without NUMA information are reported as a single node.
+    """
+    allowed = os.sched_getaffinity(0)
+    nodes = {}
+    for path in glob.glob('{}/node[0-9]*/cpulist'.format(NODE_PATH)):
+        node = int(re.search(r'node(\d+)', path).group(1))
+        with open(path) as fh:
+            cpus = [cpu for cpu in parse_cpulist(fh.read()) if cpu in allowed]
+        if cpus:
+            nodes[node] = cpus
+    return nodes or {0: sorted(allowed)}
+
+
+def take_cores(free: Dict[int, List[int]], cores: int) -> Optional[List[int]]:
+    """Take a core budget from the free cores of every NUMA node.
+
+    A budget that fits into one node comes from the first node with enough
+    free cores and is never split across nodes. Larger budgets span
+    neighbouring nodes. Return None if the free cores are not enough.
+    """
+    for node, cpus in free.items():
+        if len(cpus) >= cores:
+            free[node] = cpus[cores:]
+            return cpus[:cores]
+
+    if cores <= max(len(cpus) for cpus in free.values()) or \
+            cores > sum(len(cpus) for cpus in free.values()):
+        return None
+    budget = []
+    for node, cpus in free.items():
+        taken = cpus[:cores - len(budget)]
+        free[node] = cpus[len(taken):]
+        budget += taken
+    return budget
+
+
+class CPUPlacement:
+
+    """Pin spring processes to a per-instance core budget.
+
+    Cores are taken NUMA node by node, so an instance whose budget fits into
+    one socket never spans two sockets. The instances of a multi-instance
+    workload get non-overlapping budgets. If the machine runs out of cores,
+    the budgets of later instances overlap with earlier ones and a warning is
+    logged.
+
+    The first core of the budget is reserved for the control processes (the
+    workload generator itself, timers, histogram dumps and auxiliary workers).
+    Workers are spread over the remaining cores: every worker gets a dedicated
+    core if there are enough of them, otherwise workers share the budgeted
+    cores of their NUMA node. Memory allocations follow the CPU placement
+    thanks to the kernel's first-touch policy.
+    """
+
+    def __init__(self, cores: int, workers: int, instance: int = 0,
+                 nodes: Optional[Dict[int, List[int]]] = None):
+        nodes = nodes or numa_nodes()
+        self.node_of = {cpu: node for node, cpus in nodes.items() for cpu in cpus}
+        available = [cpu for node in sorted(nodes) for cpu in nodes[node]]
+
+        if cores > len(available):
+            logger.warn('Core budget {} exceeds {} available cores'.format(
+                cores, len(available)))
+            cores = len(available)
+
+        # Every instance replays the allocation of the earlier ones, no coordination is needed
+        free = {node: nodes[node] for node in sorted(nodes)}
+        for i in range(instance + 1):
+            self.cpus = take_cores(free, cores)
+            if self.cpus is None:
+                logger.warn('Not enough free cores for instance {}, its core budget overlaps '
+                            'with earlier instances'.format(i))
+                free = {node: nodes[node] for node in sorted(nodes)}
+                self.cpus = take_cores(free, cores)
+
+        self.control_cpus = set(self.cpus[:1])
+        self.worker_cores = self.cpus[1:] or self.cpus
+        self.workers = workers
+        self.affinity = None
+        self.cpu_times = None
+
+        logger.info('CPU placement of instance {}: control {}, workers {}'.format(
+            instance, sorted(self.control_cpus), self.worker_cores))
+
+    def worker_cpus(self, index: int) -> Set[int]:
+        cpu = self.worker_cores[index % len(self.worker_cores)]
+        if self.workers <= len(self.worker_cores):
+            return {cpu}
+        node = self.node_of[cpu]
+        return {core for core in self.worker_cores if self.node_of[core] == node}
+
+    @staticmethod
+    def pin(cpus: Set[int]):
+        os.sched_setaffinity(0, cpus)
+
+    def start(self):
+        """Move the current process to the control cores and start sampling CPU usage."""
+        self.affinity = os.sched_getaffinity(0)
+        self.pin(self.control_cpus)
+        self.cpu_times = psutil.cpu_times(percpu=True)
+
+    def stop(self):
+        """Report the utilization and restore the original affinity."""
+        self.report()
+        self.pin(self.affinity)
+
+    def utilization(self) -> Dict[int, float]:
+        """Return the utilization of every budgeted core since start()."""
+        utilization = {}
+        for cpu, (before, after) in enumerate(zip(self.cpu_times,
+                                                  psutil.cpu_times(percpu=True))):
+            if cpu not in self.cpus:
+                continue
+            total = sum(after) - sum(before)
+            idle = after.idle - before.idle + \
+                getattr(after, 'iowait', 0) - getattr(before, 'iowait', 0)
+            utilization[cpu] = total and round(100 * (1 - idle / total), 1)
+        return utilization
+
+    def report(self):
+        utilization = self.utilization()
+        for cpu, value in utilization.items():
+            role = 'control' if cpu in self.control_cpus else 'worker'
+            logger.info('CPU {} (node {}, {}): {}% busy'.format(
+                cpu, self.node_of[cpu], role, value))
+        if utilization:
+            logger.info('Average utilization of {} budgeted cores: {:.1f}%'.format(
+                len(utilization), sum(utilization.values()) / len(utilization)))
+
+
+def set_cpu_afinity(sid: int):
+    """Pin the current process to one of the cores it is allowed to run on."""
+    cpus = sorted(os.sched_getaffinity(0))
+    os.sched_setaffinity(0, {cpus[sid % len(cpus)]})
@@ -1,10 +1,29 @@
 import csv
+import json
+import math
 import random
+import struct
 import time
-from typing import Optional, Union
+from typing import Iterable, Iterator, Optional, Union
+
+import numpy as np
 
 from logger import logger
 
+MAGIC = b'SPRLAT02'
+
+HEADER_SIZE = struct.Struct('<I')
+
+COLUMNS = (
+    ('operation', np.dtype('<u1')),
+    ('timestamp', np.dtype('<i8')),
+    ('latency', np.dtype('<f8')),
+    ('latency_total', np.dtype('<f8')),
+    ('target', np.dtype('<u2')),
+)
+
+Measurement = tuple[str, int, float, Optional[float], Optional[str]]
+
 
 class Reservoir:
 
@@ -43,10 +62,106 @@ class Reservoir:
             if r < self.capacity:
                 self.values[r] = measurement
 
-    def dump(self, filename: str):
-        """Write all measurements to a local CSV file."""
+    def dump(self, filename: str, binary: bool = False):
+        """Write all measurements to a local CSV or binary file."""
         logger.info('Writing measurements to {}'.format(filename))
+        if binary:
+            write_binary(filename, self.values)
+            return
+
         with open(filename, 'w') as fh:
             writer = csv.writer(fh)
             for measurement in self.values:
                 writer.writerow(measurement)
+
+
+def encode(values: tuple, dtype: np.dtype) -> tuple[list, np.ndarray]:
+    """Replace values with their index in the returned list of distinct values."""
+    names = list(dict.fromkeys(values))
+    codes = {name: code for code, name in enumerate(names)}
+    return names, np.fromiter(map(codes.__getitem__, values), dtype=dtype, count=len(values))
+
+
+def write_binary(filename: str, measurements: list[Measurement]):
+    """Write measurements column by column.
+
+    The file starts with a magic string and a JSON header that maps operation
+    and target codes back to their names, followed by one contiguous array per
+    field of COLUMNS, so that readers can map a single column.
+    """
+    dtypes = dict(COLUMNS)
+    operations, timestamps, latencies, latencies_total, targets = \
+        zip(*measurements) if measurements else ((), (), (), (), ())
+
+    operations, operation_codes = encode(operations, dtypes['operation'])
+    targets, target_codes = encode(targets, dtypes['target'])
+    columns = (
+        operation_codes,
+        np.array(timestamps, dtype=dtypes['timestamp']),
+        np.array(latencies, dtype=dtypes['latency']),
+        np.array(latencies_total, dtype=dtypes['latency_total']),  # None -> NaN
+        target_codes,
+    )
+
+    header = json.dumps({
+        'operations': operations,
+        'targets': targets,
+        'count': len(measurements),
+    }).encode()
+    with open(filename, 'wb') as fh:
+        fh.write(MAGIC)
+        fh.write(HEADER_SIZE.pack(len(header)))
+        fh.write(header)
+        for column in columns:
+            fh.write(column.tobytes())
+
+
+def is_binary(filename: str) -> bool:
+    with open(filename, 'rb') as fh:
+        return fh.read(len(MAGIC)) == MAGIC
+
+
+def read_header(filename: str) -> tuple[dict, int]:
+    """Return the header and the offset of the first column."""
+    with open(filename, 'rb') as fh:
+        if fh.read(len(MAGIC)) != MAGIC:
+            raise ValueError('Not a binary latency file: {}'.format(filename))
+        header_size, = HEADER_SIZE.unpack(fh.read(HEADER_SIZE.size))
+        header = json.loads(fh.read(header_size))
+    return header, len(MAGIC) + HEADER_SIZE.size + header_size
+
+
+def read_binary(filename: str, fields: Optional[Iterable[str]] = None) \
+        -> tuple[dict, dict[str, np.ndarray]]:
+    """Return the header and read-only memory maps of the requested columns."""
+    header, offset = read_header(filename)
+    count = header['count']
+    fields = set(fields or dict(COLUMNS))
+
+    columns = {}
+    for name, dtype in COLUMNS:
+        if name in fields:
+            if count:
+                columns[name] = np.memmap(filename, dtype=dtype, mode='r', offset=offset,
+                                          shape=(count,))
+            else:
+                columns[name] = np.empty(0, dtype=dtype)
+        offset += count * dtype.itemsize
+    return header, columns
+
+
+def iter_binary(filename: str, chunk_size: int = 10 ** 5) -> Iterator[Measurement]:
+    """Yield measurements in the same shape as Reservoir.values."""
+    header, columns = read_binary(filename)
+    operations, targets = header['operations'], header['targets']
+    for start in range(0, header['count'], chunk_size):
+        for operation, timestamp, latency, latency_total, target in zip(*(
+            columns[name][start:start + chunk_size].tolist() for name, _ in COLUMNS
+        )):
+            yield (
+                operations[operation],
+                timestamp,
+                latency,
+                None if math.isnan(latency_total) else latency_total,
+                targets[target],
+            )
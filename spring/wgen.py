@@ -13,7 +13,7 @@ from psutil import cpu_count
 from twisted.internet import reactor
 
 from logger import logger
-from perfrunner.helpers.sync import SyncHotWorkload
+from perfrunner.helpers.sync import HotWindow, WorkingSetCoordinator
 from spring.cbgen import CBAsyncGen, CBGen, SubDocGen
 from spring.docgen import (
     AdvFilterDocument,
@@ -124,6 +124,7 @@ class Worker:
         self.ts = target_settings
         self.shutdown_event = shutdown_event
         self.sid = 0
+        self.hot_window = None
         self.workload_id = workload_id
 
         self.next_report = 0.05  # report after every 5% of completion
@@ -416,10 +417,7 @@ class KVWorker(Worker):
 
     def update_args(self, cb: Client,
                     curr_items: int, deleted_items: int) -> Sequence:
-        key = self.existing_keys.next(curr_items,
-                                      deleted_items,
-                                      self.current_hot_load_start,
-                                      self.timer_elapse)
+        key = self.existing_keys.next(curr_items, deleted_items)
         doc = self.docs.next(key)
         if self.ws.durability:
             args = key.string, doc, self.ws.durability, self.ws.ttl
@@ -457,6 +455,8 @@ class KVWorker(Worker):
                 deleted_items = \
                     self.deleted_items.value + self.ws.deletes * self.ws.workers
                 self.deleted_items.value += self.ws.deletes
+        if self.hot_window is not None:  # The working set only moves between batches
+            self.existing_keys.move(self.hot_window.position())
 
         cmds = []
         for op in self.random_ops:
@@ -510,7 +510,7 @@ class KVWorker(Worker):
         return curr_ops.value < self.ws.ops and not self.time_to_stop()
 
     def run(self, sid, locks, curr_ops, curr_items, deleted_items,
-            current_hot_load_start=None, timer_elapse=None):
+            hot_window=None):
         if self.ws.throughput < float('inf'):
             self.target_time = float(self.ws.spring_batch_size) * self.ws.workers / \
                 self.ws.throughput
@@ -522,8 +522,7 @@ class KVWorker(Worker):
         self.batch_lock = locks[1]
         self.curr_items = curr_items
         self.deleted_items = deleted_items
-        self.current_hot_load_start = current_hot_load_start
-        self.timer_elapse = timer_elapse
+        self.hot_window = hot_window
         self.seed()
 
         try:
@@ -563,10 +562,7 @@ class SubDocWorker(KVWorker):
 
     def update_args(self, cb: Client,
                     curr_items: int, deleted_items: int) -> Sequence:
-        key = self.existing_keys.next(curr_items,
-                                      deleted_items,
-                                      self.current_hot_load_start,
-                                      self.timer_elapse)
+        key = self.existing_keys.next(curr_items, deleted_items)
         doc = self.docs.next(key)
         update_args = key.string, self.ws.subdoc_field, doc
 
@@ -585,10 +581,7 @@ class XATTRWorker(SubDocWorker):
 
     def update_args(self, cb: Client,
                     curr_items: int, deleted_items: int) -> Sequence:
-        key = self.existing_keys.next(curr_items,
-                                      deleted_items,
-                                      self.current_hot_load_start,
-                                      self.timer_elapse)
+        key = self.existing_keys.next(curr_items, deleted_items)
         doc = self.docs.next(key)
         update_args = key.string, self.ws.xattr_field, doc
 
@@ -657,7 +650,7 @@ class AsyncKVWorker(KVWorker):
         d.addErrback(self.error, cb, i)
 
     def run(self, sid, locks, curr_ops, curr_items, deleted_items,
-            current_hot_load_start=None, timer_elapse=None):
+            hot_window=None):
         set_cpu_afinity(sid)
 
         if self.ws.throughput < float('inf'):
@@ -673,8 +666,7 @@ class AsyncKVWorker(KVWorker):
         self.curr_items = curr_items
         self.deleted_items = deleted_items
         self.curr_ops = curr_ops
-        self.current_hot_load_start = current_hot_load_start
-        self.timer_elapse = timer_elapse
+        self.hot_window = hot_window
 
         self.seed()
 
@@ -930,8 +922,7 @@ class WorkloadGen:
                       worker_factory,
                       curr_items=None,
                       deleted_items=None,
-                      current_hot_load_start=None,
-                      timer_elapse=None):
+                      hot_window=None):
         curr_ops = Value('L', 0)
         batch_lock = Lock()
         gen_lock = Lock()
@@ -941,15 +932,12 @@ class WorkloadGen:
             shutdown_event = Event()
             self.shutdown_events.append(shutdown_event)
             args = (sid, locks, curr_ops, curr_items, deleted_items,
-                    current_hot_load_start, timer_elapse, worker_type,
-                    self.ws, self.ts, shutdown_event)
+                    hot_window, worker_type, self.ws, self.ts, shutdown_event)
 
             def run_worker(sid, locks, curr_ops, curr_items, deleted_items,
-                           current_hot_load_start, timer_elapse, worker_type,
-                           ws, ts, shutdown_event):
+                           hot_window, worker_type, ws, ts, shutdown_event):
                 worker = worker_type(ws, ts, shutdown_event)
-                worker.run(sid, locks, curr_ops, curr_items, deleted_items,
-                           current_hot_load_start, timer_elapse)
+                worker.run(sid, locks, curr_ops, curr_items, deleted_items, hot_window)
 
             worker_process = Process(target=run_worker, args=args)
             worker_process.daemon = True
@@ -983,7 +971,7 @@ class WorkloadGen:
             self.timer.start()
 
         if self.ws.working_set_move_time:
-            self.sync.start_timer(self.ws)
+            self.sync.start_timer()
 
     def stop_timers(self):
         """Cancel all the active timers."""
@@ -1003,18 +991,16 @@ class WorkloadGen:
         logger.info('Starting all workers')
         curr_items = Value('L', self.ws.items)
         deleted_items = Value('L', 0)
-        current_hot_load_start = Value('L', 0)
-        timer_elapse = Value('I', 0)
-
+        hot_window = None
         if self.ws.working_set_move_time:
-            current_hot_load_start.value = int(self.ws.items * self.ws.working_set / 100)
-            self.sync = SyncHotWorkload(current_hot_load_start, timer_elapse)
+            hot_window = HotWindow(self.ws.working_set_move_time,
+                                   smooth=self.ws.working_set_move_mode == 'smooth')
+            self.sync = WorkingSetCoordinator(hot_window)
 
         self.start_workers(WorkerFactory,
                            curr_items,
                            deleted_items,
-                           current_hot_load_start,
-                           timer_elapse)
+                           hot_window)
         self.start_workers(ViewWorkerFactory,
                            curr_items,
                            deleted_items)
@@ -1,25 +1,26 @@
+import asyncio
 import copy
 import os
 import signal
 import time
 from collections import deque
-from multiprocessing import Event, Lock, Manager, Process, Value
+from multiprocessing import Event, Lock, Process, Value
 from pathlib import Path
 from threading import Timer
-from typing import Callable, List, Tuple, Union
+from typing import Callable, List, Optional, Set, Tuple, Union
 
 import pkg_resources
 import twisted
 from decorator import decorator
 from numpy import random
-from psutil import cpu_count
 
 from logger import logger
-from perfrunner.helpers.sync import SyncHotWorkload
+from perfrunner.helpers.sync import HotWindow, WorkingSetCoordinator
 from perfrunner.settings import PhaseSettings as WorkloadSettings
 from perfrunner.settings import TargetSettings
 from spring.dapigen import DAPIGen
 from spring.docgen import (
+    KEY_CACHE,
     AdvFilterDocument,
     AdvFilterXattrBody,
     ArrayIndexingCompositeFieldDocument,
@@ -50,6 +51,7 @@ from spring.docgen import (
     ImportExportDocumentNested,
     IncompressibleString,
     JoinedDocument,
+    Key,
     KeyForCASUpdate,
     KeyForRemoval,
     KeyPlasmaDocument,
@@ -90,6 +92,9 @@ from spring.docgen import (
     YuboDoc,
     ZipfKey,
 )
+from spring.histogram import HistogramReservoir, SharedHistograms
+from spring.keyspace import KeyRange, KeySpace
+from spring.placement import CPUPlacement, set_cpu_afinity
 from spring.querygen3 import N1QLQueryGen3 as N1QLQueryGen
 from spring.querygen3 import ViewQueryGen3 as ViewQueryGen
 from spring.querygen3 import ViewQueryGenByType3 as ViewQueryGenByType
@@ -99,6 +104,7 @@ sdk_major_version = int(pkg_resources.get_distribution("couchbase").version[0])
 if sdk_major_version == 3:
     from twisted.internet import reactor
 
+    from spring.cbgen3 import CBAIOGen3 as CBAIOGen
     from spring.cbgen3 import CBAsyncGen3 as CBAsyncGen
     from spring.cbgen3 import CBGen3 as CBGen
     from spring.cbgen3 import SubDocGen3 as SubDocGen
@@ -107,6 +113,7 @@ elif sdk_major_version == 4:
     import txcouchbase  # noqa: F401
     from twisted.internet import reactor
 
+    from spring.cbgen4 import CBAIOGen4 as CBAIOGen
     from spring.cbgen4 import CBAsyncGen4 as CBAsyncGen
     from spring.cbgen4 import CBGen4 as CBGen
     from spring.cbgen4 import SubDocGen4 as SubDocGen
@@ -133,8 +140,12 @@ def with_sleep(method, *args):
             time.sleep(self.CORRECTION_FACTOR * delta)
 
 
-def set_cpu_afinity(sid):
-    os.system('taskset -p -c {} {}'.format(sid % cpu_count(), os.getpid()))
+def correct_latency(latency: Union[float, Tuple[float, float]],
+                    delay: float) -> Union[float, Tuple[float, float]]:
+    """Add the time an operation spent waiting behind its intended start."""
+    if isinstance(latency, float):
+        return latency + delay
+    return tuple(value + delay for value in latency)
 
 
 Sequence = List[Tuple[str, Callable, Tuple]]
@@ -159,6 +170,7 @@ class Worker:
         self.shutdown_event = shutdown_event
         self.workload_id = workload_id
         self.sid = 0
+        self.hot_window = None
 
         self.next_report = 0.05  # report after every 5% of completion
         self.init_load_targets()
@@ -213,6 +225,8 @@ class Worker:
         self.num_access_targets = len(self.access_targets)
 
     def init_keys(self):
+        KEY_CACHE.resize(self.ws.key_cache_size)
+
         ws = copy.deepcopy(self.ws)
         ws.items = ws.items // self.num_load_targets
 
@@ -473,13 +487,18 @@ class Worker:
         stat_filename = '{}-{}-{}-{}'.format(self.NAME, self.workload_id, self.sid, self.ts.bucket)
         if wn := self.ws.workload_name:
             stat_filename += '-{}'.format(wn)
-        self.reservoir.dump(filename=stat_dir / stat_filename)
+        self.reservoir.dump(filename=stat_dir / stat_filename,
+                            binary=self.ws.latency_dump_format == 'binary')
 
 
 class KVWorker(Worker):
 
     NAME = 'kv-worker'
 
+    LATENCY_OPERATIONS = 'get', 'set', 'durable_set', 'delete'
+
+    KEY_CLAIM_BATCHES = 10  # Larger claims leave more in-flight keys per worker
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.reservoir = Reservoir(num_workers=self.ws.workers * len(self.ws.bucket_list))
@@ -487,6 +506,9 @@ class KVWorker(Worker):
         self.batch_duration = 0.0
         self.delta = 0.0
         self.op_delay = 0.0
+        self.next_start = None
+        self.key_ranges = {}
+        self.read_keys = deque()
 
     @property
     def random_ops(self) -> List[str]:
@@ -513,11 +535,16 @@ class KVWorker(Worker):
             args = target, key.string, doc, self.ws.persist_to, self.ws.replicate_to, self.ws.ttl
             return [('set', cb.update, args)]
 
+    def next_read_key(self, curr_items: int, deleted_items: int) -> Key:
+        if self.read_keys:
+            return self.read_keys.popleft()
+        return self.existing_keys.next(curr_items, deleted_items)
+
     def read_args(self, cb: Client,
                   curr_items: int,
                   deleted_items: int,
                   target: str) -> Sequence:
-        key = self.existing_keys.next(curr_items, deleted_items)
+        key = self.next_read_key(curr_items, deleted_items)
         args = target, key.string
 
         return [('get', cb.read, args)]
@@ -527,10 +554,7 @@ class KVWorker(Worker):
                     curr_items: int,
                     deleted_items: int,
                     target: str) -> Sequence:
-        key = self.existing_keys.next(curr_items,
-                                      deleted_items,
-                                      self.current_hot_load_start,
-                                      self.timer_elapse)
+        key = self.existing_keys.next(curr_items, deleted_items)
         doc = self.docs.next(key)
         if self.ws.durability:
             args = target, key.string, doc, self.ws.durability, self.ws.ttl
@@ -550,14 +574,43 @@ class KVWorker(Worker):
     def modify_args(self, cb: Client,
                     curr_items: int, deleted_items: int,
                     target: str) -> Sequence:
-        key = self.existing_keys.next(curr_items, deleted_items)
+        key = self.next_read_key(curr_items, deleted_items)
         doc = self.docs.next(key)
         read_args = target, key.string,
         update_args = target, key.string, doc, self.ws.persist_to, self.ws.replicate_to, self.ws.ttl
 
         return [('get', cb.read, read_args), ('set', cb.update, update_args)]
 
-    def gen_cmd_sequence(self, cb: Client = None) -> Sequence:
+    def claim_keys(self, target: str) -> Tuple[int, int]:
+        """Return the key counters for the next batch of the given target.
+
+        Key IDs are reserved in the shared key space for several batches at
+        once and then handed out locally.
+        """
+        key_range = self.key_ranges.get(target)
+        if key_range is None or not key_range.batches:
+            batches = self.KEY_CLAIM_BATCHES
+            curr_items, deleted_items = self.shared_dict.reserve(
+                target, self.ws.creates * batches, self.ws.deletes * batches)
+            key_range = self.key_ranges[target] = KeyRange(curr_items, deleted_items, batches)
+        return key_range.next(self.ws.creates, self.ws.deletes)
+
+    @property
+    def deletes_buffer(self) -> int:
+        """Return how far other workers' deletes can run ahead of this worker.
+
+        Every worker holds a claim of KEY_CLAIM_BATCHES batches, so the keys
+        deleted by all workers stay below the local position plus one claim
+        per worker.
+        """
+        return self.ws.deletes * self.ws.workers * self.KEY_CLAIM_BATCHES
+
+    def gen_cmd_units(self, cb: Client = None) -> List[Sequence]:
+        """Return the commands of the next batch grouped by operation.
+
+        The get and set of a read-modify-write form one unit and must be
+        issued in order.
+        """
         if not cb:
             cb = self.cb
         target = self.random_target()
@@ -565,29 +618,69 @@ class KVWorker(Worker):
         # curr_items = self.ws.items // self.num_load_targets
         deleted_items = 0
         if self.ws.creates or self.ws.deletes:
-            max_batch_deletes_buffer = self.ws.deletes * self.ws.workers
-            delete_buffer_diff = self.ws.deletes - max_batch_deletes_buffer
-            with self.gen_lock:
-                target_info = self.shared_dict[target]
-                curr_items = target_info[0]
-                deleted_items = target_info[1] + max_batch_deletes_buffer
-                self.shared_dict[target] = \
-                    [curr_items + self.ws.creates, deleted_items + delete_buffer_diff]
-        cmds = []
+            curr_items, deleted_items = self.claim_keys(target)
+        # Existing keys are picked above the ranges that any worker may be deleting
+        deleted_spot = deleted_items + self.deletes_buffer
+        if self.hot_window is not None:  # The working set only moves between batches
+            self.existing_keys.move(self.hot_window.position())
+        # Keys for all reads in the batch are drawn with a single call
+        num_reads = self.ws.reads + self.ws.reads_and_updates // 2
+        if num_reads:
+            self.read_keys = deque(self.existing_keys.next_batch(
+                num_reads, curr_items, deleted_spot))
+
+        units = []
         for op in self.random_ops:
             if op == 'c':
-                cmds += self.create_args(cb, curr_items, target)
+                units.append(self.create_args(cb, curr_items, target))
                 curr_items += 1
             elif op == 'r':
-                cmds += self.read_args(cb, curr_items, deleted_items, target)
+                units.append(self.read_args(cb, curr_items, deleted_spot, target))
             elif op == 'u':
-                cmds += self.update_args(cb, curr_items, deleted_items, target)
+                units.append(self.update_args(cb, curr_items, deleted_spot, target))
             elif op == 'd':
-                cmds += self.delete_args(cb, deleted_items, target)
+                units.append(self.delete_args(cb, deleted_items, target))
                 deleted_items += 1
             elif op == 'm':
-                cmds += self.modify_args(cb, curr_items, deleted_items, target)
-        return cmds
+                units.append(self.modify_args(cb, curr_items, deleted_spot, target))
+        return units
+
+    def gen_cmd_sequence(self, cb: Client = None) -> Sequence:
+        return [cmd for unit in self.gen_cmd_units(cb) for cmd in unit]
+
+    def do_open_loop_batch(self):
+        """Issue operations on a fixed schedule regardless of response times.
+
+        Every operation has an intended start time and the reported latency is
+        measured from it, so a server stall is charged to all operations that
+        should have been sent during the stall instead of being hidden by the
+        generator backing off (coordinated omission). Latency measured from the
+        actual start time is kept as "uncorrected_<operation>".
+        """
+        interval = self.target_time / self.batch_size
+        if self.next_start is None:
+            self.next_start = time.time()
+
+        for op_count, (cmd, func, args) in enumerate(self.gen_cmd_sequence()):
+            intended_start = self.next_start
+            self.next_start += interval
+
+            t0 = time.time()
+            if t0 < intended_start:
+                time.sleep(intended_start - t0)
+                t0 = intended_start
+
+            latency = func(*args)
+            if latency is not None:
+                target = args[0] if self.ws.per_collection_latency else None
+                self.reservoir.update(operation=cmd,
+                                      value=correct_latency(latency, t0 - intended_start),
+                                      target=target)
+                self.reservoir.update(operation='uncorrected_' + cmd, value=latency,
+                                      target=target)
+            if not op_count % 5:
+                if self.time_to_stop():
+                    return
 
     def do_batch(self, *args, **kwargs):
         op_count = 0
@@ -601,6 +694,8 @@ class KVWorker(Worker):
                     if self.time_to_stop():
                         return
                 op_count += 1
+        elif self.ws.open_loop:
+            self.do_open_loop_batch()
         else:
             t0 = time.time()
             self.op_delay = self.op_delay + (self.delta / self.batch_size)
@@ -625,17 +720,7 @@ class KVWorker(Worker):
     def run_condition(self, curr_ops):
         return curr_ops.value < self.ws.ops and not self.time_to_stop()
 
-    def run(self, sid, locks, curr_ops, shared_dict,
-            current_hot_load_start=None, timer_elapse=None):
-        logger.info('Running KVWorker')
-        self.sid = sid
-        self.locks = locks
-        self.gen_lock = locks[0]
-        self.batch_lock = locks[1]
-        self.shared_dict = shared_dict
-        self.current_hot_load_start = current_hot_load_start
-        self.timer_elapse = timer_elapse
-        self.cb.connect_collections(self.access_targets)
+    def init_ops(self):
         self.ops_list = \
             ['c'] * self.ws.creates + \
             ['r'] * self.ws.reads + \
@@ -652,6 +737,17 @@ class KVWorker(Worker):
                 self.ws.throughput
         else:
             self.target_time = None
+
+    def run(self, sid, locks, curr_ops, shared_dict, hot_window=None):
+        logger.info('Running KVWorker')
+        self.sid = sid
+        self.locks = locks
+        self.gen_lock = locks[0]
+        self.batch_lock = locks[1]
+        self.shared_dict = shared_dict
+        self.hot_window = hot_window
+        self.cb.connect_collections(self.access_targets)
+        self.init_ops()
         self.seed()
         try:
             if self.target_time:
@@ -687,7 +783,7 @@ class SubDocWorker(KVWorker):
                   curr_items: int,
                   deleted_items: int,
                   target: str) -> Sequence:
-        key = self.existing_keys.next(curr_items, deleted_items)
+        key = self.next_read_key(curr_items, deleted_items)
         read_args = target, key.string, self.ws.subdoc_field
 
         return [('get', cb.read, read_args)]
@@ -696,10 +792,7 @@ class SubDocWorker(KVWorker):
                     curr_items: int,
                     deleted_items: int,
                     target: str) -> Sequence:
-        key = self.existing_keys.next(curr_items,
-                                      deleted_items,
-                                      self.current_hot_load_start,
-                                      self.timer_elapse)
+        key = self.existing_keys.next(curr_items, deleted_items)
         doc = self.docs.next(key)
         update_args = target, key.string, self.ws.subdoc_field, doc
 
@@ -714,7 +807,7 @@ class XATTRWorker(SubDocWorker):
                   curr_items: int,
                   deleted_items: int,
                   target: str) -> Sequence:
-        key = self.existing_keys.next(curr_items, deleted_items)
+        key = self.next_read_key(curr_items, deleted_items)
         read_args = target, key.string, self.ws.xattr_field
 
         return [('get', cb.read_xattr, read_args)]
@@ -723,10 +816,7 @@ class XATTRWorker(SubDocWorker):
                     curr_items: int,
                     deleted_items: int,
                     target: str) -> Sequence:
-        key = self.existing_keys.next(curr_items,
-                                      deleted_items,
-                                      self.current_hot_load_start,
-                                      self.timer_elapse)
+        key = self.existing_keys.next(curr_items, deleted_items)
         doc = self.docs.next(key)
         update_args = target, key.string, self.ws.xattr_field, doc
 
@@ -748,6 +838,116 @@ class SeqXATTRUpdatesWorker(XATTRWorker):
                 time.sleep(period)
 
 
+class PipelinedKVWorker(KVWorker):
+
+    """Keep up to kv_pipeline operations in flight using the asyncio SDK client.
+
+    One process and one connection can drive much more throughput this way,
+    so fewer worker processes are needed to saturate a cluster. Batches are
+    generated and throttled as in KVWorker, but the pipeline is not drained
+    between them. Every operation is still timed individually.
+
+    In open-loop mode every operation gets an intended start time instead
+    and its latency is corrected as in KVWorker.do_open_loop_batch().
+    """
+
+    NAME = 'pipelined-kv-worker'
+
+    def init_db(self):
+        params = {'bucket': self.ts.bucket, 'host': self.ts.node,
+                  'username': self.ts.username, 'password': self.ts.password,
+                  'ssl_mode': self.ws.ssl_mode, 'connstr_params': self.ws.connstr_params}
+
+        self.cb = CBAIOGen(**params)
+
+    @property
+    def open_loop(self) -> bool:
+        return self.target_time is not None and bool(self.ws.open_loop)
+
+    async def next_unit(self) -> Optional[Tuple[Optional[float], Sequence]]:
+        """Return the intended start time and the commands of the next operation.
+
+        Operations are handed out whole, so the get and set of a
+        read-modify-write run in order in the same pipeline slot.
+        """
+        async with self.gen_cmd_lock:
+            if self.time_to_stop():
+                return None
+            if not self.units:
+                if not self.run_condition(self.curr_ops):
+                    return None
+                if self.target_time is not None and not self.open_loop:
+                    delay = self.next_batch_start - time.time()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    self.next_batch_start += self.target_time
+                with self.batch_lock:
+                    self.curr_ops.value += self.batch_size
+                self.units.extend(self.gen_cmd_units())
+                self.report_progress(self.curr_ops.value)
+            unit = self.units.popleft()
+            intended_start = None
+            if self.open_loop:
+                intended_start = self.next_start
+                self.next_start += self.interval * len(unit)
+            return intended_start, unit
+
+    async def run_pipeline(self):
+        while next_unit := await self.next_unit():
+            intended_start, unit = next_unit
+            for cmd, func, args in unit:
+                delay = 0.0
+                if intended_start is not None:
+                    delay = time.time() - intended_start
+                    if delay < 0:
+                        await asyncio.sleep(-delay)
+                        delay = 0.0
+                    intended_start += self.interval
+
+                latency = await func(*args)
+                if latency is None:
+                    continue
+                target = args[0] if self.ws.per_collection_latency else None
+                if self.open_loop:
+                    self.reservoir.update(operation=cmd, value=correct_latency(latency, delay),
+                                          target=target)
+                    self.reservoir.update(operation='uncorrected_' + cmd, value=latency,
+                                          target=target)
+                else:
+                    self.reservoir.update(operation=cmd, value=latency, target=target)
+
+    async def run_pipelines(self):
+        await self.cb.connect_collections(self.access_targets)
+        self.gen_cmd_lock = asyncio.Lock()
+        self.next_batch_start = time.time()
+        if self.target_time:
+            self.next_batch_start += random.random_sample() * self.target_time
+            self.interval = self.target_time / self.batch_size
+        self.next_start = self.next_batch_start
+        await asyncio.gather(*(self.run_pipeline() for _ in range(self.ws.kv_pipeline)))
+
+    def run(self, sid, locks, curr_ops, shared_dict, hot_window=None):
+        logger.info('Running PipelinedKVWorker')
+        self.sid = sid
+        self.locks = locks
+        self.gen_lock = locks[0]
+        self.batch_lock = locks[1]
+        self.shared_dict = shared_dict
+        self.hot_window = hot_window
+        self.curr_ops = curr_ops
+        self.units = deque()
+        self.init_ops()
+        self.seed()
+        try:
+            asyncio.run(self.run_pipelines())
+        except KeyboardInterrupt:
+            logger.info('Interrupted: {}-{}-{}'.format(self.NAME, self.sid, self.ts.bucket))
+        else:
+            logger.info('Finished: {}-{}-{}'.format(self.NAME, self.sid, self.ts.bucket))
+        finally:
+            self.dump_stats()
+
+
 class AsyncKVWorker(KVWorker):
 
     NAME = 'async-kv-worker'
@@ -810,37 +1010,20 @@ class AsyncKVWorker(KVWorker):
         d.addCallback(self.do_batch, cb, i)
         d.addErrback(self.error, cb, i)
 
-    def run(self, sid, locks, curr_ops, shared_dict,
-            current_hot_load_start=None, timer_elapse=None):
+    def run(self, sid, locks, curr_ops, shared_dict, hot_window=None):
         set_cpu_afinity(sid)
         self.sid = sid
         self.locks = locks
         self.gen_lock = locks[0]
         self.batch_lock = locks[1]
         self.shared_dict = shared_dict
-        self.current_hot_load_start = current_hot_load_start
-        self.timer_elapse = timer_elapse
+        self.hot_window = hot_window
         self.curr_ops = curr_ops
 
         for cb in self.cbs:
             cb.connect_collections(self.access_targets)
 
-        self.ops_list = \
-            ['c'] * self.ws.creates + \
-            ['r'] * self.ws.reads + \
-            ['u'] * self.ws.updates + \
-            ['d'] * self.ws.deletes + \
-            ['m'] * (self.ws.reads_and_updates // 2)
-        self.batch_size = len(self.ops_list)
-        self.num_random_targets = min(self.batch_size,
-                                      max(self.num_access_targets//self.ws.workers, 1))
-        self.q, self.r = divmod(self.batch_size, self.num_random_targets)
-
-        if self.ws.throughput < float('inf'):
-            self.target_time = float(self.batch_size) * self.ws.workers / \
-                self.ws.throughput
-        else:
-            self.target_time = None
+        self.init_ops()
 
         self.seed()
         self.done = False
@@ -1106,13 +1289,11 @@ class UserModWorker(AuxillaryWorker):
         password = 'password'
         self.cb.do_upsert_user(random_user, random_roles, password)
 
-    def run(self, sid, lock, curr_ops, shared_dict,
-            current_hot_load_start=None, timer_elapse=None):
+    def run(self, sid, lock, curr_ops, shared_dict, hot_window=None):
         self.sid = sid
         self.lock = lock
         self.shared_dict = shared_dict
-        self.current_hot_load_start = current_hot_load_start
-        self.timer_elapse = timer_elapse
+        self.hot_window = hot_window
         self.seed()
         if self.ws.user_mod_throughput < float('inf'):
             self.target_time = self.ws.user_mod_workers / \
@@ -1162,13 +1343,11 @@ class CollectionModWorker(AuxillaryWorker):
         self.cb.do_collection_create(target_scope, target_collection)
         self.cb.do_collection_drop(target_scope, target_collection)
 
-    def run(self, sid, lock, curr_ops, shared_dict,
-            current_hot_load_start=None, timer_elapse=None):
+    def run(self, sid, lock, curr_ops, shared_dict, hot_window=None):
         self.sid = sid
         self.lock = lock
         self.shared_dict = shared_dict
-        self.current_hot_load_start = current_hot_load_start
-        self.timer_elapse = timer_elapse
+        self.hot_window = hot_window
         self.seed()
         self.cb.create_collection_manager()
 
@@ -1218,12 +1397,7 @@ class N1QLWorker(Worker):
             t0 = time.time()
             self.op_delay = self.op_delay + (self.delta / self.ws.n1ql_batch_size)
         target = self.next_target()
-        with self.lock:
-            target_info = self.shared_dict[target]
-            target_curr_items = target_info[0]
-            target_deleted_items = target_info[1]
-            updated_curr_items = target_curr_items + self.ws.n1ql_batch_size
-            self.shared_dict[target] = [updated_curr_items, target_deleted_items]
+        target_curr_items, _ = self.shared_dict.reserve(target, self.ws.n1ql_batch_size, 0)
 
         for i in range(self.ws.n1ql_batch_size):
             target_curr_items += 1
@@ -1288,6 +1462,8 @@ class N1QLWorker(Worker):
 
         if self.ws.doc_gen == 'ext_reverse_lookup':
             target_curr_items //= 4
+        if self.hot_window is not None:  # The working set only moves between batches
+            self.existing_keys.move(self.hot_window.position())
         for i in range(self.ws.n1ql_batch_size):
             key = self.existing_keys.next(curr_items=target_curr_items,
                                           curr_deletes=0)
@@ -1431,15 +1607,13 @@ class N1QLWorker(Worker):
         self.replacement_targets[self.ts.bucket] = target_replacements
         return target
 
-    def run(self, sid, locks, curr_ops, shared_dict,
-            current_hot_load_start=None, timer_elapse=None):
+    def run(self, sid, locks, curr_ops, shared_dict, hot_window=None):
         logger.info('Running N1QLWorker')
         self.sid = sid
         self.locks = locks
         self.lock = locks[0]
         self.shared_dict = shared_dict
-        self.current_hot_load_start = current_hot_load_start
-        self.timer_elapse = timer_elapse
+        self.hot_window = hot_window
         self.init_n1ql_access_targets()
         self.bucket_instances = self.access_targets[self.ts.bucket]
         self.num_bucket_instances = len(self.bucket_instances)
@@ -1508,10 +1682,13 @@ class ViewWorker(Worker):
         target_info = self.shared_dict["_default:_default"]
         curr_items = target_info[0]
         deleted_items = target_info[1]
+        # KV workers claim keys for KVWorker.KEY_CLAIM_BATCHES batches at once
         curr_items_spot = \
-            curr_items - self.ws.creates * self.ws.workers
+            curr_items - self.ws.creates * self.ws.workers * KVWorker.KEY_CLAIM_BATCHES
         deleted_spot = \
-            deleted_items + self.ws.deletes * self.ws.workers
+            deleted_items + self.ws.deletes * self.ws.workers * KVWorker.KEY_CLAIM_BATCHES
+        if self.hot_window is not None:  # The working set only moves between batches
+            self.existing_keys.move(self.hot_window.position())
 
         for i in range(self.ws.spring_batch_size):
             key = self.existing_keys.next(curr_items_spot, deleted_spot)
@@ -1530,8 +1707,7 @@ class ViewWorker(Worker):
             if self.delta > 0:
                 time.sleep(self.CORRECTION_FACTOR * self.delta)
 
-    def run(self, sid, locks, curr_ops, shared_dict,
-            current_hot_load_start=None, timer_elapse=None):
+    def run(self, sid, locks, curr_ops, shared_dict, hot_window=None):
         if self.ws.query_throughput < float('inf'):
             self.target_time = float(self.ws.spring_batch_size) * self.ws.query_workers / \
                 self.ws.query_throughput
@@ -1542,8 +1718,7 @@ class ViewWorker(Worker):
         self.locks = locks
         self.lock = locks[0]
         self.shared_dict = shared_dict
-        self.current_hot_load_start = current_hot_load_start
-        self.timer_elapse = timer_elapse
+        self.hot_window = hot_window
 
         try:
             while not self.time_to_stop():
@@ -1578,6 +1753,8 @@ class WorkerFactory:
             worker = SubDocWorker
         elif getattr(settings, 'xattr_field', None):
             worker = XATTRWorker
+        elif getattr(settings, 'kv_pipeline', 0):
+            worker = PipelinedKVWorker
         else:
             worker = KVWorker
         return worker, num_workers
@@ -1616,12 +1793,74 @@ class WorkloadGen:
         self.shutdown_events = []
         self.worker_processes = []
         self.workload_id = instance
+        self.histograms = self.init_histograms()
+        self.placement = self.init_placement()
+        self.num_pinned_workers = 0
+
+    def init_histograms(self):
+        """Allocate shared latency histograms for the KV workers."""
+        if not self.ws.latency_histograms:
+            return
+
+        targets = [None]
+        if self.ws.per_collection_latency:
+            for scope, collections in self.ws.collections[self.ts.bucket].items():
+                for collection, options in collections.items():
+                    if options['load'] == 1 and options['access'] == 1:
+                        targets.append(scope + ":" + collection)
+
+        prefixes = ['', 'total_']
+        if self.ws.open_loop:
+            prefixes += ['uncorrected_', 'total_uncorrected_']
+
+        keys = [
+            (prefix + operation, target)
+            for operation in KVWorker.LATENCY_OPERATIONS
+            for prefix in prefixes
+            for target in targets
+        ]
+        return SharedHistograms(keys)
+
+    def init_placement(self) -> Optional[CPUPlacement]:
+        """Plan CPU pinning if the workload has a core budget."""
+        if not self.ws.cpu_cores:
+            return
+
+        workers = sum(
+            factory(self.ws)[1]
+            for factory in (WorkerFactory, N1QLWorkerFactory, ViewWorkerFactory)
+        )
+        return CPUPlacement(self.ws.cpu_cores, workers, self.workload_id)
+
+    def worker_cpus(self, worker_factory) -> Optional[Set[int]]:
+        if self.placement is None:
+            return
+        if worker_factory is AuxillaryWorkerFactory:
+            return self.placement.control_cpus
+
+        index = self.num_pinned_workers
+        self.num_pinned_workers += 1
+        return self.placement.worker_cpus(index)
+
+    def dump_histograms(self):
+        """Write the latency histograms merged across all KV workers."""
+        if self.histograms is None:
+            return
+
+        stat_dir = Path('./spring_latency/master_{}/'.format(self.ts.node))
+        stat_dir.mkdir(parents=True, exist_ok=True)
+        stat_filename = 'kv-histograms-{}-{}'.format(self.workload_id, self.ts.bucket)
+        if wn := self.ws.workload_name:
+            stat_filename += '-{}'.format(wn)
+        self.histograms.dump(filename=stat_dir / '{}.json'.format(stat_filename),
+                             percentiles=self.ws.latency_percentiles,
+                             bucket=self.ts.bucket)
 
     def start_workers(self,
                       worker_factory,
                       shared_dict,
-                      current_hot_load_start=None,
-                      timer_elapse=None):
+                      hot_window=None,
+                      histograms=None):
         curr_ops = Value('L', 0)
         batch_lock = Lock()
         gen_lock = Lock()
@@ -1631,14 +1870,19 @@ class WorkloadGen:
             shutdown_event = Event()
             self.shutdown_events.append(shutdown_event)
             args = (sid, locks, curr_ops, shared_dict,
-                    current_hot_load_start, timer_elapse, worker_type,
-                    self.ws, self.ts, shutdown_event, self.workload_id)
+                    hot_window, worker_type,
+                    self.ws, self.ts, shutdown_event, self.workload_id, histograms,
+                    self.worker_cpus(worker_factory))
 
             def run_worker(sid, locks, curr_ops, shared_dict,
-                           current_hot_load_start, timer_elapse, worker_type,
-                           ws, ts, shutdown_event, wid):
+                           hot_window, worker_type,
+                           ws, ts, shutdown_event, wid, histograms, cpus):
+                if cpus:
+                    CPUPlacement.pin(cpus)
                 worker = worker_type(ws, ts, shutdown_event, wid)
-                worker.run(sid, locks, curr_ops, shared_dict, current_hot_load_start, timer_elapse)
+                if histograms is not None:
+                    worker.reservoir = HistogramReservoir(histograms)
+                worker.run(sid, locks, curr_ops, shared_dict, hot_window)
 
             worker_process = Process(target=run_worker, args=args)
             worker_process.daemon = True
@@ -1651,8 +1895,7 @@ class WorkloadGen:
     def start_all_workers(self):
         """Start all the workers groups."""
         logger.info('Starting all collections workers')
-        self.manager = Manager()
-        self.shared_dict = self.manager.dict()
+        key_space = {}
         if self.ws.collections is not None:
             num_load = 0
             num_ratio = 0
@@ -1675,39 +1918,36 @@ class WorkloadGen:
                     if options['load'] == 1:
                         if ratio := options.get('ratio'):
                             final_items = curr_items * ratio
-                            self.shared_dict[target] = [final_items, 0]
+                            key_space[target] = [final_items, 0]
                         else:
-                            self.shared_dict[target] = [curr_items, 0]
+                            key_space[target] = [curr_items, 0]
                     else:
-                        self.shared_dict[target] = [0, 0]
+                        key_space[target] = [0, 0]
         else:
             # version prior to 7.0.0
             target = "_default:_default"
-            self.shared_dict[target] = [self.ws.items, 0]
-
-        timer_elapse = Value('I', 0)
-        current_hot_load_start = Value('L', 0)
+            key_space[target] = [self.ws.items, 0]
+        self.shared_dict = KeySpace(key_space)
 
+        hot_window = None
         if self.ws.working_set_move_time:
-            current_hot_load_start.value = int(self.ws.items * self.ws.working_set / 100)
-            self.sync = SyncHotWorkload(current_hot_load_start, timer_elapse)
+            hot_window = HotWindow(self.ws.working_set_move_time,
+                                   smooth=self.ws.working_set_move_mode == 'smooth')
+            self.sync = WorkingSetCoordinator(hot_window)
 
         self.start_workers(AuxillaryWorkerFactory,
                            self.shared_dict,
-                           current_hot_load_start,
-                           timer_elapse)
+                           hot_window)
         self.start_workers(WorkerFactory,
                            self.shared_dict,
-                           current_hot_load_start,
-                           timer_elapse)
+                           hot_window,
+                           self.histograms)
         self.start_workers(N1QLWorkerFactory,
                            self.shared_dict,
-                           current_hot_load_start,
-                           timer_elapse)
+                           hot_window)
         self.start_workers(ViewWorkerFactory,
                            self.shared_dict,
-                           current_hot_load_start,
-                           timer_elapse)
+                           hot_window)
 
     def set_signal_handler(self):
         """Abort the execution upon receiving a signal from perfrunner."""
@@ -1733,7 +1973,7 @@ class WorkloadGen:
             self.timer.start()
 
         if self.ws.working_set_move_time:
-            self.sync.start_timer(self.ws)
+            self.sync.start_timer()
 
     def stop_timers(self):
         """Cancel all the active timers."""
@@ -1748,7 +1988,17 @@ class WorkloadGen:
         for process in self.worker_processes:
             process.join()
 
+    def start_placement(self):
+        if self.placement is not None:
+            self.placement.start()
+
+    def stop_placement(self):
+        if self.placement is not None:
+            self.placement.stop()
+
     def run(self):
+        self.start_placement()
+
         self.start_all_workers()
 
         self.start_timers()
@@ -1760,3 +2010,7 @@ class WorkloadGen:
         self.wait_for_completion()
 
         self.stop_timers()
+
+        self.stop_placement()
+
+        self.dump_histograms()
@@ -1,22 +1,41 @@
+import asyncio
+import fcntl
 import glob
 import json
-from collections import defaultdict, namedtuple
-from multiprocessing import Value
-from unittest import TestCase
+import random
+import tempfile
+import threading
+from collections import defaultdict, deque, namedtuple
+from unittest import TestCase, mock
 
+import numpy
 import pkg_resources
+import requests
 import snappy
 
+from cbagent.collectors.collector import Collector
+from cbagent.collectors.io_amplification import IOAmplification
+from cbagent.collectors.latency import KVLatency
+from cbagent.collectors.libstats.iostat import DiskStats
+from cbagent.collectors.libstats.restcache import RestCache
+from cbagent.collectors.libstats.sshpool import ProcStreamer
+from cbagent.collectors.ns_server import NSServer
+from cbagent.metadata_client import MetadataClient, MetadataRegistry
+from cbagent.stores import PerfStore
+from perfrunner.helpers import memcached, rest, sync
+from perfrunner.helpers.metrics import MetricHelper, SeriesCache, YCSBLog
+from perfrunner.helpers.waiter import AdaptivePoller
 from perfrunner.settings import ClusterSpec, TestConfig
 from perfrunner.workloads.bigfun.query_gen import new_queries
 from perfrunner.workloads.tcmalloc import KeyValueIterator, LargeIterator
-from spring import docgen
+from spring import docgen, histogram, keyspace, placement, reservoir
 
 sdk_major_version = int(pkg_resources.get_distribution("couchbase").version[0])
 if sdk_major_version == 2:
     from spring.querygen import N1QLQueryGen
 elif sdk_major_version >= 3:
     from spring.querygen3 import N1QLQueryGen3 as N1QLQueryGen
+    from spring.wgen3 import PipelinedKVWorker
 
 
 class SettingsTest(TestCase):
@@ -236,6 +255,20 @@ class SpringTest(TestCase):
             key = key_gen.next(curr_deletes=100, curr_items=ws.items)
             self.assertIn(key.string, keys)
 
+    def test_batch_key_generators(self):
+        ws = WorkloadSettings(items=10 ** 3, workers=40, working_set=10,
+                              working_set_access=90, working_set_moving_docs=0,
+                              key_fmtr='decimal')
+
+        for key_gen in (docgen.UniformKey(prefix='test', fmtr=ws.key_fmtr),
+                        docgen.WorkingSetKey(ws=ws, prefix='test'),
+                        docgen.ZipfKey(prefix='test', fmtr=ws.key_fmtr, alpha=1.5),
+                        docgen.PowerKey(prefix='test', fmtr=ws.key_fmtr, alpha=100)):
+            keys = key_gen.next_batch(10 ** 4, curr_items=ws.items, curr_deletes=100)
+            self.assertEqual(len(keys), 10 ** 4)
+            for key in keys:
+                self.assertTrue(100 <= key.number < ws.items)
+
     def test_power_generator_cache_miss(self):
         num_ops = 10 ** 5
         ws = WorkloadSettings(items=10 ** 5, workers=40, working_set=1.6,
@@ -416,10 +449,9 @@ class SpringTest(TestCase):
 
     def test_moving_working_set_keys(self):
         ws = WorkloadSettings(items=10 ** 3, workers=10, working_set=90,
-                              working_set_access=50, working_set_moving_docs=0,
+                              working_set_access=50, working_set_moving_docs=10,
                               key_fmtr='decimal')
-        current_hot_load_start = Value('L', 0)
-        timer_elapse = Value('I', 0)
+        hot_window = sync.HotWindow(move_time=10, smooth=True)
 
         keys = set()
         for worker in range(ws.workers):
@@ -429,12 +461,13 @@ class SpringTest(TestCase):
         key_gen = docgen.MovingWorkingSetKey(ws, prefix='test')
         keys = sorted(keys)
 
-        for op in range(10 ** 4):
-            key = key_gen.next(curr_items=ws.items,
-                               curr_deletes=0,
-                               current_hot_load_start=current_hot_load_start,
-                               timer_elapse=timer_elapse)
-            self.assertIn(key.string, keys)
+        for epoch in range(20):
+            hot_window.publish(epoch, epoch_start=100)
+            key_gen.move(hot_window.position(now=105))
+            self.assertEqual(key_gen.position, epoch + 0.5)
+            for op in range(10 ** 3):
+                key = key_gen.next(curr_items=ws.items, curr_deletes=0)
+                self.assertIn(key.string, keys)
 
     def test_cas_updates(self):
         ws = WorkloadSettings(items=10 ** 3, workers=20, working_set=100,
@@ -498,6 +531,20 @@ class SpringTest(TestCase):
                 self.assertEqual(len(key.string), 16)
                 keys.add(key.string)
 
+    def test_key_cache(self):
+        keys = [docgen.Key(number=i % 50, prefix='test', fmtr=fmtr)
+                for fmtr in ('decimal', 'hash', 'hex') for i in range(200)]
+        expected = [(key.string, docgen.String.build_alphabet(key.string)) for key in keys]
+
+        try:
+            docgen.KEY_CACHE.resize(100)
+            actual = [(key.string, docgen.String.build_alphabet(key.string)) for key in keys]
+            self.assertEqual(docgen.KEY_CACHE.string.cache_info().misses, 150)
+        finally:
+            docgen.KEY_CACHE.resize(0)
+
+        self.assertEqual(actual, expected)
+
     def test_new_working_set_hits(self):
         ws = WorkloadSettings(items=10 ** 3, workers=40, working_set=20,
                               working_set_access=100, working_set_moving_docs=0,
@@ -600,6 +647,184 @@ class SpringTest(TestCase):
         doc = generator.next(key=docgen.Key(number=0, prefix='', fmtr=''))
         self.assertEqual(len(doc), size)
 
+    def test_native_document_builder(self):
+        generator = docgen.Document(avg_size=1024)
+        for i in range(1000):
+            key = docgen.Key(number=i, prefix='test', fmtr='hex')
+            alphabet = generator.build_alphabet(key.string)
+            size = 64 * i + i % 64
+
+            docgen.random.seed(i)
+            native_doc = generator.build_document(alphabet, size)
+
+            docgen.random.seed(i)
+            with mock.patch.object(docgen, 'native_build_document', None), \
+                    mock.patch.object(docgen, 'native_build_string', None):
+                python_doc = generator.build_document(alphabet, size)
+
+            self.assertEqual(native_doc, python_doc)
+
+    def test_latency_histogram(self):
+        values = numpy.random.exponential(scale=0.001, size=10 ** 5)
+
+        histograms = [histogram.LatencyHistogram() for _ in range(4)]
+        for i, value in enumerate(values):
+            histograms[i % 4].record(value)
+        merged = histograms[0]
+        for h in histograms[1:]:
+            merged.merge(h)
+
+        self.assertEqual(merged.total_count, len(values))
+        expected = numpy.percentile(values * 1000, [50, 99, 99.9])
+        for (p, actual), exp in zip(merged.percentiles([50, 99, 99.9]).items(), expected):
+            self.assertAlmostEqual(actual, exp, delta=exp * 0.01)
+
+    def test_binary_reservoir(self):
+        measurements = reservoir.Reservoir()
+        measurements.update('get', 0.001)
+        measurements.update('set', (0.002, 0.003), target='bucket-1:scope-1:collection-1')
+        measurements.update('get', 0.004, target='bucket-1:scope-1:collection-1')
+
+        with tempfile.NamedTemporaryFile() as fh:
+            measurements.dump(fh.name, binary=True)
+            self.assertTrue(reservoir.is_binary(fh.name))
+            self.assertEqual(list(reservoir.iter_binary(fh.name, chunk_size=2)),
+                             measurements.values)
+
+            _, columns = reservoir.read_binary(fh.name, fields=['latency'])
+            self.assertEqual(list(columns), ['latency'])
+            self.assertEqual(columns['latency'].tolist(), [0.001, 0.002, 0.004])
+
+        with tempfile.NamedTemporaryFile() as fh:
+            reservoir.Reservoir().dump(fh.name, binary=True)
+            self.assertEqual(list(reservoir.iter_binary(fh.name)), [])
+
+    def test_kv_pipeline(self):
+        class FakeClient:
+
+            def __init__(self):
+                self.in_flight = self.max_in_flight = 0
+                self.events = []
+
+            async def connect_collections(self, targets):
+                pass
+
+            async def op(self, name, key):
+                self.in_flight += 1
+                self.max_in_flight = max(self.max_in_flight, self.in_flight)
+                self.events.append((name, key))
+                await asyncio.sleep(0.002)
+                self.in_flight -= 1
+                return 0.002
+
+            async def read(self, target, key):
+                return await self.op('get', key)
+
+            async def update(self, target, key):
+                return await self.op('set', key)
+
+        def run(open_loop, kv_pipeline, batches=5):
+            cb = FakeClient()
+            keys = iter(range(10 ** 6))
+
+            def gen_cmd_units():
+                units = []
+                for _ in range(4):
+                    key = next(keys)
+                    units.append([('get', cb.read, ('t', key)), ('set', cb.update, ('t', key))])
+                units.append([('get', cb.read, ('t', next(keys)))])
+                return units
+
+            worker = PipelinedKVWorker.__new__(PipelinedKVWorker)
+            worker.ws = namedtuple('ws', ['open_loop', 'per_collection_latency', 'ops',
+                                          'kv_pipeline'])(open_loop, False, 9 * batches,
+                                                          kv_pipeline)
+            worker.cb = cb
+            worker.access_targets = []
+            worker.gen_cmd_units = gen_cmd_units
+            worker.reservoir = reservoir.Reservoir()
+            worker.shutdown_event = None
+            worker.sid = 1
+            worker.batch_lock = threading.Lock()
+            worker.curr_ops = mock.Mock(value=0)
+            worker.units = deque()
+            worker.batch_size = 9
+            worker.target_time = 0.001 if open_loop else None
+            asyncio.run(worker.run_pipelines())
+            return worker, cb
+
+        worker, cb = run(open_loop=0, kv_pipeline=4)
+        self.assertEqual(cb.max_in_flight, 4)
+        self.assertEqual(len(cb.events), 45)
+        for key in range(0, 25, 5):
+            for pair_key in range(key, key + 4):
+                self.assertLess(cb.events.index(('get', pair_key)),
+                                cb.events.index(('set', pair_key)))
+        self.assertEqual(sorted(value[0] for value in worker.reservoir.values),
+                         ['get'] * 25 + ['set'] * 20)
+
+        # Operations fall behind the schedule, the delay is added to their latency
+        worker, cb = run(open_loop=1, kv_pipeline=2)
+        self.assertEqual(cb.max_in_flight, 2)
+        latencies = defaultdict(list)
+        for operation, _, latency, *_ in worker.reservoir.values:
+            latencies[operation].append(latency)
+        self.assertEqual(len(latencies['uncorrected_get']), 25)
+        self.assertEqual(set(latencies['uncorrected_set']), {0.002})
+        self.assertGreater(max(latencies['get']), 10 * 0.002)
+
+    def test_key_claims(self):
+        workers, batches, creates, deletes = 4, 10, 3, 2
+        key_space = keyspace.KeySpace({'t': (1000, 0)})
+        key_ranges = [None] * workers
+        # Reads pick keys above the local position plus one claim per worker
+        deletes_buffer = deletes * workers * batches
+
+        def claim(worker):
+            if key_ranges[worker] is None or not key_ranges[worker].batches:
+                curr_items, deleted_items = key_space.reserve(
+                    't', creates * batches, deletes * batches)
+                key_ranges[worker] = keyspace.KeyRange(curr_items, deleted_items, batches)
+            return key_ranges[worker].next(creates, deletes)
+
+        rng = random.Random(0)
+        created, deleted = set(), set()
+        for _ in range(5 * batches):
+            floors = []
+            order = list(range(workers))
+            rng.shuffle(order)
+            for worker in order:
+                curr_items, deleted_items = claim(worker)
+                floors.append(deleted_items + deletes_buffer)
+                created.update(range(curr_items, curr_items + creates))
+                deleted.update(range(deleted_items, deleted_items + deletes))
+            self.assertGreater(min(floors), max(deleted))
+
+        self.assertEqual(created, set(range(1000, 1000 + 5 * batches * workers * creates)))
+        self.assertEqual(deleted, set(range(5 * batches * workers * deletes)))
+
+    def test_cpu_placement(self):
+        self.assertEqual(placement.parse_cpulist('0-2,8,10-11\n'), [0, 1, 2, 8, 10, 11])
+
+        nodes = {0: [0, 1, 2, 3], 1: [4, 5, 6, 7]}
+        cpu_placement = placement.CPUPlacement(cores=4, workers=3, instance=1, nodes=nodes)
+        self.assertEqual(cpu_placement.control_cpus, {4})
+        self.assertEqual([cpu_placement.worker_cpus(i) for i in range(3)], [{5}, {6}, {7}])
+
+        cpu_placement = placement.CPUPlacement(cores=6, workers=10, nodes=nodes)
+        self.assertEqual(cpu_placement.control_cpus, {0})
+        self.assertEqual(cpu_placement.worker_cpus(0), {1, 2, 3})
+        self.assertEqual(cpu_placement.worker_cpus(3), {4, 5})
+
+        # Budgets stay within one NUMA node and never wrap around silently
+        cpu_placement = placement.CPUPlacement(cores=3, workers=2, instance=1, nodes=nodes)
+        self.assertEqual(cpu_placement.cpus, [4, 5, 6])
+
+        with mock.patch('spring.placement.logger') as logger:
+            cpu_placement = placement.CPUPlacement(cores=3, workers=2, instance=2, nodes=nodes)
+            logger.warn.assert_called_once()
+        self.assertEqual(cpu_placement.cpus, [0, 1, 2])
+
 
 class QueryTest(TestCase):
 
@@ -680,3 +905,404 @@ class PipelineTest(TestCase):
             with open(pipeline) as fh:
                 test_cases = json.load(fh)
                 self.assertEqual(stages, set(test_cases), pipeline)
+
+
+class MetricsTest(TestCase):
+
+    YCSB_LOG = """[OVERALL], Throughput(ops/sec), 1500.5
+[READ], Operations, 3000
+[READ], MaxLatency(us), 2500
+[READ], 0, 5000.0
+[READ], 1000, 100.0
+[READ], 2000, 200.0
+[READ-FAILED], Operations, 7
+[TOTAL_GCs], Count, 3
+"""
+
+    def test_ycsb_log(self):
+        with mock.patch('builtins.open', mock.mock_open(read_data=self.YCSB_LOG)):
+            ycsb_log = YCSBLog.parse('ycsb_run_0.log')
+            ycsb_log.merge(YCSBLog.parse('ycsb_run_1.log'))
+
+        self.assertEqual(ycsb_log.throughput, 3000)
+        self.assertEqual(ycsb_log.gcs, 6)
+        self.assertEqual(ycsb_log.failures, {'READ': 14})
+        self.assertEqual(ycsb_log.max_latencies, {'READ': 2.5})
+        self.assertEqual(ycsb_log.histograms['READ'].total_count, 4)
+        self.assertEqual(ycsb_log.latencies(50),
+                         {'50th Percentile READ': 0.1, 'Average READ': 0.15})
+
+    def test_missing_series(self):
+        series = SeriesCache(store=mock.Mock(get_values_if_exists=mock.Mock(return_value=None)))
+        self.assertEqual(len(series.concat(['db'], 'latency_query')), 0)
+        with self.assertRaisesRegex(ValueError, 'No data for db/latency_query'):
+            series.concat(['db'], 'latency_query', required=True)
+
+    def test_io_amplification_phase(self):
+        helper = MetricHelper.__new__(MetricHelper)
+        helper.test = mock.Mock(cbmonitor_clusters=['cluster'], cbmonitor_snapshots=['cluster'])
+        helper.test_config = mock.Mock()
+        helper.test_config.name = 'ycsb_phase'
+        helper.test_config.showfast.title = 'YCSB'
+        helper.cluster_spec = mock.Mock(capella_infrastructure=False)
+        helper.store = mock.Mock()
+        helper.series = mock.Mock(concat=mock.Mock(return_value=numpy.array([1.0, 3.0])))
+
+        metrics = helper.io_amplification(servers=['node'], metric_names=['physical_read_amp'])
+        self.assertEqual(metrics[0][2]['id'], 'ycsb_phase_physical_read_amp_avg')
+
+        metrics = helper.io_amplification(servers=['node'], metric_names=['physical_read_amp'],
+                                          phase='Phase 2, Workload C')
+        self.assertEqual([metric[2]['id'] for metric in metrics], [
+            'ycsb_phase_phase_2_workload_c_physical_read_amp_avg',
+            'ycsb_phase_phase_2_workload_c_physical_read_amp_p95',
+            'ycsb_phase_phase_2_workload_c_physical_read_amp_max',
+        ])
+        self.assertEqual(metrics[0][2]['title'],
+                         'Avg physical read amplification, YCSB, Phase 2, Workload C')
+
+    def test_kv_latency_histograms(self):
+        with tempfile.TemporaryDirectory() as path:
+            for workload, latency in enumerate((0.001, 0.003)):
+                shared = histogram.SharedHistograms([('get', None)])
+                reservoir = histogram.HistogramReservoir(shared)
+                for _ in range(100):
+                    reservoir.update('get', latency)
+                reservoir.dump('kv-worker')
+                shared.dump('{}/kv-histograms-{}-bucket-1.json'.format(path, workload),
+                            percentiles=[50], bucket='bucket-1')
+
+            collector = KVLatency.__new__(KVLatency)
+            collector.stat_dir = path
+            collector.cluster = '{}/cluster'.format(path)
+            collector.target_groups = {'bucket-1': {'_default:_default': ''}}
+            collector.merge_histograms()
+
+            helper = MetricHelper.__new__(MetricHelper)
+            helper.test = mock.Mock(cbmonitor_clusters=[collector.cluster])
+            helper.test_config = mock.Mock(buckets=['bucket-1'])
+            helper.cluster_spec = mock.Mock(serverless_infrastructure=False)
+            latencies = helper._kv_latency('get', [25, 75], collector='spring_latency')
+            self.assertAlmostEqual(latencies[0], 1, delta=0.01)
+            self.assertAlmostEqual(latencies[1], 3, delta=0.03)
+
+
+class WaiterTest(TestCase):
+
+    def test_adaptive_poller(self):
+        poller = AdaptivePoller(interval=10)
+        for timestamp, remaining in enumerate((100, 80, 60, 40, 20)):
+            poller.observe(remaining, timestamp)
+        self.assertEqual(poller.next_interval(), 0.5)
+
+        poller.observe(0, 10)
+        self.assertEqual(poller.completion_time(), 5)
+
+        poller = AdaptivePoller(interval=1)
+        poller.observe(10, 0)
+        poller.observe(-30, 2)
+        self.assertEqual(poller.completion_time(), 0.5)
+
+
+class MemcachedTest(TestCase):
+
+    @mock.patch('perfrunner.helpers.memcached.MemcachedClient')
+    def test_stats_connections(self, client):
+        client.return_value.stats.return_value = {'curr_items': '10', 'ep_ratio': '0.5',
+                                                  'ep_warmup_state': 'done'}
+        cluster_spec = mock.Mock(rest_credentials=('admin', 'password'))
+        test_config = mock.Mock()
+        test_config.cluster.ipv6 = 0
+        helper = memcached.MemcachedHelper(cluster_spec, test_config)
+
+        for bucket in ('bucket-1', 'bucket-1', 'bucket-2'):
+            stats = memcached.typed_stats(helper.get_stats('node', 11209, bucket, 'all'))
+        self.assertEqual(stats, {'curr_items': 10, 'ep_ratio': 0.5, 'ep_warmup_state': 'done'})
+
+        self.assertEqual(client.call_count, 1)
+        self.assertEqual(client.return_value.bucket_select.call_args_list,
+                         [mock.call('bucket-1'), mock.call('bucket-2')])
+
+    def test_disk_ops(self):
+        stats = {'ep_bg_fetched': '7'}
+        for i, state in enumerate(('active', 'replica', 'pending')):
+            stats['vb_{}_ops_create'.format(state)] = str(i)
+            stats['vb_{}_ops_update'.format(state)] = str(10 * i)
+        self.assertEqual(memcached.disk_ops(stats), {'get_ops': 7, 'set_ops': 33})
+
+
+class DiskStatsTest(TestCase):
+
+    def test_device_match(self):
+        sampler = DiskStats(hosts=['node'], workers=[], user='', password='')
+        sampler.read_proc = mock.Mock(return_value='\n'.join((
+            '   8       0 sda 10 0 100 0 20 0 200 0 0 0 0',
+            '   8       1 sda1 1 0 10 0 2 0 20 0 0 0 0',
+        )))
+        sampler.get_sector_size = mock.Mock(return_value=512)
+
+        self.assertEqual(sampler.get_disk_stats('/dev/sda1'), (10 * 512, 20 * 512))
+        self.assertIsNone(sampler.get_disk_stats('/dev/sdb'))
+
+
+class IOAmplificationTest(TestCase):
+
+    def test_amplification(self):
+        collector = IOAmplification.__new__(IOAmplification)
+        collector.doc_size = 1024
+        before = {
+            'ops': {'get_ops': 100, 'set_ops': 100},
+            'physical': {'nr': 10, 'nrb': 4096, 'nw': 10, 'nwb': 8192},
+            'virtual': {'nr': 10, 'nrb': 4096, 'nw': 10, 'nwb': 8192},
+        }
+        after = {
+            'ops': {'get_ops': 150, 'set_ops': 110},
+            'physical': {'nr': 110, 'nrb': 413696, 'nw': 30, 'nwb': 49152},
+            'virtual': {'nr': 5, 'nrb': 0, 'nw': 0, 'nwb': 0},  # Restarted process
+        }
+
+        self.assertEqual(collector.amplification(before, after), {
+            'physical_write_amp': 4.0,
+            'physical_write_bytes_per_set': 4096.0,
+            'physical_write_io_per_set': 2.0,
+            'physical_read_bytes_per_set': 40960.0,
+            'physical_read_io_per_set': 10.0,
+            'physical_read_amp': 2.0,
+            'physical_read_bytes_per_get': 8192.0,
+        })
+
+        after['ops']['get_ops'] = 100
+        self.assertNotIn('physical_read_amp', collector.amplification(before, after))
+
+        after['ops']['set_ops'] = 0
+        self.assertEqual(collector.amplification(before, after), {})
+
+
+class ProcStreamerTest(TestCase):
+
+    def test_restart_closed_stream(self):
+        frames = iter([
+            ['@@frame\n', '@@file /proc/stat\n', 'cpu 1\n', '@@frame\n'],
+            ['@@frame\n', '@@file /proc/stat\n', 'cpu 2\n', '@@frame\n'],
+        ])
+        transport = mock.Mock()
+        transport.open_session.side_effect = lambda: mock.Mock(
+            makefile=mock.Mock(return_value=next(frames)))
+        pool = mock.Mock(get_client=mock.Mock(return_value=mock.Mock(
+            get_transport=mock.Mock(return_value=transport))))
+
+        streamer = ProcStreamer(pool, 'node', interval=1)
+        self.assertEqual(streamer.read('/proc/stat'), 'cpu 1')
+        streamer.thread.join()  # The channel closed after one frame
+
+        self.assertEqual(streamer.read('/proc/stat'), 'cpu 2')
+        self.assertEqual(transport.open_session.call_count, 2)
+
+
+class RestTest(TestCase):
+
+    @mock.patch('time.sleep')
+    def test_retry_read_timeout(self, _):
+        response = mock.Mock()
+        responses = mock.Mock(side_effect=[requests.exceptions.ReadTimeout(), response])
+
+        def get(url):
+            return responses(url)
+
+        self.assertIs(rest.retry(get)(url='http://node:8091/pools/default'), response)
+        self.assertEqual(responses.call_count, 2)
+
+    @mock.patch('time.sleep')
+    @mock.patch('perfrunner.helpers.rest.logger')
+    def test_retry_budget(self, logger, sleep):
+        def get(url):
+            raise requests.exceptions.ConnectionError()
+
+        rest.retry(get)(url='http://node:8091/pools/default')
+        logger.interrupt.assert_called_once()
+
+        # Same total wait as MAX_RETRY fixed delays, at most one delay more
+        total = sum(call.args[0] for call in sleep.call_args_list)
+        max_delay = 2 * rest.RETRY_DELAY
+        self.assertGreaterEqual(total, rest.MAX_RETRY * max_delay)
+        self.assertLess(total, rest.MAX_RETRY * max_delay + 1.5 * max_delay)
+        self.assertGreater(sleep.call_count, rest.MAX_RETRY)
+
+
+class RestCacheTest(TestCase):
+
+    def test_shared_snapshot(self):
+        with tempfile.TemporaryDirectory() as path:
+            fetch = mock.Mock(side_effect=[{'nodes': 1}, {'nodes': 2}])
+            key = ('node', 8091, '/pools/default', True)
+
+            self.assertEqual(RestCache(path).get(key, ttl=60, fetch=fetch), {'nodes': 1})
+            self.assertEqual(RestCache(path).get(key, ttl=60, fetch=fetch), {'nodes': 1})
+            self.assertEqual(fetch.call_count, 1)
+
+            self.assertEqual(RestCache(path).get(key, ttl=0, fetch=fetch), {'nodes': 2})
+            self.assertEqual(fetch.call_count, 2)
+
+    def test_retry_outside_lock(self):
+        with tempfile.TemporaryDirectory() as path:
+            collector = Collector.__new__(Collector)
+            collector.master_node = 'node'
+            collector.interval = 10
+            collector.rest_cache = RestCache(path)
+            lock_filename = collector.rest_cache.filename(('node', 8091, '/pools', True)) + '.lock'
+
+            def refresh_nodes_and_retry(*args):
+                with open(lock_filename) as lock:  # Raises if the lock is still held
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return {'pools': 2}
+
+            collector.fetch_http = mock.Mock(side_effect=[requests.ConnectionError(),
+                                                          {'pools': 1}])
+            collector.refresh_nodes_and_retry = refresh_nodes_and_retry
+
+            self.assertEqual(collector.get_http('/pools'), {'pools': 2})
+            self.assertEqual(collector.get_http('/pools'), {'pools': 1})  # Failures aren't cached
+
+
+class CollectorTest(TestCase):
+
+    def test_fan_out(self):
+        collector = Collector.__new__(Collector)
+        collector.executor = collector.executor_pid = None
+        barrier = threading.Barrier(3, timeout=5)  # Breaks unless all calls run at once
+
+        def get_stats(bucket, node):
+            barrier.wait()
+            return bucket, node
+
+        self.assertEqual(collector.fan_out(get_stats, ['b1', 'b2', 'b3'], node='n1'),
+                         [('b1', 'n1'), ('b2', 'n1'), ('b3', 'n1')])
+
+    def test_metric_metadata_retry(self):
+        collector = Collector.__new__(Collector)
+        collector.serverless_db_names = {}
+        collector.metrics = set()
+        collector.COLLECTOR = 'ns_server'
+        collector.mc = mock.Mock(add_metrics=mock.Mock(side_effect=[False, True]))
+
+        collector.update_metric_metadata(['ops'], bucket='bucket')
+        collector.update_metric_metadata(['ops'], bucket='bucket')  # Retried after a failure
+        collector.update_metric_metadata(['ops'], bucket='bucket')
+        self.assertEqual(collector.mc.add_metrics.call_count, 2)
+
+
+class NSServerTest(TestCase):
+
+    def test_incremental_samples(self):
+        collector = NSServer.__new__(NSServer)
+        collector.last_timestamps = {}
+        collector.get_http = mock.Mock(side_effect=[
+            {'op': {'lastTStamp': 3000, 'samples': {'timestamp': [1000, 2000, 3000],
+                                                    'ops': [1, 2, 3]}}},
+            {'op': {'lastTStamp': 5000, 'samples': {'timestamp': [3000, 4000, 5000],
+                                                    'ops': [3, 4, 5]}}},
+        ])
+
+        points = collector._get_new_stats('/pools/default/buckets/b/stats', 'b')
+        self.assertEqual(points, [(3000 * 10 ** 6, {'timestamp': 3000, 'ops': 3})])
+
+        points = collector._get_new_stats('/pools/default/buckets/b/stats', 'b')
+        self.assertEqual([stats['ops'] for _, stats in points], [4, 5])
+        collector.get_http.assert_called_with(
+            path='/pools/default/buckets/b/stats?zoom=minute&haveTStamp=3000')
+
+
+class MetadataRegistryTest(TestCase):
+
+    def test_registered_once(self):
+        with tempfile.TemporaryDirectory() as path:
+            path = '{}/metadata.jsonl'.format(path)
+            entries = [('cluster', 'bucket', None, None, metric, 'ns_server')
+                       for metric in ('ops', 'cmd_get', 'cmd_set')]
+            callback = mock.Mock(side_effect=[True, False, True])
+
+            self.assertTrue(MetadataRegistry(path).register(entries[:2], callback))
+            # Rejected by cbmonitor
+            self.assertFalse(MetadataRegistry(path).register(entries, callback))
+            self.assertTrue(MetadataRegistry(path).register(entries, callback))
+            self.assertTrue(MetadataRegistry(path).register(entries, callback))
+            self.assertEqual(callback.call_args_list,
+                             [mock.call(entries[:2]), mock.call(entries[2:]),
+                              mock.call(entries[2:])])
+
+
+class MetadataClientTest(TestCase):
+
+    def test_bulk_fallback(self):
+        settings = mock.Mock(cbmonitor_host='cbmonitor', cluster='cluster',
+                             serverless_db_names={}, metadata_registry=None)
+        client = MetadataClient(settings)
+        client.session = mock.Mock()
+        client.session.post.side_effect = [
+            mock.Mock(ok=False, status_code=503), mock.Mock(ok=True),  # Transient failure
+            mock.Mock(ok=False, status_code=404), mock.Mock(ok=False),  # No bulk endpoint
+            mock.Mock(ok=True),
+        ]
+
+        self.assertTrue(client.add_metrics(['ops'], bucket='bucket'))
+        self.assertTrue(client.bulk_supported)
+        self.assertFalse(client.add_metrics(['ops'], bucket='bucket'))
+        self.assertFalse(client.bulk_supported)
+        self.assertTrue(client.add_metrics(['ops'], bucket='bucket'))
+        self.assertEqual([call.kwargs['url'] for call in client.session.post.call_args_list], [
+            'http://cbmonitor/cbmonitor/add_metrics/', 'http://cbmonitor/cbmonitor/add_metric/',
+            'http://cbmonitor/cbmonitor/add_metrics/', 'http://cbmonitor/cbmonitor/add_metric/',
+            'http://cbmonitor/cbmonitor/add_metric/',
+        ])
+
+
+class PerfStoreTest(TestCase):
+
+    @staticmethod
+    def fake_session(store: PerfStore, posted: list, bulk_status: int = 200) -> mock.Mock:
+        def post(url, json):
+            posted.append((url[len(store.base_url):], json))
+            response = mock.MagicMock(status=bulk_status if url.endswith('bulk') else 200)
+            response.json = mock.AsyncMock(return_value={})
+            context = mock.MagicMock()
+            context.__aenter__.return_value = response
+            return context
+        return mock.Mock(post=post)
+
+    def test_buffered_writer(self):
+        singles = ['/c?ts=0', '/c?ts=1', '/c?ts=2', '/c?ts=3']
+        for bulk_status, expected_urls, bulk_supported in (
+            (200, ['/c/bulk'], True),
+            (503, ['/c/bulk'] + singles, True),
+            (404, ['/c/bulk'] + singles, False),
+        ):
+            store = PerfStore('localhost')
+            posted = []
+            store.async_session = self.fake_session(store, posted, bulk_status)
+
+            async def append():
+                async with store.buffered(max_points=5, max_delay=60):
+                    for i in range(4):
+                        await store.append_async({'ops': i}, cluster='c', timestamp=i)
+
+            asyncio.run(append())
+
+            self.assertEqual([url for url, _ in posted], expected_urls)
+            self.assertEqual(posted[0][1], [{'ts': i, 'data': {'ops': i}} for i in range(4)])
+            self.assertEqual([data for _, data in posted[1:]],
+                             [{'ops': i} for i in range(len(posted) - 1)])
+            self.assertEqual(store.bulk_supported, bulk_supported)
+
+    def test_buffered_writer_timer(self):
+        store = PerfStore('localhost')
+        posted = []
+        store.async_session = self.fake_session(store, posted)
+
+        async def append():
+            async with store.buffered(max_points=5, max_delay=0.05):
+                await store.append_async({'ops': 1}, cluster='c', timestamp=1)
+                await asyncio.sleep(0.2)
+                self.assertEqual(posted, [('/c/bulk', [{'ts': 1, 'data': {'ops': 1}}])])
+
+        asyncio.run(append())
+        self.assertEqual(len(posted), 1)